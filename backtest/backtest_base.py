@@ -4,19 +4,32 @@ Author: Zhicheng Tang
 Created Date: 8/23/24
 Description: <This is a general backtest class that includes the essential methods required to backtest a strategy.>
 """
-from typing import List, Dict
+import heapq
+import math
+import os
+import pickle
+from typing import Iterator, List, Dict, Optional
 import pandas as pd
 import numpy as np
 
 from backtest.event import (Event, CashFlowChange, OptionAssigned, OptionExpired,
                             UpdatePortfolio, LimitOrder, FilledOrder, CanceledOrder)
 
+from backtest.event_journal import (EventJournal, EventJournalWriter, CASH_FLOW, FILLED_ORDER, LIMIT_ORDER,
+                                    CANCELED_ORDER, OPTION_EXPIRED, OPTION_ASSIGNED, UPDATE_PORTFOLIO)
 from backtest.portfolio import Portfolio
+from backtest.strategy import BarMatrix, Strategy
 from .data_parser.ohlcv import OHLCV
 from .data_parser.option_chain import OptionChain
 from .data_parser.data_parser import DataParser
-from .utils.constant import FREQUENCY
-from .utils.instrument import InstrumentType
+from .data_parser.prefetch import (ChunkPrefetcher, PrefetchedOptionChain, OPTION_PARTITION_DIR,
+                                   option_chain_prefetcher)
+from .utils.constant import FREQUENCY, SIDE
+from .utils.instrument import Instrument, InstrumentType, Option, OptionType
+from .utils.logger import logger
+from .utils.profiler import Profiler, profile_span
+from .utils.timeutil import NS_PER_DAY, to_ns, to_timestamp
+from .utils.trading_calendar import TradingCalendar
 
 
 class BacktestBase(object):
@@ -28,6 +41,23 @@ class BacktestBase(object):
         :param start_date: start date string in format YYYY-MM-DD and it's inclusive.
         :param end_date: end date string in format YYYY-MM-DD and it's inclusive.
         :param kwargs: other potential configs.
+            profiler: an optional Profiler that records event handling, data lookup and data load times.
+            use_data_cache: read market data through the pickle cache of DataParser. Default False.
+            prefetch_options: read option chains from monthly partitions (DataParser.partition_option_chain) in
+            background threads, a few months ahead of the lookups. Call close() to stop the threads. Default False.
+            prefetch_lookahead: months loaded ahead. Default 2.
+            prefetch_max_bytes: memory budget of the prefetched option chains. Default 1 GiB.
+            ohlcv_data: symbol to OHLCV already loaded, e.g. shared by the engines of a sweep. These symbols are not
+            read again. The objects are only read, so they can be shared.
+            option_data: symbol to OptionChain already loaded, like ohlcv_data.
+            price_missing_options: price option positions missing from the chain on a valuation date off a per day
+            volatility surface of the chain (OptionChain.build_vol_surface), so they are not left out of the portfolio
+            value. Needs the underlying in the stock instruments. Default True.
+            risk_free_rate: rate of the volatility surface. Default 0.03.
+            settle_expirations: run_backtest adds the expiration or assignment of options still held at their
+            expiration, see schedule_expirations. Default True.
+            record_journal: path of an EventJournal to record the events run_backtest consumes to. Passing the
+            opened journal to run_backtest later reruns the backtest without generating the events.
         """
         self.history_data_path = history_data_path
         self.instruments = instruments
@@ -39,6 +69,29 @@ class BacktestBase(object):
         self.portfolio_snapshots: List[Dict] = []
         self.net_cash_flow = initial_cash_balance
         self.period_returns: List[float] = []
+        self.profiler: Profiler | None = kwargs.get('profiler')
+        self.use_data_cache = kwargs.get('use_data_cache', False)
+        self.record_journal: str | None = kwargs.get('record_journal')
+        self.price_missing_options = kwargs.get('price_missing_options', True)
+        self.risk_free_rate = kwargs.get('risk_free_rate', 0.03)
+        self.settle_expirations = kwargs.get('settle_expirations', True)
+        self.prefetcher: ChunkPrefetcher | None = None
+        if kwargs.get('prefetch_options', False):
+            # The loader threads look the underlying up when a month is loaded, after the stock data is loaded.
+            underlying = (lambda symbol: getattr(self, "ohlcv_data", {}).get(symbol)) if self.price_missing_options \
+                else None
+            self.prefetcher = option_chain_prefetcher(history_data_path, kwargs.get('prefetch_lookahead', 2),
+                                                      kwargs.get('prefetch_max_bytes', 2 ** 30),
+                                                      underlying=underlying, rate=self.risk_free_rate)
+        self.calendar = TradingCalendar.for_range(start_date, end_date)
+        self._preloaded_ohlcv_data: Dict[str, OHLCV] = kwargs.get('ohlcv_data') or {}
+        self._preloaded_option_data: Dict[str, OptionChain] = kwargs.get('option_data') or {}
+        # Run state that has to survive between run_backtest calls. See save_checkpoint.
+        self.open_orders: Dict[str, LimitOrder] = {}
+        self.last_value: float | None = None
+        self.last_event_ts_ns: int | None = None
+        # Set by load_checkpoint. The next run skips the events the checkpointed run already processed.
+        self._resume_from_checkpoint = False
         self._load_data()
 
 
@@ -72,75 +125,437 @@ class BacktestBase(object):
     def get_maximum_drawdown(self) -> float:
         pass
 
-    def run_backtest(self, time_sorted_events: List[Event]) -> None:
+    def close(self) -> None:
         """
-        Simulate the portfolio performance based on the time sorted events.
-        :param time_ordered_events:
+        Stops the option chain prefetch threads, if prefetch_options is on. Lookups of option prices fail afterwards.
+        """
+        if self.prefetcher is not None:
+            self.prefetcher.close()
+
+    def run_backtest(self, time_sorted_events: List[Event] | EventJournal) -> None:
+        """
+        Simulate the portfolio performance based on the time sorted events. Unless settle_expirations is off, options
+        still held at their expiration are settled, see schedule_expirations.
+        :param time_sorted_events: events generated by a strategy, or an EventJournal recorded by an earlier run, which
+        is replayed from its records without building the events again. A journal holds the settlements of its run.
         :return: None
         """
-        last_value: float | None = None
-        open_orders: Dict[str, LimitOrder] = {}
+        if isinstance(time_sorted_events, EventJournal):
+            self._replay_journal(time_sorted_events)
+            return
+
+        if self.settle_expirations:
+            time_sorted_events = self.schedule_expirations(time_sorted_events)
+        events = self._events_after_checkpoint(time_sorted_events)
+        writer = EventJournalWriter(self.record_journal) if self.record_journal else None
+        if writer is not None:
+            events = writer.record(events)
+        if self.profiler is not None:
+            events = self.profiler.trace_events(events)
+
+        try:
+            for event in events:
+                self._handle_event(event)
+                self._after_event()
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.close()
+
+    def _handle_event(self, event: Event) -> None:
+        if isinstance(event, FilledOrder):
+            self._on_fill(event.instrument, event.side, event.quantity, event.filled_price, event.commission_rate,
+                          event.filled_date)
+        elif isinstance(event, LimitOrder):
+            self._on_limit_order(event)
+        elif isinstance(event, CanceledOrder):
+            self._on_canceled_order(event.order_id)
+        elif isinstance(event, OptionAssigned):
+            self._on_option_assigned(event)
+        elif isinstance(event, OptionExpired):
+            self._on_option_expired(event)
+        elif isinstance(event, CashFlowChange):
+            self._on_cash_flow(event.ts_ns, event.change_amount)
+        elif isinstance(event, UpdatePortfolio):
+            self._on_prices(event.prices)
+        elif isinstance(event, Event):
+            raise NotImplementedError(f"{event} not supported.")
+        else:
+            raise ValueError(f"Invalid event type: {type(event)}.")
+
+    def _replay_journal(self, journal: EventJournal) -> None:
+        """
+        Feeds the records of a journal to the same handlers as run_backtest. Fills, cash flows and price updates are
+        handled from the record fields. Limit orders, cancels, expirations and assignments are rare, and are built
+        as events again because the engine keeps or passes them on as objects.
+        """
+        records = journal.records
+        start = 0
+        resume_ts_ns = self._take_resume_ts_ns()
+        if resume_ts_ns is not None:
+            start = int(np.searchsorted(records["ts_ns"], resume_ts_ns, side="right"))
+        instruments, sides, symbols = journal.instruments, journal.sides, journal.symbols
+
+        with profile_span(self.profiler, "replay", journal.path):
+            chunk_size = 65536
+            skip = 0
+            for chunk_start in range(start, len(records), chunk_size):
+                chunk = records[chunk_start:chunk_start + chunk_size]
+                columns = zip(chunk["ts_ns"].tolist(), chunk["kind"].tolist(), chunk["instrument"].tolist(),
+                              chunk["side"].tolist(), chunk["quantity"].tolist(), chunk["price"].tolist(),
+                              chunk["commission_rate"].tolist(), chunk["aux_ns"].tolist(), chunk["order_id"].tolist())
+                for offset, (ts_ns, kind, instrument, side, quantity, price, commission_rate, aux_ns,
+                             order_id) in enumerate(columns):
+                    if skip:
+                        # PRICE records of an UPDATE_PORTFOLIO, already read.
+                        skip -= 1
+                        continue
+                    if kind == FILLED_ORDER:
+                        self._on_fill(instruments[instrument], sides[side], quantity, price, commission_rate, aux_ns)
+                    elif kind == CASH_FLOW:
+                        self._on_cash_flow(ts_ns, price)
+                    elif kind == UPDATE_PORTFOLIO:
+                        prices = None
+                        if quantity >= 0:
+                            first = chunk_start + offset + 1
+                            rows = records[first:first + quantity]
+                            prices = {symbols[symbol]: value
+                                      for symbol, value in zip(rows["instrument"].tolist(), rows["price"].tolist())}
+                            skip = quantity
+                        self._on_prices(prices)
+                    elif kind == LIMIT_ORDER:
+                        self._on_limit_order(EventJournal.limit_order(instruments[instrument], to_timestamp(ts_ns),
+                                                                      sides[side], quantity, price, commission_rate,
+                                                                      order_id))
+                    elif kind == CANCELED_ORDER:
+                        self._on_canceled_order(order_id)
+                    elif kind == OPTION_ASSIGNED:
+                        self._on_option_assigned(OptionAssigned(to_timestamp(ts_ns), instruments[instrument]))
+                    elif kind == OPTION_EXPIRED:
+                        self._on_option_expired(OptionExpired(to_timestamp(ts_ns), instruments[instrument]))
+                    else:
+                        raise ValueError(f"Invalid journal record kind {kind} in {journal.path}.")
+                    self._after_event()
+                    self.last_event_ts_ns = ts_ns
+
+    def _on_fill(self, instrument: Instrument, side: SIDE, quantity: int, filled_price: float, commission_rate: float,
+                 filled_date) -> None:
+        self.portfolio.apply_fill(instrument, side, quantity, filled_price, commission_rate, filled_date)
+        self.portfolio.update_portfolio({instrument.symbol: filled_price})
+        self.portfolio_snapshots.append(self.portfolio.get_snapshot())
+
+    def _on_limit_order(self, order: LimitOrder) -> None:
+        self.open_orders[order.order_id] = order
+
+    def _on_canceled_order(self, order_id) -> None:
+        del self.open_orders[order_id]
+
+    def _on_option_assigned(self, event: OptionAssigned) -> None:
+        self.portfolio.option_assigned(event)
+
+    def _on_option_expired(self, event: OptionExpired) -> None:
+        self.portfolio.option_expired(event)
+
+    def _on_cash_flow(self, ts_ns: int, change_amount: float) -> None:
+        if self.last_value:
+            prices = {}
+            options: Dict[str, List[Option]] = {}
+            for symbol in self.portfolio.positions.keys():
+                position = self.portfolio.positions[symbol]
+                instrument = position.instrument
+
+                if instrument.type == InstrumentType.STOCK:
+                    # FIXME later: Here it assumes price frequency is hourly. However, this method should be encapsulated to the DataParse to
+                    # accommodate for all frequency. Currently we only have hourly stock data.
+                    close_price = self.get_session_close_price(symbol, ts_ns)
+                    if close_price is None:
+                        logger.warning("No intraday data for %s on %s.", symbol, to_timestamp(ts_ns))
+                        continue
+                    prices[symbol] = close_price
+                elif instrument.type == InstrumentType.OPTION:
+                    options.setdefault(instrument.underlying_symbol, []).append(instrument)
+
+            # All option positions of an underlying are priced in one call, which prices the contracts missing from the
+            # data off the volatility surface together.
+            for underlying_symbol, contracts in options.items():
+                spot = None
+                if underlying_symbol in getattr(self, "ohlcv_data", {}):
+                    spot = self.get_session_close_price(underlying_symbol, ts_ns)
+                close_prices = self.option_data[underlying_symbol].get_instrument_prices(
+                    ts_ns, contracts, spot, self.risk_free_rate if self.price_missing_options else None)
+                for contract, close_price in zip(contracts, close_prices.tolist()):
+                    if not math.isnan(close_price):
+                        prices[contract.symbol] = close_price
+
+            self.portfolio.update_portfolio(prices)
+            period_return = self.get_simple_return(self.last_value, self.portfolio.portfolio_value)
+            self.period_returns.append(period_return)
+
+        self.portfolio.add_cash_flow(change_amount)
+        self.net_cash_flow += change_amount
+        self.last_value = self.portfolio.portfolio_value
+
+    def _on_prices(self, prices: Optional[Dict[str, float]]) -> None:
+        self.portfolio.update_portfolio(prices)
+
+    def _after_event(self) -> None:
+        """
+        Called after every handled event.
+        """
+        pass
+
+    def save_checkpoint(self, path: str, include_snapshots: bool = False) -> None:
+        """
+        Saves the run state, so a later run can restore it and only process new events, e.g. a daily refresh that
+        appends one trading day to a long backtest.
+        :param path: checkpoint file.
+        :param include_snapshots: also save portfolio_snapshots, which grow with the number of events.
+        """
+        state = {
+            "start_date": self.start_date,
+            "instruments": self.instruments,
+            "portfolio": self.portfolio,
+            "open_orders": self.open_orders,
+            "net_cash_flow": self.net_cash_flow,
+            "period_returns": self.period_returns,
+            "last_value": self.last_value,
+            "last_event_ts_ns": self.last_event_ts_ns,
+            "event_id": Event._id_counter,
+            "portfolio_snapshots": self.portfolio_snapshots if include_snapshots else None,
+        }
+        # Write then rename, so an interrupted save never leaves a truncated checkpoint behind.
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+
+    def load_checkpoint(self, path: str) -> None:
+        """
+        Restores a checkpoint of a run with the same start date and instruments. The end date may be later, so the
+        backtest can be extended. The next run_backtest then skips the events at or before the last processed event.
+        :param path: checkpoint file written by save_checkpoint.
+        """
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        if state["start_date"] != self.start_date or state["instruments"] != self.instruments:
+            raise ValueError(f"Checkpoint {path} is for start date {state['start_date']} and instruments "
+                             f"{state['instruments']}.")
 
+        self.portfolio = state["portfolio"]
+        self.open_orders = state["open_orders"]
+        self.net_cash_flow = state["net_cash_flow"]
+        self.period_returns = state["period_returns"]
+        self.last_value = state["last_value"]
+        self.last_event_ts_ns = state["last_event_ts_ns"]
+        if state["portfolio_snapshots"] is not None:
+            self.portfolio_snapshots = state["portfolio_snapshots"]
+        self._resume_from_checkpoint = True
+        # New events must not reuse the ids of restored open orders.
+        Event._id_counter = max(Event._id_counter, state["event_id"])
+
+    def _events_after_checkpoint(self, time_sorted_events: List[Event]) -> Iterator[Event]:
+        """
+        Yields the events, without the ones a loaded checkpoint already processed, and records the ts of each event
+        once it was processed.
+        """
+        last_ts_ns = self._take_resume_ts_ns()
+        for event in time_sorted_events:
+            if last_ts_ns is not None and event.ts_ns <= last_ts_ns:
+                continue
+            yield event
+            self.last_event_ts_ns = event.ts_ns
+
+    def _take_resume_ts_ns(self) -> Optional[int]:
+        """
+        :return: ts of the last event processed before the checkpoint that was loaded since the last run, or None. Only
+        the first run after load_checkpoint resumes, so running an engine again processes all events.
+        """
+        resume = self._resume_from_checkpoint
+        self._resume_from_checkpoint = False
+        return self.last_event_ts_ns if resume else None
+
+    def get_session_close_price(self, symbol: str, ts_ns: int) -> Optional[float]:
+        """
+        Close of the last bar from ts_ns until the close of the session on the same day.
+        :param symbol: stock symbol.
+        :param ts_ns: UTC ns, usually the ts of an event during the session.
+        :return: close price, or None if there is no bar in between.
+        """
+        day = ts_ns // NS_PER_DAY
+        session = self.calendar.session_index(day)
+        session_close = self.calendar.session_close_ns[session] if session >= 0 else (day + 1) * NS_PER_DAY
+        return self.ohlcv_data[symbol].get_last_close(ts_ns, session_close)
+
+    def schedule_expirations(self, time_sorted_events: List[Event]) -> List[Event]:
+        """
+        Adds an OptionAssigned or OptionExpired event at the session close of the expiration date (the previous session
+        if the market is closed that day) for every option that is still held then and has no such event already. The
+        options the portfolio holds now are included with the fills of the events.
+        In the money is decided by the underlying close of that session. Options expiring after the last event are left
+        open, so a run over the events up to now (e.g. resumed from a checkpoint every day) doesn't settle them early.
+        :param time_sorted_events: events generated by a strategy.
+        :return: a new time sorted list including the scheduled events.
+        """
+        net_quantity: Dict[Option, List] = {}
+        # Options held before these events, e.g. restored by load_checkpoint, count from the start.
+        for position in self.portfolio.positions.values():
+            if position.instrument.type == InstrumentType.OPTION and position.amount != 0:
+                net_quantity[position.instrument] = [(np.iinfo(np.int64).min, position.amount)]
+        settled = set()
         for event in time_sorted_events:
+            if isinstance(event, (OptionExpired, OptionAssigned)):
+                settled.add(event.instrument)
+            elif isinstance(event, FilledOrder) and event.instrument.type == InstrumentType.OPTION:
+                fills = net_quantity.setdefault(event.instrument, [])
+                fills.append((event.ts_ns, event.quantity if event.side == SIDE.BUY else -event.quantity))
+
+        scheduled = []
+        last_ts_ns = time_sorted_events[-1].ts_ns if time_sorted_events else None
+        for option, fills in net_quantity.items():
+            if option in settled or to_ns(option.expiration_date) > last_ts_ns:
+                continue
+            expiration_close = self.calendar.session_close_on_or_before(option.expiration_date)
+            if expiration_close > last_ts_ns:
+                continue
+            if sum(quantity for ts_ns, quantity in fills if ts_ns <= expiration_close) == 0:
+                continue
+
+            scheduled.append(self._settlement_event(option, expiration_close))
+
+        scheduled.sort(key=lambda event: event.ts_ns)
+        return list(heapq.merge(time_sorted_events, scheduled, key=lambda event: event.ts_ns))
+
+    def _settlement_event(self, option: Option, expiration_close: int) -> OptionAssigned | OptionExpired:
+        """
+        :param expiration_close: UTC ns of the session close the option settles at.
+        :return: OptionAssigned if the option is in the money at the underlying close of that session, otherwise
+        OptionExpired.
+        """
+        underlying_close = None
+        if option.underlying_symbol in getattr(self, "ohlcv_data", {}):
+            session_open = self.calendar.session_open_ns[self.calendar.session_on_or_before(
+                expiration_close // NS_PER_DAY)]
+            underlying_close = self.ohlcv_data[option.underlying_symbol].get_last_close(session_open, expiration_close)
+        if underlying_close is None:
+            logger.warning("No underlying close for %s at expiration, treated as expired.", option.symbol)
+            in_the_money = False
+        elif option.option_type == OptionType.CALL:
+            in_the_money = underlying_close > option.strike_price
+        else:
+            in_the_money = underlying_close < option.strike_price
+
+        ts = to_timestamp(expiration_close)
+        return OptionAssigned(ts, option) if in_the_money else OptionExpired(ts, option)
+
+    def run_strategy(self, strategy: Strategy, symbols: List[str] = None, events: List[Event] = None) -> None:
+        """
+        Runs a bar driven strategy in one pass over the bars of the loaded stock data between start_date and end_date.
+        At every bar, in order:
+        - events (e.g. scheduled cash flows) up to the bar are processed,
+        - options held past their expiration session close are settled and strategy.on_expiry is called,
+        - strategy.on_bar is called with the bars of all symbols and the events it returns are processed.
+        strategy.on_fill is called after every processed FilledOrder. Events are recorded to record_journal if set.
+        :param strategy: the strategy.
+        :param symbols: stock symbols in the bars. Defaults to all loaded stocks.
+        :param events: time sorted events that don't depend on the strategy.
+        """
+        start_ns = to_ns(self.start_date)
+        end_ns = to_ns(self.end_date) + NS_PER_DAY
+        bars = BarMatrix(self.ohlcv_data, symbols, start_ns, end_ns)
+        external = list(events) if events is not None else []
+        next_external = 0
+        expirations = []
+        scheduled = set()
+        writer = EventJournalWriter(self.record_journal) if self.record_journal else None
+
+        def process(event: Event) -> None:
+            if writer is not None:
+                writer.append(event)
+            self._handle_event(event)
+            self._after_event()
+            self.last_event_ts_ns = event.ts_ns
             if isinstance(event, FilledOrder):
-                filled_order: FilledOrder = event
-                self.portfolio.fill_order(filled_order)
-                self.portfolio.update_portfolio({filled_order.symbol: filled_order.filled_price})
-                self.portfolio_snapshots.append(self.portfolio.get_snapshot())
-            elif isinstance(event, LimitOrder):
-                open_orders[event.order_id] = event
-            elif isinstance(event, CanceledOrder):
-                del open_orders[event.order_id]
-            elif isinstance(event, OptionAssigned):
-                self.portfolio.option_assigned(event)
-            elif isinstance(event, OptionExpired):
-                self.portfolio.option_expired(event)
-
-            elif isinstance(event, CashFlowChange):
-                if last_value:
-                    prices = {}
-                    for symbol in self.portfolio.positions.keys():
-                        position = self.portfolio.positions[symbol]
-                        instrument = position.instrument
-                        close_price = None
-
-                        if instrument.type == InstrumentType.STOCK:
-                            # FIXME later: Here it assumes price frequency is hourly. However, this method should be encapsulated to the DataParse to
-                            # accommodate for all frequency. Currently we only have hourly stock data.
-                            end_of_day = event.ts.normalize() + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
-                            intraday_prices = self.ohlcv_data[symbol].get_ohlcv_by_date_string(event.ts, end_of_day)
-                            try:
-                                close_price = intraday_prices.iloc[-1].close
-                            except IndexError:
-                                print(f"{event.ts} {symbol} data not exist")
-                                continue
-                        elif instrument.type == InstrumentType.OPTION:
-                            underlying_symbol = instrument.underlying_symbol
-                            option_chain_data = self.option_data[underlying_symbol]
-                            close_price = option_chain_data.get_instrument_price(event.ts.date(), instrument)
-                        if close_price is not None:
-                            prices[symbol] = close_price
-
-                    self.portfolio.update_portfolio(prices)
-                    period_return = self.get_simple_return(last_value, self.portfolio.portfolio_value)
-                    self.period_returns.append(period_return)
-
-                self.portfolio.add_cash_flow(event.change_amount)
-                self.net_cash_flow += event.change_amount
-                last_value = self.portfolio.portfolio_value
-            elif isinstance(event, UpdatePortfolio):
-                self.portfolio.update_portfolio(event.prices)
-            elif isinstance(event, Event):
-                raise NotImplementedError(f"{event} not supported.")
-            else:
-                raise ValueError(f"Invalid event type: {type(event)}.")
+                if event.instrument.type == InstrumentType.OPTION and event.instrument not in scheduled:
+                    scheduled.add(event.instrument)
+                    expiration_close = self.calendar.session_close_on_or_before(event.instrument.expiration_date)
+                    heapq.heappush(expirations, (expiration_close, event.instrument.dense_id, event.instrument))
+                strategy.on_fill(event)
+            elif isinstance(event, (OptionAssigned, OptionExpired)):
+                strategy.on_expiry(event)
+
+        def settle_before(ts_ns: int) -> None:
+            while expirations and expirations[0][0] < ts_ns:
+                expiration_close, _, option = heapq.heappop(expirations)
+                scheduled.discard(option)
+                # Positions closed before the expiration stay in the portfolio with amount 0.
+                position = self.portfolio.positions.get(option.symbol)
+                if position is not None and position.amount != 0:
+                    process(self._settlement_event(option, expiration_close))
+
+        strategy.on_start(self)
+        try:
+            with profile_span(self.profiler, "strategy", type(strategy).__name__):
+                for index in range(len(bars)):
+                    ts_ns = int(bars.ts_ns[index])
+                    while next_external < len(external) and external[next_external].ts_ns <= ts_ns:
+                        # Settlements before an event come first, so events are processed and recorded in time order.
+                        settle_before(external[next_external].ts_ns)
+                        process(external[next_external])
+                        next_external += 1
+                    settle_before(ts_ns)
+                    for event in strategy.on_bar(bars.bar(index)) or ():
+                        if event.ts_ns < ts_ns:
+                            raise ValueError(f"{type(event).__name__} at {event.ts} is before the bar at "
+                                             f"{to_timestamp(ts_ns)}.")
+                        process(event)
+                for event in external[next_external:]:
+                    settle_before(event.ts_ns)
+                    process(event)
+                settle_before(end_ns)
+        except BaseException:
+            if writer is not None:
+                writer.abort()
+            raise
+        if writer is not None:
+            writer.close()
+        strategy.on_finish()
 
     def _load_data(self) -> None:
+        """
+        Loads the market data of the instruments, except the symbols in the preloaded ohlcv_data and option_data
+        kwargs, which are used as they are.
+        """
+        loaded = []
         if InstrumentType.OPTION.value in self.instruments:
-            self.option_data = self._load_option_data(self.instruments[InstrumentType.OPTION.value])
+            self.option_data = dict(self._preloaded_option_data)
+            missing = [symbol for symbol in self.instruments[InstrumentType.OPTION.value]
+                       if symbol not in self.option_data]
+            option_data = self._load_option_data(missing)
+            self.option_data.update(option_data)
+            loaded += [(option_chain, "get_instrument_prices") for option_chain in option_data.values()]
 
         if InstrumentType.STOCK.value in self.instruments:
-            self.ohlcv_data = self._load_stock_data(self.instruments[InstrumentType.STOCK.value])
+            self.ohlcv_data = dict(self._preloaded_ohlcv_data)
+            missing = [symbol for symbol in self.instruments[InstrumentType.STOCK.value] if symbol not in self.ohlcv_data]
+            ohlcv_data = self._load_stock_data(missing)
+            self.ohlcv_data.update(ohlcv_data)
+            loaded += [(ohlcv, "get_last_close") for ohlcv in ohlcv_data.values()]
+
+        if self.price_missing_options:
+            for symbol, option_chain in getattr(self, "option_data", {}).items():
+                # A shared chain keeps its surfaces by rate, so engines with other rates don't use this one.
+                if not isinstance(option_chain, OptionChain) or symbol not in getattr(self, "ohlcv_data", {}):
+                    continue
+                if (self.risk_free_rate, 0.0) not in option_chain.vol_surfaces:
+                    with profile_span(self.profiler, "load", f"vol_surface:{symbol}"):
+                        option_chain.build_vol_surface(self.ohlcv_data[symbol], self.risk_free_rate)
+
+        # Preloaded data may be shared with other engines, so only the data loaded here is instrumented.
+        if self.profiler is not None:
+            for data, method_name in loaded:
+                self.profiler.instrument(data, method_name)
 
     def _load_stock_data(self, symbols: List[str]) -> Dict[str, OHLCV]:
         """
@@ -150,11 +565,14 @@ class BacktestBase(object):
         """
         ohlcv_data = {}
         for symbol in symbols:
-            path = f"{self.history_data_path}/{symbol}"
-            df = DataParser.read_ohlcv(path, self.frequency)
-            df["ts_event"] = pd.to_datetime(df["ts_event"], utc=True)
-            df.rename(columns={"ts_event": "ts"})
-            ohlcv_data[symbol] = OHLCV(df)
+            with profile_span(self.profiler, "load", f"stock:{symbol}"):
+                path = f"{self.history_data_path}/{symbol}"
+                if self.use_data_cache:
+                    df = DataParser.read_ohlcv_cached(path, self.frequency)
+                else:
+                    df = DataParser.read_ohlcv(path, self.frequency, parse_dates=True)
+                df.rename(columns={"ts_event": "ts"})
+                ohlcv_data[symbol] = OHLCV(df)
 
         return ohlcv_data
 
@@ -162,13 +580,25 @@ class BacktestBase(object):
         """
         Initialize OptionChain objects for each symbol.
         :param symbols: a list of option instrument underlying symbols
-        :return: A dictionary of OptionChain objects.
+        :return: A dictionary of OptionChain objects, or of PrefetchedOptionChain objects when prefetching.
         """
+        if self.prefetcher is not None:
+            for symbol in symbols:
+                partition_dir = os.path.join(self.history_data_path, symbol, OPTION_PARTITION_DIR)
+                if not os.path.isdir(partition_dir):
+                    raise FileNotFoundError(f"No option chain partitions at {os.path.abspath(partition_dir)}. Run "
+                                            f"DataParser.partition_option_chain first or turn prefetch_options off.")
+            return {symbol: PrefetchedOptionChain(symbol, self.prefetcher) for symbol in symbols}
+
         option_data = {}
         for symbol in symbols:
-            path = f"{self.history_data_path}/{symbol}"
-            df = DataParser.read_option_chain(path)
-            option_data[symbol] = OptionChain(df)
+            with profile_span(self.profiler, "load", f"option:{symbol}"):
+                path = f"{self.history_data_path}/{symbol}"
+                if self.use_data_cache:
+                    df = DataParser.read_option_chain_cached(path)
+                else:
+                    df = DataParser.read_option_chain(path)
+                option_data[symbol] = OptionChain(df)
 
         return option_data
 
@@ -1,10 +1,14 @@
-from typing import Dict, List
+import logging
+from typing import Dict, List, Optional
 import pandas as pd
 
 from backtest.backtest_base import BacktestBase
-from backtest.event import Event, CashFlowChange, UpdatePortfolio
-from .utils.constant import FREQUENCY
+from backtest.event import Event, CanceledOrder, FilledOrder, LimitOrder, OptionAssigned, OptionExpired
+from backtest.event_journal import EventJournal
+from .utils.constant import FREQUENCY, SIDE
+from .utils.instrument import Instrument
 from .utils.logger import logger
+from .utils.timeutil import to_timestamp
 
 
 class BacktestCSP(BacktestBase):
@@ -21,51 +25,69 @@ class BacktestCSP(BacktestBase):
             end_date: The end date of the backtest.
             initial_cash: The starting cash balance for the portfolio.
         """
+        # Options are not settled by this backtester, see _on_option_assigned.
+        kwargs.setdefault('settle_expirations', False)
         super().__init__(history_data_path, instruments, frequency, start_date, end_date, **kwargs)
+        self._log_events = logger.isEnabledFor(logging.DEBUG)
 
 
 
-    def run_backtest(self, time_ordered_events: List[Event]) -> None:
+    def run_backtest(self, time_ordered_events: List[Event] | EventJournal) -> None:
         """
         Simulates portfolio performance by processing a chronological list of events.
         This method relies on the Portfolio class to handle the logic for all instrument types.
         
         Args:
-            time_ordered_events: A list of events sorted by timestamp, generated by a strategy.
+            time_ordered_events: A list of events sorted by timestamp, generated by a strategy, or an EventJournal
+            recorded by an earlier run.
         """
         self.events = time_ordered_events
-        logger.info(f"Starting backtest with {len(self.events)} events.")
+        logger.info("Starting backtest with %d events.", len(self.events))
         
         # Take an initial snapshot of the portfolio before any events occur
         self.portfolio_snapshots.append(self.portfolio.get_snapshot())
-        
-        for event in self.events:
-            # The order of these checks matters. A daily UpdatePortfolio should typically
-            # be the last event for a given day to reflect the end-of-day values.
-            
-            if isinstance(event, CashFlowChange):
-                self.portfolio.add_cash_flow(event.change_amount)
-                logger.info(f"{event.ts}: Cash flow change of {event.change_amount}. New balance: {self.portfolio.cash_balance}")
-
-            elif isinstance(event, FilledOrder):
-                # The portfolio's fill_order method handles all the logic for
-                # stocks and options, thanks to the Position class.
-                self.portfolio.fill_order(event)
-
-            elif isinstance(event, UpdatePortfolio):
-                # The portfolio's update method marks all positions (stocks and options) to market.
-                self.portfolio.update_portfolio(event.prices)
-                logger.info(f"{event.ts}: Portfolio value updated to {self.portfolio.portfolio_value:.2f}")
-
-            # You can add handlers for other event types like LimitOrder here if needed
-            elif isinstance(event, Event):
-                raise NotImplementedError(f"Event type {type(event)} is not supported by this backtester.")
-            
-            # Take a snapshot of the portfolio's state after each event is processed
-            self.portfolio_snapshots.append(self.portfolio.get_snapshot())
-        
+        self._log_events = logger.isEnabledFor(logging.DEBUG)
+        # The order of events matters. A daily UpdatePortfolio should typically
+        # be the last event for a given day to reflect the end-of-day values.
+        super().run_backtest(time_ordered_events)
+
         logger.info("Backtest finished.")
-        logger.info(f"Final portfolio value: {self.portfolio.portfolio_value:.2f}")
+        logger.info("Final portfolio value: %.2f", self.portfolio.portfolio_value)
+
+    def _on_cash_flow(self, ts_ns: int, change_amount: float) -> None:
+        self.portfolio.add_cash_flow(change_amount)
+        if self._log_events:
+            logger.debug("cash_flow ts=%s change=%s balance=%s", to_timestamp(ts_ns), change_amount,
+                         self.portfolio.cash_balance)
+
+    def _on_fill(self, instrument: Instrument, side: SIDE, quantity: int, filled_price: float, commission_rate: float,
+                 filled_date) -> None:
+        # The portfolio's fill method handles all the logic for
+        # stocks and options, thanks to the Position class.
+        self.portfolio.apply_fill(instrument, side, quantity, filled_price, commission_rate, filled_date)
+
+    def _on_prices(self, prices: Optional[Dict[str, float]]) -> None:
+        # The portfolio's update method marks all positions (stocks and options) to market.
+        self.portfolio.update_portfolio(prices)
+        if self._log_events:
+            logger.debug("mark portfolio_value=%.2f", self.portfolio.portfolio_value)
+
+    # You can add handlers for other event types like LimitOrder here if needed
+    def _on_limit_order(self, order: LimitOrder) -> None:
+        raise NotImplementedError(f"Event type {type(order)} is not supported by this backtester.")
+
+    def _on_canceled_order(self, order_id) -> None:
+        raise NotImplementedError(f"Event type {CanceledOrder} is not supported by this backtester.")
+
+    def _on_option_assigned(self, event: OptionAssigned) -> None:
+        raise NotImplementedError(f"Event type {type(event)} is not supported by this backtester.")
+
+    def _on_option_expired(self, event: OptionExpired) -> None:
+        raise NotImplementedError(f"Event type {type(event)} is not supported by this backtester.")
+
+    def _after_event(self) -> None:
+        # Take a snapshot of the portfolio's state after each event is processed
+        self.portfolio_snapshots.append(self.portfolio.get_snapshot())
 
     def export_filled_orders(self, file_path: str = "csp_backtest_orders.xlsx") -> None:
         """Exports all filled orders from the backtest to an Excel file."""
@@ -73,7 +95,8 @@ class BacktestCSP(BacktestBase):
             logger.error("No events were processed, cannot export orders.")
             return
 
-        filled_orders = [event for event in self.events if isinstance(event, FilledOrder)]
+        events = self.events.events() if isinstance(self.events, EventJournal) else self.events
+        filled_orders = [event for event in events if isinstance(event, FilledOrder)]
         
         if not filled_orders:
             logger.warning("No FilledOrder events found to export.")
@@ -91,4 +114,4 @@ class BacktestCSP(BacktestBase):
 
         df = pd.DataFrame(data)
         df.to_excel(file_path, index=False)
-        logger.info(f"Successfully exported {len(df)} filled orders to {file_path}")
\ No newline at end of file
+        logger.info("Successfully exported %d filled orders to %s", len(df), file_path)
\ No newline at end of file
@@ -8,63 +8,56 @@ from typing import Dict, List
 import pandas as pd
 
 from backtest.backtest_base import BacktestBase
-from backtest.event import Event, CashFlowChange, UpdatePortfolio, LimitOrder, FilledOrder, CaceledOrder
+from backtest.event import Event, FilledOrder, OptionAssigned, OptionExpired
+from backtest.event_journal import EventJournal
 from .utils.constant import FREQUENCY
+from .utils.logger import logger
+from .utils.timeutil import to_timestamp
 
 
 class BacktestDCA(BacktestBase):
     def __init__(self, history_data_path: Dict[str, str], instruments: Dict, frequency: FREQUENCY, start_date: str,
                  end_date: str, **kwargs) -> None:
+        # Options are not settled by this backtester, see _on_option_assigned.
+        kwargs.setdefault('settle_expirations', False)
         super().__init__(history_data_path, instruments, frequency, start_date, end_date, **kwargs)
 
-    def run_backtest(self, time_ordered_events: List[Event]) -> None:
+    def run_backtest(self, time_ordered_events: List[Event] | EventJournal) -> None:
         """
         Simulate the portfolio performance based on the time sorted events.
-        :param time_ordered_events:
+        :param time_ordered_events: events, or an EventJournal to replay.
         :return: None
         """
-        last_value: float | None = None
-        open_orders: Dict[str, LimitOrder] = {}
         self.events = time_ordered_events
-        for event in time_ordered_events:
-            if isinstance(event, FilledOrder):
-                filled_order: FilledOrder = event
-                self.portfolio.fill_order(filled_order)
-                self.portfolio.update_portfolio({filled_order.symbol: filled_order.filled_price})
-                self.portfolio_snapshots.append(self.portfolio.get_snapshot())
-            elif isinstance(event, LimitOrder):
-                open_orders[event.order_id] = event
-            elif isinstance(event, CanceledOrder):
-                del open_orders[event.order_id]
-            elif isinstance(event, CashFlowChange):
-                if last_value:
-                    prices = {}
-                    for symbol in self.portfolio.positions.keys():
-                        end_of_day = event.ts.normalize() + pd.Timedelta(days=1) - pd.Timedelta(microseconds=1)
-                        intraday_prices = self.ohlcv_data[symbol].get_ohlcv_by_date_string(event.ts, end_of_day)
-                        try:
-                            close_price = intraday_prices.iloc[-1].close
-                        except IndexError:
-                            print(f"{event.ts} data not exist")
-                            continue
-                        prices[symbol] = close_price
-                    self.portfolio.update_portfolio(prices)
-                    period_return = self.get_simple_return(last_value, self.portfolio.portfolio_value)
-                    self.period_returns.append(period_return)
+        super().run_backtest(time_ordered_events)
 
-                self.portfolio.add_cash_flow(event.change_amount)
-                self.net_cash_flow += event.change_amount
-                last_value = self.portfolio.portfolio_value
-            elif isinstance(event, UpdatePortfolio):
-                self.portfolio.update_portfolio(event.prices)
-            elif isinstance(event, Event):
-                raise NotImplementedError(f"{event} not supported.")
-            else:
-                raise ValueError(f"Invalid event type: {type(event)}.")
+    def _on_option_assigned(self, event: OptionAssigned) -> None:
+        raise NotImplementedError(f"{event} not supported.")
+
+    def _on_option_expired(self, event: OptionExpired) -> None:
+        raise NotImplementedError(f"{event} not supported.")
+
+    def _on_cash_flow(self, ts_ns: int, change_amount: float) -> None:
+        if self.last_value:
+            prices = {}
+            for symbol in self.portfolio.positions.keys():
+                close_price = self.get_session_close_price(symbol, ts_ns)
+                if close_price is None:
+                    logger.warning("No intraday data for %s on %s.", symbol, to_timestamp(ts_ns))
+                    continue
+                prices[symbol] = close_price
+            self.portfolio.update_portfolio(prices)
+            period_return = self.get_simple_return(self.last_value, self.portfolio.portfolio_value)
+            self.period_returns.append(period_return)
+
+        self.portfolio.add_cash_flow(change_amount)
+        self.net_cash_flow += change_amount
+        self.last_value = self.portfolio.portfolio_value
 
     def export_filled_order(self) -> None:
         if self.events:
-            filled_orders = [event for event in self.events if isinstance(event, FilledOrder)]
+            events = self.events.events() if isinstance(self.events, EventJournal) else self.events
+            filled_orders = [event for event in events if isinstance(event, FilledOrder)]
             data = [{
                 "symbol": event.symbol,
                 "filled_price": event.filled_price,
@@ -76,4 +69,4 @@ class BacktestDCA(BacktestBase):
             df = pd.DataFrame(data)
             df.to_excel("backtest_orders.xlsx", index=False)
         else:
-            logger.error(f"No filled order to export.")
\ No newline at end of file
+            logger.error("No filled order to export.")
\ No newline at end of file
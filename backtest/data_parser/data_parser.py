@@ -4,26 +4,64 @@ Author: Zhicheng Tang
 Created Date: 8/24/24
 Description: <This class parses the raw data into the format that strategy and backtest could use.>
 """
-from typing import List
+import logging
+from typing import Callable, List, NamedTuple
+import numpy as np
 import pandas as pd
 import os
 
+from .ohlcv import OHLCV
 from ..utils.constant import FREQUENCY
+from ..utils.logger import logger
+from ..utils.timeutil import to_ns_array, NS_PER_DAY, NS_PER_HOUR
+from ..utils.trading_calendar import TradingCalendar
+
+
+class FeatureSet(NamedTuple):
+    """
+    Features aligned on the ohlcv rows that have every feature and a forward return.
+    """
+    ts_event: np.ndarray
+    names: List[str]
+    features: np.ndarray
+    forward_return: np.ndarray
+    labels: np.ndarray
 
 
 class DataParser(object):
     """
     A collection of static methos to parse and process financial data.
     """
+    # Stored in every cache pickle. Bump it whenever a cached reader changes its output so older caches are rebuilt.
+    CACHE_VERSION = 2
 
 
     @staticmethod
-    def read_ohlcv(data_path: str, frequency: FREQUENCY) -> pd.DataFrame:
+    def read_ohlcv(data_path: str, frequency: FREQUENCY, parse_dates: bool = False,
+                   calendar: TradingCalendar = None) -> pd.DataFrame:
+        """
+        Reads ohlcv bars and keeps the ones that overlap a regular trading session.
+        :param data_path: directory of the symbol.
+        :param frequency: frequency of the data.
+        :param parse_dates: return ts_event as UTC datetimes instead of the raw strings. The column is parsed once
+        either way, this only avoids parsing it again downstream.
+        :param calendar: trading calendar for the session filter. Defaults to the NYSE calendar covering the data.
+        :return: ohlcv dataframe.
+        """
         if frequency == FREQUENCY.HOUR:
             df = pd.read_csv(f'{data_path}/ohlcv-{frequency.value}.csv')
-            df["timestamp"] = pd.to_datetime(df["ts_event"])
-            condition = ((df['timestamp'].dt.hour >= 13) & (df['timestamp'].dt.hour <= 20))
-            df = df.loc[condition].drop(columns=["timestamp"])
+            timestamp = pd.to_datetime(df["ts_event"], utc=True, format="ISO8601")
+            ts_ns = to_ns_array(timestamp)
+            if len(ts_ns) == 0:
+                return df
+            if calendar is None:
+                calendar = TradingCalendar.for_range(int(ts_ns.min()), int(ts_ns.max()))
+            # ts_event is the start of the bar. Keep bars that overlap the session, e.g. the 13:00 UTC bar in summer
+            # contains the 13:30 open.
+            condition = calendar.session_mask(ts_ns, NS_PER_HOUR)
+            df = df.loc[condition]
+            if parse_dates:
+                df = df.assign(ts_event=timestamp[condition])
         elif frequency == FREQUENCY.DAY:
             print("Resampling methods not implemented.")
             raise NotImplementedError("Not implemented yet")
@@ -82,6 +120,37 @@ class DataParser(object):
         df["return"] = df["return"].shift(-forward_periods)
         return df.dropna().loc[:, ["ts_event", factor_name, "return"]]
 
+    @staticmethod
+    def assemble_features(feature_lst: List[pd.DataFrame], df: pd.DataFrame, forward_periods: int,
+                          dtype=np.float32) -> FeatureSet:
+        """
+        Aligns all features on the ohlcv timestamps in one pass. The forward return is computed once from the ohlcv
+        close and every feature is reindexed onto the same time index with a single concat.
+        :param feature_lst: list of features in dataframe format, each with ts_event and one feature column.
+        :param df: the original ohlcv dataframe, sorted by ts_event.
+        :param forward_periods: period of the forward return.
+        :param dtype: dtype of the feature matrix.
+        :return: FeatureSet with a contiguous (rows, features) matrix and binary labels (1.0 if the forward return is
+        positive).
+        """
+        close = df["close"].to_numpy(dtype=np.float64)
+        forward_return = np.full(len(close), np.nan)
+        if forward_periods < len(close):
+            forward_return[:len(close) - forward_periods] = close[forward_periods:] / close[:-forward_periods] - 1
+
+        names = [feature.columns[1] for feature in feature_lst]
+        # Keyed on the raw ts_event values, like the merge on ts_event was, so string timestamps are never parsed.
+        columns = [pd.Series(feature.iloc[:, 1].to_numpy(), index=pd.Index(feature["ts_event"]))
+                   for feature in feature_lst]
+        aligned = pd.concat(columns, axis=1, join="outer", ignore_index=True).reindex(pd.Index(df["ts_event"]))
+        features = aligned.to_numpy(dtype=dtype)
+
+        valid = ~np.isnan(features).any(axis=1) & ~np.isnan(forward_return)
+        forward_return = forward_return[valid]
+        return FeatureSet(ts_event=df["ts_event"].to_numpy()[valid], names=names,
+                          features=np.ascontiguousarray(features[valid]), forward_return=forward_return,
+                          labels=(forward_return > 0).astype(np.float64))
+
     @staticmethod
     def merge_features_binary(feature_lst: List[pd.DataFrame], df: pd.DataFrame, forward_periods: int) -> pd.DataFrame:
         """
@@ -90,23 +159,15 @@ class DataParser(object):
         :param forward_periods: period of the forward return.
         :return: features and the target.
         """
-        feature_lst = feature_lst.copy()
-        for i in range(len(feature_lst)):
-            feature_lst[i] = DataParser.align_return(feature_lst[i].merge(df, on="ts_event", how="inner"), forward_periods)
-
-        results = feature_lst.pop()
-
-        for feature in feature_lst:
-            results = results.merge(feature, on=["ts_event", "return"], how="inner")
-
-        positive_return = results["return"] > 0
-        results.loc[positive_return, "label"] = 1
-        results.loc[~positive_return, "label"] = 0
-
-        cols = ["ts_event"] + list(results.drop(columns=["ts_event", "return", "label"]).columns) + ["return", "label"]
-        results = results.loc[:, cols]
-        print("Feature with forward return range:")
-        print(results.head(1)["ts_event"].values[0], results.tail(1)["ts_event"].values[0])
+        feature_set = DataParser.assemble_features(feature_lst, df, forward_periods, dtype=np.float64)
+        results = pd.DataFrame(feature_set.features, columns=feature_set.names)
+        results.insert(0, "ts_event", feature_set.ts_event)
+        results["return"] = feature_set.forward_return
+        results["label"] = feature_set.labels
+
+        if len(results) and logger.isEnabledFor(logging.INFO):
+            logger.info("Feature with forward return range: %s %s", results["ts_event"].iloc[0],
+                        results["ts_event"].iloc[-1])
         return results
 
     @staticmethod
@@ -199,9 +260,121 @@ class DataParser(object):
         final_df.sort_values(by=['quote_date', 'expiration', 'strike'], inplace=True)
         return final_df
 
+    @staticmethod
+    def enrich_option_chain(chain: pd.DataFrame, underlying: OHLCV, rate: float = 0.03, dividend_yield: float = 0.0,
+                            only_missing: bool = False) -> pd.DataFrame:
+        """
+        Recomputes implied_volatility_eod from the bid/ask mid and the greeks from that volatility with Black-Scholes,
+        for the whole chain at once. The spot is the underlying's last close of the quote date, and the time to
+        expiration is counted in calendar days (half a day on the expiration date).
+        :param chain: option chain in the process_option_chain schema.
+        :param underlying: ohlcv of the underlying.
+        :param rate: continuously compounded risk free rate.
+        :param dividend_yield: continuous dividend yield of the underlying.
+        :param only_missing: only fill values that are missing in the chain and keep the vendor values.
+        :return: a copy of the chain. Rows whose mid has no implied volatility (no spot, no quote, or a price
+        outside the no-arbitrage bounds) get nan.
+        """
+        # Imported here, so reading market data doesn't load scipy.
+        from ..utils.black_scholes import bs_greeks, implied_volatility
+        quote_days = to_ns_array(chain["quote_date"]) // NS_PER_DAY
+        days_to_expiration = to_ns_array(chain["expiration"]) // NS_PER_DAY - quote_days
+        t = np.maximum(days_to_expiration, 0.5) / 365.0
+        spot = underlying.get_day_closes(quote_days)
+        strike = chain["strike"].to_numpy(dtype=np.float64)
+        is_call = (chain["option_type"] == "C").to_numpy()
+        mid = ((chain["bid_eod"] + chain["ask_eod"]) / 2).to_numpy(dtype=np.float64)
+
+        iv = implied_volatility(mid, spot, strike, t, rate, is_call, dividend_yield)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            greeks = bs_greeks(spot, strike, t, rate, iv, is_call, dividend_yield)
+
+        chain = chain.copy()
+        columns = {"implied_volatility_eod": iv, **{f"{name}_eod": value for name, value in greeks.items()}}
+        for column, value in columns.items():
+            if only_missing and column in chain.columns:
+                existing = chain[column].to_numpy(dtype=np.float64)
+                value = np.where(np.isnan(existing), value, existing)
+            chain[column] = value
+        return chain
+
+    @staticmethod
+    def partition_option_chain(path: str) -> List[str]:
+        """
+        Splits <path>/option-day.csv into monthly files <path>/option-day/YYYY-MM.csv by quote date, the layout read
+        by the option chain prefetcher. It only needs to be run once per data update.
+        :return: paths of the written files.
+        """
+        df = DataParser.read_option_chain(path)
+        months = pd.to_datetime(df["quote_date"], format="ISO8601").dt.strftime("%Y-%m")
+        os.makedirs(f"{path}/option-day", exist_ok=True)
+        written = []
+        for month, partition in df.groupby(months.to_numpy(), sort=True):
+            partition_path = f"{path}/option-day/{month}.csv"
+            partition.to_csv(partition_path, index=False)
+            written.append(partition_path)
+        return written
+
     @staticmethod
     def read_option_chain(path: str) -> pd.DataFrame:
         """
         Currently, do not expect to read higher frequency option data in the near future.
         """
         return pd.read_csv(f"{path}/option-day.csv")
+
+    @staticmethod
+    def read_ohlcv_cached(data_path: str, frequency: FREQUENCY) -> pd.DataFrame:
+        """
+        Same as read_ohlcv with parse_dates, but keeps the parsed result in a pickle next to the csv file.
+        """
+        return DataParser._read_with_cache(f"{data_path}/ohlcv-{frequency.value}.csv",
+                                           lambda: DataParser.read_ohlcv(data_path, frequency, parse_dates=True))
+
+    @staticmethod
+    def read_option_chain_cached(path: str) -> pd.DataFrame:
+        """
+        Same as read_option_chain, but keeps the parsed result in a pickle next to the csv file.
+        """
+        return DataParser._read_with_cache(f"{path}/option-day.csv", lambda: DataParser.read_option_chain(path))
+
+    @staticmethod
+    def read_option_chain_enriched_cached(path: str, frequency: FREQUENCY = FREQUENCY.HOUR, rate: float = 0.03,
+                                          dividend_yield: float = 0.0, only_missing: bool = False) -> pd.DataFrame:
+        """
+        read_option_chain followed by enrich_option_chain against the ohlcv in the same directory. The enriched chain
+        is kept in a pickle per rate and dividend yield, refreshed when either csv file changes.
+        """
+        option_path = f"{path}/option-day.csv"
+        ohlcv_path = f"{path}/ohlcv-{frequency.value}.csv"
+        cache_path = f"{path}/option-day.enriched-{rate}-{dividend_yield}-{int(only_missing)}.pkl"
+
+        def reader() -> pd.DataFrame:
+            underlying = OHLCV(DataParser.read_ohlcv_cached(path, frequency))
+            return DataParser.enrich_option_chain(DataParser.read_option_chain(path), underlying, rate,
+                                                  dividend_yield, only_missing)
+
+        return DataParser._read_with_cache(option_path, reader, cache_path=cache_path, dependencies=[ohlcv_path])
+
+    @staticmethod
+    def _read_with_cache(csv_path: str, reader: Callable[[], pd.DataFrame], cache_path: str = None,
+                         dependencies: List[str] = ()) -> pd.DataFrame:
+        """
+        :param csv_path: source csv file. The cache file is the same path with a .pkl suffix.
+        :param reader: parses the csv file when the cache is missing or older than the csv file.
+        :param cache_path: cache file to use instead of the default one.
+        :param dependencies: other files the cache is built from. The cache is also refreshed when one of them is newer.
+        :return: parsed dataframe.
+
+        The cache is also refreshed when it was written with a different CACHE_VERSION, e.g. by an older reader.
+        """
+        cache_path = cache_path or os.path.splitext(csv_path)[0] + ".pkl"
+        if os.path.exists(cache_path) and \
+                all(os.path.getmtime(cache_path) >= os.path.getmtime(source) for source in [csv_path, *dependencies]):
+            cached = pd.read_pickle(cache_path)
+            if isinstance(cached, dict) and cached.get("version") == DataParser.CACHE_VERSION:
+                return cached["data"]
+            logger.info(f"Rebuilding {cache_path}, it was written by another reader version.")
+
+        df = reader()
+        pd.to_pickle({"version": DataParser.CACHE_VERSION, "data": df}, cache_path)
+        return df
@@ -0,0 +1,235 @@
+"""
+File: feature_store.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <On-disk memoization of computed feature columns. Entries are keyed by the feature function, its parameters
+and a fingerprint of the source rows, stored as .npy columns that are memory-mapped on load, and extended by computing
+only the tail when new bars are appended to the source.>
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from ..utils.logger import logger
+from ..utils.timeutil import to_ns, to_ns_array
+
+SOURCE_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+class FeatureStore(object):
+    """
+    A feature function takes the ohlcv dataframe and returns a dataframe of ts_event and one or more feature columns,
+    like the features passed to DataParser.merge_features_binary:
+
+        store = FeatureStore("~/.cache/backtest/features", max_bytes=2 ** 30)
+        momentum = store.compute(momentum_feature, ohlcv_df, lookback=20, period=20)
+
+    Layout: root/<group>/<entry>/ with ts.npy (int64 UTC ns), values.npy (float64, rows x columns) and meta.json.
+    The group is the hash of the function, its parameters and the start of the date range. The entry is the hash of
+    the group and of the source rows it was computed from, so a cached entry is reused for any source whose first
+    rows are exactly those rows.
+    """
+
+    def __init__(self, root: str, max_bytes: Optional[int] = None) -> None:
+        """
+        :param root: directory of the store.
+        :param max_bytes: size cap. Least recently used entries are evicted after a write when the store is larger.
+        """
+        self.root = os.path.expanduser(root)
+        self.max_bytes = max_bytes
+        os.makedirs(self.root, exist_ok=True)
+
+    def compute(self, func: Callable[..., pd.DataFrame], df: pd.DataFrame, lookback: Optional[int] = None,
+                start=None, end=None, **params) -> pd.DataFrame:
+        """
+        Returns the feature from the store, computing only what is missing.
+        :param func: feature function, called as func(df, **params).
+        :param df: ohlcv dataframe sorted by ts_event.
+        :param lookback: number of bars the feature needs before a row to compute it. When the source has new bars
+        after a cached entry, func only runs on the last lookback bars of the entry and the new bars. None means the
+        feature depends on the whole history, so new bars recompute it.
+        :param start: first ts_event of the source rows to use, inclusive. Anything to_ns accepts.
+        :param end: ts_event bound of the source rows to use, exclusive.
+        :param params: parameters of func. They are part of the key, so they must have a stable repr.
+        :return: dataframe of ts_event, with the values of df["ts_event"], and the feature columns.
+        """
+        ts_ns = to_ns_array(df["ts_event"])
+        lower = 0 if start is None else int(np.searchsorted(ts_ns, to_ns(start), side="left"))
+        upper = len(ts_ns) if end is None else int(np.searchsorted(ts_ns, to_ns(end), side="left"))
+        source = df.iloc[lower:upper]
+        source_ts = ts_ns[lower:upper]
+        if len(source) == 0:
+            raise ValueError("No source rows in the date range.")
+
+        group = self._group_key(func, params, int(source_ts[0]))
+        row_hashes = _row_hashes(source, source_ts)
+        entry = self._find_prefix_entry(group, row_hashes)
+
+        if entry is not None and entry["source_rows"] == len(source):
+            logger.debug("Feature store hit %s %s.", func.__qualname__, params)
+            ts, values = self._load(group, entry)
+            self._touch(group, entry)
+        else:
+            if entry is not None and lookback is not None:
+                logger.debug("Feature store extending %s %s by %s rows.", func.__qualname__, params,
+                             len(source) - entry["source_rows"])
+                cached_ts, cached_values = self._load(group, entry)
+                warmup = max(0, entry["source_rows"] - lookback)
+                tail = func(source.iloc[warmup:], **params)
+                tail_ts, tail_values = _feature_arrays(tail)
+                keep = tail_ts > entry["source_last_ns"]
+                ts = np.concatenate([cached_ts, tail_ts[keep]])
+                values = np.concatenate([cached_values, tail_values[keep]])
+                names = entry["names"]
+            else:
+                logger.debug("Feature store miss %s %s.", func.__qualname__, params)
+                feature = func(source, **params)
+                ts, values = _feature_arrays(feature)
+                names = [column for column in feature.columns if column != "ts_event"]
+
+            new_entry = self._write(group, names, ts, values, row_hashes, int(source_ts[-1]))
+            if entry is not None:
+                self._remove(group, entry["key"])
+            self._evict(keep=(group, new_entry["key"]))
+            entry = new_entry
+
+        positions = np.searchsorted(ts_ns, ts)
+        result = pd.DataFrame(np.asarray(values), columns=entry["names"], index=pd.RangeIndex(len(ts)))
+        result.insert(0, "ts_event", df["ts_event"].to_numpy()[positions])
+        return result
+
+    def size(self) -> int:
+        """
+        :return: bytes used by the stored columns.
+        """
+        return sum(entry["bytes"] for _, entry in self._entries())
+
+    def clear(self) -> None:
+        for group in os.listdir(self.root):
+            shutil.rmtree(os.path.join(self.root, group), ignore_errors=True)
+
+    @staticmethod
+    def _group_key(func: Callable, params: Dict, start_ns: int) -> str:
+        # The bytecode is part of the key, so editing a feature function invalidates its entries.
+        code = getattr(func, "__code__", None)
+        identity = {
+            "func": f"{func.__module__}.{func.__qualname__}",
+            "code": hashlib.sha1(code.co_code + repr(code.co_consts).encode()).hexdigest() if code else None,
+            "params": repr(sorted(params.items())),
+            "start": start_ns,
+        }
+        return hashlib.sha1(json.dumps(identity, sort_keys=True).encode()).hexdigest()[:20]
+
+    def _find_prefix_entry(self, group: str, row_hashes: np.ndarray) -> Optional[Dict]:
+        """
+        :return: the entry of the group with the most source rows that are a prefix of the source, or None.
+        """
+        best = None
+        for entry in self._group_entries(group):
+            n = entry["source_rows"]
+            if n <= len(row_hashes) and (best is None or n > best["source_rows"]) \
+                    and _fingerprint(row_hashes[:n]) == entry["source_fingerprint"]:
+                best = entry
+        return best
+
+    def _group_entries(self, group: str) -> List[Dict]:
+        group_dir = os.path.join(self.root, group)
+        if not os.path.isdir(group_dir):
+            return []
+        entries = []
+        for key in os.listdir(group_dir):
+            meta_path = os.path.join(group_dir, key, "meta.json")
+            if os.path.exists(meta_path):
+                with open(meta_path) as f:
+                    entries.append(json.load(f))
+        return entries
+
+    def _entries(self):
+        for group in os.listdir(self.root):
+            for entry in self._group_entries(group):
+                yield group, entry
+
+    def _load(self, group: str, entry: Dict):
+        entry_dir = os.path.join(self.root, group, entry["key"])
+        return (np.load(os.path.join(entry_dir, "ts.npy"), mmap_mode="r"),
+                np.load(os.path.join(entry_dir, "values.npy"), mmap_mode="r"))
+
+    def _write(self, group: str, names: List[str], ts: np.ndarray, values: np.ndarray, row_hashes: np.ndarray,
+               source_last_ns: int) -> Dict:
+        fingerprint = _fingerprint(row_hashes)
+        key = hashlib.sha1(f"{group}{fingerprint}".encode()).hexdigest()[:20]
+        entry_dir = os.path.join(self.root, group, key)
+        # Written to a temporary directory and renamed, so readers never see a partial entry.
+        tmp_dir = os.path.join(self.root, group, f".tmp-{uuid.uuid4().hex}")
+        os.makedirs(tmp_dir)
+        np.save(os.path.join(tmp_dir, "ts.npy"), np.ascontiguousarray(ts, dtype=np.int64))
+        np.save(os.path.join(tmp_dir, "values.npy"), np.ascontiguousarray(values, dtype=np.float64))
+        entry = {
+            "key": key,
+            "names": names,
+            "rows": int(len(ts)),
+            "source_rows": int(len(row_hashes)),
+            "source_fingerprint": fingerprint,
+            "source_last_ns": source_last_ns,
+            "bytes": sum(os.path.getsize(os.path.join(tmp_dir, name)) for name in ("ts.npy", "values.npy")),
+            "last_access": time.time(),
+        }
+        with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+            json.dump(entry, f)
+        if os.path.exists(entry_dir):
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, entry_dir)
+        return entry
+
+    def _touch(self, group: str, entry: Dict) -> None:
+        entry["last_access"] = time.time()
+        meta_path = os.path.join(self.root, group, entry["key"], "meta.json")
+        with open(meta_path + ".tmp", "w") as f:
+            json.dump(entry, f)
+        os.replace(meta_path + ".tmp", meta_path)
+
+    def _remove(self, group: str, key: str) -> None:
+        shutil.rmtree(os.path.join(self.root, group, key), ignore_errors=True)
+
+    def _evict(self, keep) -> None:
+        if self.max_bytes is None:
+            return
+        entries = sorted(self._entries(), key=lambda item: item[1]["last_access"])
+        total = sum(entry["bytes"] for _, entry in entries)
+        for group, entry in entries:
+            if total <= self.max_bytes:
+                break
+            if (group, entry["key"]) == keep:
+                continue
+            logger.debug("Feature store evicting %s/%s (%s bytes).", group, entry["key"], entry["bytes"])
+            self._remove(group, entry["key"])
+            total -= entry["bytes"]
+
+
+def _row_hashes(source: pd.DataFrame, source_ts: np.ndarray) -> np.ndarray:
+    """
+    :return: one uint64 hash per source row, of its timestamp and ohlcv values.
+    """
+    columns = [column for column in SOURCE_COLUMNS if column in source.columns]
+    frame = source[columns].reset_index(drop=True).assign(ts_ns=source_ts)
+    return pd.util.hash_pandas_object(frame, index=False).to_numpy()
+
+
+def _fingerprint(row_hashes: np.ndarray) -> str:
+    return hashlib.sha1(np.ascontiguousarray(row_hashes).tobytes()).hexdigest()
+
+
+def _feature_arrays(feature: pd.DataFrame):
+    """
+    :return: int64 UTC ns timestamps and the (rows, columns) float64 values of a feature dataframe.
+    """
+    values = feature.drop(columns=["ts_event"]).to_numpy(dtype=np.float64)
+    return to_ns_array(feature["ts_event"]), values
@@ -4,22 +4,49 @@ Author: Zhicheng Tang
 Created Date: 8/24/24
 Description: <>
 """
+from typing import Optional
+
+import numpy as np
 import pandas as pd
 
+from ..utils.timeutil import to_ns, to_ns_array, NS_PER_DAY
+
+
 class OHLCV(object):
     def __init__(self, data: pd.DataFrame) -> None:
+        """
+        :param data: ohlcv dataframe. ts_event is parsed once into int64 UTC nanoseconds and all lookups work on that
+        array with binary search.
+        """
+        ts_ns = to_ns_array(data["ts_event"])
+        if len(ts_ns) > 1 and (np.diff(ts_ns) < 0).any():
+            order = np.argsort(ts_ns, kind="stable")
+            data = data.iloc[order]
+            ts_ns = ts_ns[order]
+
         self.data = data
+        self.ts_ns = ts_ns
+        self.close = data["close"].to_numpy(dtype=np.float64)
+        # Day ordinal (days since epoch, UTC) of every row.
+        self.day_ordinals = ts_ns // NS_PER_DAY
         self.symbol = self._get_symbol()
 
     def get_ohlcv_by_timestamp(self, timestamp: int, end_timestamp: int = None) -> pd.DataFrame:
         """
         Get the most recent OHLCV record for a given ts. If end_timestamp is provided, it returns all records
         within the range.
-        :param timestamp: If end_timestamp is provided, it's a snapshot ts, otherwise it's the start ts.
-        :param end_timestamp: It's the end ts if provided.
-        :return: OHLCV dataframe.
+        :param timestamp: If end_timestamp is provided, it's the start ts, otherwise it's a snapshot ts. In UTC ns.
+        :param end_timestamp: It's the end ts if provided. Range is [start, end).
+        :return: OHLCV dataframe, or a single record for a snapshot.
         """
-        raise NotImplementedError
+        if end_timestamp is not None:
+            start, stop = np.searchsorted(self.ts_ns, [timestamp, end_timestamp], side="left")
+            return self.data.iloc[start:stop]
+
+        position = np.searchsorted(self.ts_ns, timestamp, side="right") - 1
+        if position < 0:
+            raise Exception("No data found.")
+        return self.data.iloc[position]
 
     def get_ohlcv_by_date_string(self, date_string: str, end_date_string: str = None) -> pd.DataFrame:
         """
@@ -31,22 +58,41 @@ class OHLCV(object):
         :param end_date_string: It's the end filled_date string if provided.
         :return:
         """
-        start_ts = pd.to_datetime(date_string, utc=True)
-        end_ts = pd.to_datetime(end_date_string, utc=True) if end_date_string else None
+        start_ns = to_ns(date_string)
+        if end_date_string:
+            start, stop = np.searchsorted(self.ts_ns, [start_ns, to_ns(end_date_string)], side="left")
+            return self.data.iloc[start:stop]
 
-        if end_ts:
-            condition = (self.data["ts_event"] >= start_ts) & (self.data["ts_event"] < end_ts)
-            return self.data[condition]
+        position = np.searchsorted(self.ts_ns, start_ns, side="left")
+        if position < len(self.ts_ns):
+            return self.data.iloc[position]
         else:
-            condition = self.data["ts_event"] >= start_ts
-            if sum(condition) > 0:
-                return self.data[condition].iloc[0]
-            else:
-                raise Exception("No data found.")
+            raise Exception("No data found.")
+
+    def get_last_close(self, start_ns: int, end_ns: int) -> Optional[float]:
+        """
+        Close of the last bar in [start_ns, end_ns), without building a dataframe.
+        :return: the close price, or None if there is no bar in the range.
+        """
+        stop = np.searchsorted(self.ts_ns, end_ns, side="left")
+        if stop == 0 or self.ts_ns[stop - 1] < start_ns:
+            return None
+        return float(self.close[stop - 1])
+
+    def get_day_closes(self, days: np.ndarray) -> np.ndarray:
+        """
+        Last close of each day, vectorized.
+        :param days: day ordinals (days since epoch, UTC).
+        :return: float64 array, nan for days without a bar.
+        """
+        days = np.asarray(days, dtype=np.int64)
+        bar = np.searchsorted(self.ts_ns, (days + 1) * NS_PER_DAY, side="left") - 1
+        clipped = np.maximum(bar, 0)
+        return np.where((bar >= 0) & (self.day_ordinals[clipped] == days), self.close[clipped], np.nan)
 
     def _get_symbol(self) -> str:
         """
         Get the symbol of the ticker.
         :return: symbol string.
         """
-        return self.data.iloc[0]["symbol"]
\ No newline at end of file
+        return self.data.iloc[0]["symbol"]
@@ -4,63 +4,356 @@ Author: Zhicheng Tang
 Created Date: 08/12/25
 Description: a wrapper for an option chain dataframe, providing convenient query methods.
 """
+import numpy as np
 import pandas as pd
-from typing import Dict, List, Tuple, Optional
+from typing import Dict, List, Sequence, Tuple, Optional
+from .ohlcv import OHLCV
 from ..utils.instrument import Option
+from ..utils.logger import logger
+from ..utils.timeutil import to_ns, to_ns_array, NS_PER_DAY
+
+# Same day count as utils.black_scholes, which is imported where it's used to keep scipy out of the engine imports.
+DAYS_PER_YEAR = 365.0
 
 
 class OptionChain:
     def __init__(self, data: pd.DataFrame):
-        data["quote_date"] = pd.to_datetime(data["quote_date"])
-        data["expiration"] = pd.to_datetime(data["expiration"])
+        data["quote_date"] = pd.to_datetime(data["quote_date"], format="ISO8601")
+        data["expiration"] = pd.to_datetime(data["expiration"], format="ISO8601")
         data["DTE"] = (data["expiration"] - data["quote_date"]).dt.days
 
+        quote_ns = to_ns_array(data["quote_date"])
+        if len(quote_ns) > 1 and (np.diff(quote_ns) < 0).any():
+            order = np.argsort(quote_ns, kind="stable")
+            data = data.iloc[order].reset_index(drop=True)
+            quote_ns = quote_ns[order]
+
         self.data = data
         self.underlying_symbol = self.data.iloc[0]["underlying_symbol"]
 
+        # Column arrays for lookups. Dates are day ordinals (days since epoch).
+        self.quote_days = quote_ns // NS_PER_DAY
+        self.expiration_days = to_ns_array(data["expiration"]) // NS_PER_DAY
+        self.strikes = data["strike"].to_numpy(dtype=np.float64)
+        self.is_call = (data["option_type"] == "C").to_numpy()
+        self.mids = ((data["ask_eod"] + data["bid_eod"]) / 2).to_numpy(dtype=np.float64)
+
+        # Row range [start, stop) of each quote date, so a daily chain is a slice instead of a full scan.
+        days, starts = np.unique(self.quote_days, return_index=True)
+        stops = np.append(starts[1:], len(self.quote_days))
+        self._day_rows: Dict[int, Tuple[int, int]] = dict(zip(days.tolist(), zip(starts.tolist(), stops.tolist())))
+        # Volatility surfaces by (rate, dividend_yield). A chain may be shared by engines with different rates.
+        self.vol_surfaces: Dict[Tuple[float, float], VolSurface] = {}
+
+    def build_vol_surface(self, underlying: OHLCV, rate: float = 0.03, dividend_yield: float = 0.0) -> "VolSurface":
+        """
+        Builds the per quote date volatility surface that prices contracts missing from the data, see VolSurface. Out
+        of the money contracts contribute their implied_volatility_eod, or the volatility implied by their mid if that
+        column is missing or not positive. Lookups use it when they're given the same rate and dividend yield.
+        :param underlying: ohlcv of the underlying. The last close of a quote date is its spot.
+        :param rate: continuously compounded risk free rate.
+        :param dividend_yield: continuous dividend yield.
+        :return: the surface, kept in vol_surfaces. A surface built before with the same rate and dividend yield is
+        returned as it is.
+        """
+        from ..utils.black_scholes import implied_volatility
+
+        key = (rate, dividend_yield)
+        if key in self.vol_surfaces:
+            return self.vol_surfaces[key]
+
+        days = np.fromiter(self._day_rows, dtype=np.int64, count=len(self._day_rows))
+        spots = underlying.get_day_closes(days)
+        spot = spots[np.searchsorted(days, self.quote_days)]
+        dte = (self.expiration_days - self.quote_days).astype(np.float64)
+        if "implied_volatility_eod" in self.data.columns:
+            iv = self.data["implied_volatility_eod"].to_numpy(dtype=np.float64, na_value=np.nan).copy()
+        else:
+            iv = np.full(len(self.data), np.nan)
+        solve = ~(iv > 0) & np.isfinite(spot) & (dte > 0)
+        if solve.any():
+            iv[solve] = implied_volatility(self.mids[solve], spot[solve], self.strikes[solve], dte[solve] / DAYS_PER_YEAR,
+                                           rate, self.is_call[solve], dividend_yield)
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            log_moneyness = np.log(self.strikes / spot)
+        out_of_the_money = np.where(self.is_call, log_moneyness >= 0, log_moneyness <= 0)
+        use = out_of_the_money & (iv > 0) & np.isfinite(iv) & (dte > 0)
+        self.vol_surfaces[key] = VolSurface(days, spots, np.searchsorted(days, self.quote_days[use]), dte[use],
+                                            log_moneyness[use], iv[use], rate, dividend_yield)
+        return self.vol_surfaces[key]
+
     def get_chain_by_date(self, date_string: str) -> pd.DataFrame:
         """
         Gets the full option chain for a specific trading day.
-        :param date_string: The date to retrieve, in 'YYYY-MM-DD' format.
+        :param date_string: The date to retrieve, in 'YYYY-MM-DD' format. A date, Timestamp or UTC ns also works.
         :return: A DataFrame containing all options for that day.
         """
-        target_date = pd.to_datetime(date_string)
-        # We use .dt.date to compare only the date part, ignoring time
-        condition = self.data['quote_date'].dt.date == target_date.date()
-        result = self.data[condition]
-        
+        start, stop = self._day_rows.get(to_ns(date_string) // NS_PER_DAY, (0, 0))
+        result = self.data.iloc[start:stop]
+
         if result.empty:
-            print(f"Warning: No data found for date {date_string}. Check if it's a trading day.")
-            
+            logger.warning("No data found for date %s. Check if it's a trading day.", date_string)
+
         return result
-    
+
+    def screen(self, option_type: str = None, dte: Tuple[float, float] = None, delta: Tuple[float, float] = None,
+               moneyness: Tuple[float, float] = None, min_open_interest: int = None, max_spread: float = None,
+               max_relative_spread: float = None, underlying: OHLCV = None, target_column: str = "delta_eod",
+               target: Optional[float] = None, highest: bool = False, start_date: str = None,
+               end_date: str = None) -> pd.DataFrame:
+        """
+        Selects one contract per quote date over the whole chain at once, e.g. the put closest to -0.30 delta with 30 to
+        45 DTE: screen("P", dte=(30, 45), target_column="delta_eod", target=-0.3).
+        Ranges are inclusive (low, high) tuples. None skips a predicate.
+        :param option_type: "C" or "P".
+        :param dte: days to expiration.
+        :param delta: delta_eod.
+        :param moneyness: strike / underlying close of the quote date. Requires underlying.
+        :param min_open_interest: minimum open_interest.
+        :param max_spread: maximum ask_eod - bid_eod.
+        :param max_relative_spread: maximum (ask_eod - bid_eod) / mid.
+        :param underlying: ohlcv of the underlying. Its last close of each quote date is added as underlying_close.
+        :param target_column: column the contract is chosen by.
+        :param target: choose the contract whose target_column is closest to target. If None, choose the lowest value,
+        or the highest if highest is True.
+        :param start_date: first quote date, inclusive.
+        :param end_date: last quote date, inclusive.
+        :return: the selected rows of the chain, one per quote date that has a matching contract, in date order.
+        """
+        first_day = -np.inf if start_date is None else to_ns(start_date) // NS_PER_DAY
+        last_day = np.inf if end_date is None else to_ns(end_date) // NS_PER_DAY
+        mask = (self.quote_days >= first_day) & (self.quote_days <= last_day)
+        if option_type is not None:
+            mask &= self.is_call == (option_type == "C")
+        if dte is not None:
+            mask &= _in_range(self.data["DTE"].to_numpy(), dte)
+        if delta is not None:
+            mask &= _in_range(self.data["delta_eod"].to_numpy(dtype=np.float64), delta)
+        if min_open_interest is not None:
+            mask &= self.data["open_interest"].to_numpy(dtype=np.float64) >= min_open_interest
+        if max_spread is not None or max_relative_spread is not None:
+            spread = (self.data["ask_eod"] - self.data["bid_eod"]).to_numpy(dtype=np.float64)
+            if max_spread is not None:
+                mask &= spread <= max_spread
+            if max_relative_spread is not None:
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    mask &= spread / self.mids <= max_relative_spread
+
+        underlying_close = underlying.get_day_closes(self.quote_days) if underlying is not None else None
+        if moneyness is not None:
+            if underlying_close is None:
+                raise ValueError("moneyness requires the underlying ohlcv.")
+            with np.errstate(invalid="ignore"):
+                mask &= _in_range(self.strikes / underlying_close, moneyness)
+
+        value = self.data[target_column].to_numpy(dtype=np.float64)
+        score = np.abs(value - target) if target is not None else (-value if highest else value)
+        mask &= ~np.isnan(score)
+
+        # Rows are sorted by quote date, so after sorting the candidates by (date, score) the first row of every date
+        # is its best contract.
+        candidates = np.flatnonzero(mask)
+        order = candidates[np.lexsort((score[candidates], self.quote_days[candidates]))]
+        _, first = np.unique(self.quote_days[order], return_index=True)
+        selected = order[first]
+
+        result = self.data.iloc[selected]
+        if underlying_close is not None:
+            result = result.assign(underlying_close=underlying_close[selected],
+                                   moneyness=self.strikes[selected] / underlying_close[selected])
+        return result
+
     def get_full_chain(self) -> pd.DataFrame:
         """
         Returns the entire underlying DataFrame.
         """
         return self.data
 
-    def get_instrument_price(self, date_string: str, instrument: Option) -> float:
-        target_date = pd.to_datetime(date_string)
-        daily_chain = self.get_chain_by_date(date_string)
-        if daily_chain.empty:
-            if target_date > instrument.expiration_date:
-                close_price = 0
-            else:
-                print(f"Warning: No option chain data for {self.underlying_symbol} on {target_date}.")
-        else:
-            target_expiry = pd.to_datetime(instrument.expiration_date)
-            option_row = daily_chain
-            specific_option_row = daily_chain[
-                (daily_chain['strike'] == instrument.strike_price) &
-                (daily_chain['expiration'] == target_expiry) &
-                (daily_chain['option_type'] == instrument.option_type.value)
-                ]
-            if not specific_option_row.empty:
-                return (specific_option_row.iloc[0]['ask_eod'] + specific_option_row.iloc[0]['bid_eod']) / 2
-            else:
-                print(f"Warning: Could not find specific contract in data on {target_date}, strike "
-                      f"{instrument.strike_price}, expiry: {target_expiry}, type: {instrument.option_type.value}")
+    def get_instrument_price(self, date_string: str, instrument: Option, rate: float = None,
+                             dividend_yield: float = 0.0) -> Optional[float]:
+        """
+        Mid price of a contract at the end of a trading day.
+        :param date_string: the quote date, in 'YYYY-MM-DD' format. A date, Timestamp or UTC ns also works.
+        :param instrument: the option contract.
+        :param rate: if the surface of this rate and dividend_yield was built (build_vol_surface), a contract missing
+        from the data is priced from it. None never estimates.
+        :return: the mid price, 0 if the contract already expired and None if it's not in the data and not estimated.
+        """
+        target_day = to_ns(date_string) // NS_PER_DAY
+        expiration_day = to_ns(instrument.expiration_date) // NS_PER_DAY
+        rows = self._day_rows.get(target_day)
+        if rows is None:
+            if target_day > expiration_day:
+                return 0.0
+            logger.warning("No option chain data for %s on %s.", self.underlying_symbol, date_string)
+            return None
+
+        price = self._find_mid(rows, instrument, expiration_day)
+        if price is not None:
+            return price
 
+        estimate = self._estimate_prices(target_day, [instrument], np.array([expiration_day]), None, rate,
+                                         dividend_yield)[0]
+        if not np.isnan(estimate):
+            return float(estimate)
+        logger.warning("Could not find specific contract in data on %s, strike %s, expiry: %s, type: %s",
+                       date_string, instrument.strike_price, instrument.expiration_date, instrument.option_type.value)
         return None
 
+    def get_instrument_prices(self, date_string, instruments: Sequence[Option], spot: float = None,
+                              rate: float = None, dividend_yield: float = 0.0) -> np.ndarray:
+        """
+        Prices of several contracts on one day, e.g. all option positions of an underlying. Contracts missing from the
+        data are priced from the volatility surface in one batched Black-Scholes call.
+        :param date_string: the quote date. Anything to_ns accepts.
+        :param instruments: option contracts of this underlying.
+        :param spot: underlying price for the estimates. Defaults to the close of the day the surface was built with.
+        :param rate: rate and dividend_yield of the surface that prices missing contracts, see build_vol_surface. None
+        never estimates.
+        :return: float64 array of mids, estimates for missing contracts, 0 for expired contracts and nan for contracts
+        that can't be priced.
+        """
+        target_day = to_ns(date_string) // NS_PER_DAY
+        expiration_days = np.array([to_ns(instrument.expiration_date) // NS_PER_DAY for instrument in instruments],
+                                   dtype=np.int64)
+        prices = np.where(target_day > expiration_days, 0.0, np.nan)
+        rows = self._day_rows.get(target_day)
+        if rows is not None:
+            for k, instrument in enumerate(instruments):
+                if np.isnan(prices[k]):
+                    price = self._find_mid(rows, instrument, expiration_days[k])
+                    prices[k] = np.nan if price is None else price
+
+        missing = np.flatnonzero(np.isnan(prices))
+        if len(missing):
+            prices[missing] = self._estimate_prices(target_day, [instruments[k] for k in missing],
+                                                    expiration_days[missing], spot, rate, dividend_yield)
+            for k in missing[np.isnan(prices[missing])]:
+                logger.warning("Could not price %s on %s.", instruments[k].symbol, date_string)
+        return prices
+
+    def _find_mid(self, rows: Tuple[int, int], instrument: Option, expiration_day: int) -> Optional[float]:
+        start, stop = rows
+        match = np.flatnonzero(
+            (self.strikes[start:stop] == instrument.strike_price) &
+            (self.expiration_days[start:stop] == expiration_day) &
+            (self.is_call[start:stop] == (instrument.option_type.value == "C"))
+        )
+        return float(self.mids[start + match[0]]) if len(match) else None
+
+    def _estimate_prices(self, day: int, instruments: Sequence[Option], expiration_days: np.ndarray,
+                         spot: float = None, rate: float = None, dividend_yield: float = 0.0) -> np.ndarray:
+        vol_surface = self.vol_surfaces.get((rate, dividend_yield)) if rate is not None else None
+        if vol_surface is None:
+            return np.full(len(instruments), np.nan)
+        strikes = np.array([instrument.strike_price for instrument in instruments], dtype=np.float64)
+        is_call = np.array([instrument.option_type.value == "C" for instrument in instruments])
+        return vol_surface.price(day, expiration_days, strikes, is_call, spot)
+
+
+def _in_range(values: np.ndarray, bounds: Tuple[float, float]) -> np.ndarray:
+    low, high = bounds
+    return (values >= low) & (values <= high)
+
+
+class VolSurface(object):
+    """
+    Implied volatility of every quote date on a fixed grid of days to expiration by log-moneyness (log(strike / spot)).
+    A node holds the mean implied volatility of the contracts nearest to it. Empty nodes are filled by linear
+    interpolation along log-moneyness and then along days to expiration, flat beyond the outermost quoted node. Prices
+    are bilinear interpolations of the grid, priced with Black-Scholes.
+    """
+
+    DTE_NODES = np.array([1, 7, 14, 21, 30, 45, 60, 90, 120, 180, 270, 365, 540, 730], dtype=np.float64)
+    LOG_MONEYNESS_NODES = np.linspace(-0.6, 0.6, 25)
+
+    def __init__(self, days: np.ndarray, spots: np.ndarray, day_index: np.ndarray, dte: np.ndarray,
+                 log_moneyness: np.ndarray, iv: np.ndarray, rate: float, dividend_yield: float) -> None:
+        """
+        :param days: sorted quote date ordinals.
+        :param spots: underlying close of each quote date.
+        :param day_index: position in days of every contributing contract.
+        :param dte: days to expiration of every contract.
+        :param log_moneyness: log(strike / spot) of every contract.
+        :param iv: implied volatility of every contract.
+        """
+        self.days = days
+        self.spots = spots
+        self.rate = rate
+        self.dividend_yield = dividend_yield
+        shape = (len(days), len(self.DTE_NODES), len(self.LOG_MONEYNESS_NODES))
+        cell = np.ravel_multi_index((day_index, _nearest_node(self.DTE_NODES, dte),
+                                     _nearest_node(self.LOG_MONEYNESS_NODES, log_moneyness)), shape)
+        size = int(np.prod(shape))
+        counts = np.bincount(cell, minlength=size)
+        with np.errstate(invalid="ignore"):
+            grid = (np.bincount(cell, weights=iv, minlength=size) / counts).reshape(shape)
+        grid = _fill_axis(grid, self.LOG_MONEYNESS_NODES)
+        grid = np.swapaxes(_fill_axis(np.swapaxes(grid, 1, 2), self.DTE_NODES), 1, 2)
+        self.grid = grid.astype(np.float32)
+
+    def volatility(self, day: int, dte: np.ndarray, log_moneyness: np.ndarray) -> np.ndarray:
+        """
+        :return: interpolated volatilities on a quote date, nan if the date has no surface.
+        """
+        position = np.searchsorted(self.days, day)
+        if position == len(self.days) or self.days[position] != day:
+            return np.full(np.shape(dte), np.nan)
+        grid = self.grid[position]
+        i, wi = _bracket(self.DTE_NODES, np.asarray(dte, dtype=np.float64))
+        j, wj = _bracket(self.LOG_MONEYNESS_NODES, np.asarray(log_moneyness, dtype=np.float64))
+        return ((1 - wi) * ((1 - wj) * grid[i, j] + wj * grid[i, j + 1])
+                + wi * ((1 - wj) * grid[i + 1, j] + wj * grid[i + 1, j + 1]))
+
+    def price(self, day: int, expiration_days: np.ndarray, strikes: np.ndarray, is_call: np.ndarray,
+              spot: float = None) -> np.ndarray:
+        """
+        :param spot: underlying price. Defaults to the close of the quote date.
+        :return: Black-Scholes prices of the contracts on a quote date, nan where there's no surface or spot.
+        """
+        from ..utils.black_scholes import bs_price
+
+        if spot is None:
+            position = np.searchsorted(self.days, day)
+            found = position < len(self.days) and self.days[position] == day
+            spot = self.spots[position] if found else np.nan
+        dte = np.maximum(np.asarray(expiration_days, dtype=np.float64) - day, 0.5)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vol = self.volatility(day, dte, np.log(strikes / spot))
+            return bs_price(spot, strikes, dte / DAYS_PER_YEAR, self.rate, vol, is_call, self.dividend_yield)
+
+
+def _nearest_node(nodes: np.ndarray, values: np.ndarray) -> np.ndarray:
+    midpoints = (nodes[1:] + nodes[:-1]) / 2
+    return np.searchsorted(midpoints, values)
+
+
+def _bracket(nodes: np.ndarray, values: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    :return: index of the node below every value and the weight of the node above, clipped to the grid.
+    """
+    i = np.clip(np.searchsorted(nodes, values, side="right") - 1, 0, len(nodes) - 2)
+    weight = np.clip((values - nodes[i]) / (nodes[i + 1] - nodes[i]), 0.0, 1.0)
+    return i, weight
+
+
+def _fill_axis(grid: np.ndarray, nodes: np.ndarray) -> np.ndarray:
+    """
+    Fills nan along the last axis by linear interpolation between the nearest valid nodes, flat beyond them. Lines
+    without any valid node stay nan.
+    """
+    n = grid.shape[-1]
+    index = np.arange(n)
+    valid = ~np.isnan(grid)
+    below = np.maximum.accumulate(np.where(valid, index, -1), axis=-1)
+    above = np.minimum.accumulate(np.where(valid, index, n)[..., ::-1], axis=-1)[..., ::-1]
+    has_below, has_above = below >= 0, above < n
+    below, above = np.clip(below, 0, n - 1), np.clip(above, 0, n - 1)
+    value_below = np.take_along_axis(grid, below, axis=-1)
+    value_above = np.take_along_axis(grid, above, axis=-1)
+    span = nodes[above] - nodes[below]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        weight = np.where(span > 0, (nodes[index] - nodes[below]) / span, 0.0)
+    interpolated = value_below + weight * (value_above - value_below)
+    return np.where(has_below & has_above, interpolated, np.where(has_below, value_below, value_above))
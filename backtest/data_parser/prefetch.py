@@ -0,0 +1,217 @@
+"""
+File: prefetch.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Background loading of monthly market data partitions. While the engine works on one month, the next months
+are read and parsed in worker threads, and months the engine has passed are evicted to stay within a memory budget.>
+"""
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .ohlcv import OHLCV
+from .option_chain import OptionChain
+from ..utils.instrument import Option
+from ..utils.logger import logger
+from ..utils.timeutil import to_ns, NS_PER_DAY
+
+OPTION_PARTITION_DIR = "option-day"
+
+
+def month_of_day(day: int) -> int:
+    """
+    :param day: day ordinal (days since epoch).
+    :return: month ordinal (months since 1970-01), the partition key.
+    """
+    return int(np.datetime64(int(day), "D").astype("datetime64[M]").astype(np.int64))
+
+
+def month_name(month: int) -> str:
+    """
+    :return: the YYYY-MM name of a month ordinal, as used in partition file names.
+    """
+    return str(np.datetime64(int(month), "M"))
+
+
+def option_partition_path(history_data_path: str, symbol: str, month: int) -> str:
+    return os.path.join(history_data_path, symbol, OPTION_PARTITION_DIR, f"{month_name(month)}.csv")
+
+
+class ChunkPrefetcher(object):
+    """
+    Cache of (key, month) chunks filled by a thread pool. get() returns a chunk and schedules the next lookahead months
+    of the same key, so they load while the caller works on the current one.
+
+    Eviction happens on every get(): chunks of months before the current month of their key go first, then the least
+    recently used ones until the loaded chunks fit in max_bytes. The current chunk of each key is never evicted.
+    """
+
+    def __init__(self, loader: Callable[[Hashable, int], object], size_of: Callable[[object], int],
+                 lookahead: int = 2, max_bytes: int = 2 ** 30, max_workers: int = 2) -> None:
+        """
+        :param loader: loads one chunk, loader(key, month). Runs in a worker thread. Returns None if there is no data.
+        :param size_of: bytes held by a loaded chunk.
+        :param lookahead: number of months loaded ahead of the current one.
+        :param max_bytes: memory budget of the loaded chunks.
+        :param max_workers: loader threads.
+        """
+        self.loader = loader
+        self.size_of = size_of
+        self.lookahead = lookahead
+        self.max_bytes = max_bytes
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="prefetch")
+        # Reentrant, because a done callback runs in the submitting thread when the future is already done.
+        self._lock = threading.RLock()
+        self._chunks: "OrderedDict[Tuple[Hashable, int], Future]" = OrderedDict()
+        self._sizes: Dict[Tuple[Hashable, int], int] = {}
+        self._current: Dict[Hashable, int] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, month: int):
+        """
+        :return: the chunk of a key and month, waiting for it if it's still loading.
+        """
+        with self._lock:
+            future = self._chunks.get((key, month))
+            if future is not None and future.done():
+                self.hits += 1
+            else:
+                self.misses += 1
+            if future is None:
+                future = self._submit(key, month)
+            self._chunks.move_to_end((key, month))
+            self._current[key] = month
+            for ahead in range(1, self.lookahead + 1):
+                if (key, month + ahead) not in self._chunks:
+                    self._submit(key, month + ahead)
+            self._evict()
+        return future.result()
+
+    def loaded_bytes(self) -> int:
+        with self._lock:
+            return sum(self._sizes.values())
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            self._chunks.clear()
+            self._sizes.clear()
+
+    def _submit(self, key: Hashable, month: int) -> Future:
+        future = self._executor.submit(self.loader, key, month)
+        self._chunks[(key, month)] = future
+        future.add_done_callback(lambda done: self._record_size((key, month), done))
+        return future
+
+    def _record_size(self, chunk: Tuple[Hashable, int], future: Future) -> None:
+        if future.cancelled() or future.exception() is not None:
+            return
+        size = self.size_of(future.result()) if future.result() is not None else 0
+        with self._lock:
+            if self._chunks.get(chunk) is future:
+                self._sizes[chunk] = size
+
+    def _evict(self) -> None:
+        # Caller holds the lock.
+        for key, month in list(self._chunks):
+            if month < self._current.get(key, month):
+                self._drop((key, month))
+        total = sum(self._sizes.values())
+        for key, month in list(self._chunks):
+            if total <= self.max_bytes:
+                break
+            if self._current.get(key) == month or (key, month) not in self._sizes:
+                continue
+            total -= self._sizes[(key, month)]
+            self._drop((key, month))
+
+    def _drop(self, chunk: Tuple[Hashable, int]) -> None:
+        future = self._chunks.pop(chunk)
+        future.cancel()
+        self._sizes.pop(chunk, None)
+
+
+class PrefetchedOptionChain(object):
+    """
+    Option chain of one underlying read from monthly partitions (<symbol>/option-day/YYYY-MM.csv, see
+    DataParser.partition_option_chain) through a ChunkPrefetcher. It has the lookup methods the engine uses on
+    OptionChain.
+    """
+
+    def __init__(self, underlying_symbol: str, prefetcher: ChunkPrefetcher) -> None:
+        self.underlying_symbol = underlying_symbol
+        self.prefetcher = prefetcher
+
+    def get_month(self, date_string) -> Optional[OptionChain]:
+        """
+        :param date_string: a quote date. Anything to_ns accepts.
+        :return: the OptionChain of the month of that date, or None if there is no partition.
+        """
+        return self.prefetcher.get(self.underlying_symbol, month_of_day(to_ns(date_string) // NS_PER_DAY))
+
+    def get_chain_by_date(self, date_string):
+        chain = self.get_month(date_string)
+        if chain is None:
+            logger.warning("No option chain partition for %s on %s.", self.underlying_symbol, date_string)
+            return None
+        return chain.get_chain_by_date(date_string)
+
+    def get_instrument_price(self, date_string, instrument: Option, rate: float = None,
+                             dividend_yield: float = 0.0) -> Optional[float]:
+        """
+        See OptionChain.get_instrument_price.
+        """
+        chain = self.get_month(date_string)
+        if chain is None:
+            if to_ns(date_string) // NS_PER_DAY > to_ns(instrument.expiration_date) // NS_PER_DAY:
+                return 0.0
+            logger.warning("No option chain data for %s on %s.", self.underlying_symbol, date_string)
+            return None
+        return chain.get_instrument_price(date_string, instrument, rate, dividend_yield)
+
+    def get_instrument_prices(self, date_string, instruments: Sequence[Option], spot: float = None,
+                              rate: float = None, dividend_yield: float = 0.0) -> np.ndarray:
+        """
+        See OptionChain.get_instrument_prices.
+        """
+        chain = self.get_month(date_string)
+        if chain is None:
+            day = to_ns(date_string) // NS_PER_DAY
+            expired = [day > to_ns(instrument.expiration_date) // NS_PER_DAY for instrument in instruments]
+            if not all(expired):
+                logger.warning("No option chain data for %s on %s.", self.underlying_symbol, date_string)
+            return np.where(expired, 0.0, np.nan)
+        return chain.get_instrument_prices(date_string, instruments, spot, rate, dividend_yield)
+
+
+def option_chain_prefetcher(history_data_path: str, lookahead: int = 2, max_bytes: int = 2 ** 30,
+                            max_workers: int = 2, underlying: Callable[[str], Optional[OHLCV]] = None,
+                            rate: float = 0.03) -> ChunkPrefetcher:
+    """
+    :param underlying: returns the ohlcv of an underlying symbol, or None. If given, every loaded month gets the
+    volatility surface that prices missing contracts (OptionChain.build_vol_surface).
+    :param rate: rate of the volatility surfaces.
+    :return: a ChunkPrefetcher whose keys are underlying symbols and whose chunks are parsed monthly OptionChains.
+    """
+    def load(symbol: str, month: int) -> Optional[OptionChain]:
+        path = option_partition_path(history_data_path, symbol, month)
+        if not os.path.exists(path):
+            return None
+        chain = OptionChain(pd.read_csv(path))
+        ohlcv = underlying(symbol) if underlying is not None else None
+        if ohlcv is not None:
+            chain.build_vol_surface(ohlcv, rate)
+        return chain
+
+    def size_of(chain: OptionChain) -> int:
+        arrays = (chain.quote_days, chain.expiration_days, chain.strikes, chain.is_call, chain.mids)
+        surfaces = sum(vol_surface.grid.nbytes for vol_surface in chain.vol_surfaces.values())
+        return int(chain.data.memory_usage(deep=True).sum()) + sum(array.nbytes for array in arrays) + surfaces
+
+    return ChunkPrefetcher(load, size_of, lookahead, max_bytes, max_workers)
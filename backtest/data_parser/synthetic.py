@@ -0,0 +1,176 @@
+"""
+File: synthetic.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Deterministic synthetic market data in the same layout DataParser reads, for benchmarks and experiments.>
+"""
+import os
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from ..utils.black_scholes import bs_greeks, bs_price
+
+OHLCV_COLUMNS = ["ts_event", "rtype", "publisher_id", "instrument_id", "open", "high", "low", "close", "volume", "symbol"]
+
+# Same column order as DataParser.process_option_chain.
+OPTION_COLUMNS = [
+    'underlying_symbol', 'quote_date', 'expiration', 'strike', 'option_type',
+    'open', 'high', 'low', 'close', 'trade_volume', 'vwap',
+    'bid_eod', 'ask_eod', 'bid_size_eod', 'ask_size_eod',
+    'implied_volatility_eod', 'delta_eod', 'gamma_eod', 'theta_eod', 'vega_eod', 'rho_eod',
+    'open_interest'
+]
+
+
+class SyntheticDataGenerator(object):
+    """
+    Writes <root>/<symbol>/ohlcv-hour.csv and <root>/<symbol>/option-day.csv. The same seed and parameters always
+    produce byte-identical files.
+
+    Hourly bars cover 08:00-23:00 UTC on weekdays, i.e. they include extended hours like the vendor files, so
+    session filtering is exercised. The option chain lists monthly expirations (third Friday) with strikes around the
+    underlying close and is priced with Black-Scholes on a skewed volatility.
+    """
+
+    def __init__(self, start_date: str = "2015-01-01", years: int = 1, symbols: List[str] = None,
+                 strikes: int = 20, expirations: int = 6, seed: int = 42, rate: float = 0.03) -> None:
+        """
+        :param start_date: first calendar day of the data, in YYYY-MM-DD format.
+        :param years: number of calendar years to generate.
+        :param symbols: underlying symbols. Each symbol gets an independent price path.
+        :param strikes: number of strikes per expiration and option type.
+        :param expirations: number of listed monthly expirations on each quote date.
+        :param seed: random seed.
+        :param rate: risk free rate used to price the options.
+        """
+        self.start_date = pd.Timestamp(start_date)
+        self.end_date = self.start_date + pd.DateOffset(years=years) - pd.Timedelta(days=1)
+        self.symbols = symbols or ["SPY"]
+        self.strikes = strikes
+        self.expirations = expirations
+        self.seed = seed
+        self.rate = rate
+
+    def generate(self, root: str, options: bool = True) -> Dict[str, Dict[str, int]]:
+        """
+        Writes the files for every symbol.
+        :param root: history data path, the same directory BacktestBase takes as history_data_path.
+        :param options: whether to write the option chain as well.
+        :return: number of rows written per symbol and file.
+        """
+        rows = {}
+        for i, symbol in enumerate(self.symbols):
+            os.makedirs(os.path.join(root, symbol), exist_ok=True)
+            rng = np.random.default_rng([self.seed, i])
+            ohlcv = self.generate_ohlcv(symbol, rng, instrument_id=i + 1)
+            ohlcv.to_csv(os.path.join(root, symbol, "ohlcv-hour.csv"), index=False)
+            rows[symbol] = {"ohlcv": len(ohlcv)}
+            if options:
+                chain = self.generate_option_chain(symbol, ohlcv, rng)
+                chain.to_csv(os.path.join(root, symbol, "option-day.csv"), index=False)
+                rows[symbol]["option"] = len(chain)
+        return rows
+
+    def generate_ohlcv(self, symbol: str, rng: np.random.Generator, instrument_id: int = 1) -> pd.DataFrame:
+        """
+        Hourly geometric brownian motion bars.
+        """
+        hours = pd.date_range(self.start_date, self.end_date + pd.Timedelta(hours=23), freq="h", tz="UTC")
+        hours = hours[(hours.dayofweek < 5) & (hours.hour >= 8)]
+        n = len(hours)
+
+        annual_vol = rng.uniform(0.15, 0.35)
+        step_vol = annual_vol / np.sqrt(252 * 16)
+        log_returns = rng.normal(0.07 / (252 * 16), step_vol, n)
+        close = rng.uniform(50, 500) * np.exp(np.cumsum(log_returns))
+        open_ = np.concatenate([[close[0]], close[:-1]])
+        wick = np.abs(rng.normal(0, step_vol / 2, (2, n)))
+        high = np.maximum(open_, close) * (1 + wick[0])
+        low = np.minimum(open_, close) * (1 - wick[1])
+
+        return pd.DataFrame({
+            "ts_event": hours.strftime("%Y-%m-%d %H:%M:%S+00:00"),
+            "rtype": 34,
+            "publisher_id": 1,
+            "instrument_id": instrument_id,
+            "open": open_.round(2),
+            "high": high.round(2),
+            "low": low.round(2),
+            "close": close.round(2),
+            "volume": rng.integers(1_000, 100_000, n),
+            "symbol": symbol,
+        }, columns=OHLCV_COLUMNS)
+
+    def generate_option_chain(self, symbol: str, ohlcv: pd.DataFrame, rng: np.random.Generator) -> pd.DataFrame:
+        """
+        Daily end of day option chain, priced off the last bar of each day.
+        """
+        ts = pd.to_datetime(ohlcv["ts_event"], utc=True)
+        daily_close = ohlcv["close"].groupby(ts.dt.tz_localize(None).dt.normalize()).last()
+        quote_dates = daily_close.index.values
+        spots = daily_close.values
+
+        first_month = pd.Timestamp(quote_dates[0]).replace(day=1)
+        month_starts = pd.date_range(first_month, periods=len(quote_dates) // 15 + self.expirations + 2, freq="MS")
+        third_fridays = (month_starts + pd.to_timedelta((4 - month_starts.dayofweek) % 7 + 14, unit="D")).values
+
+        # Each quote date lists the next `expirations` expirations that are on or after it.
+        first_expiry = np.searchsorted(third_fridays, quote_dates, side="left")
+        expiry_index = first_expiry[:, None] + np.arange(self.expirations)[None, :]
+        day_index = np.repeat(np.arange(len(quote_dates)), self.expirations)
+        expiry = third_fridays[expiry_index.ravel()]
+
+        strike_step = np.maximum(np.round(spots * 0.01), 1.0)
+        offsets = np.arange(self.strikes) - self.strikes // 2
+        day_index = np.repeat(day_index, self.strikes)
+        expiry = np.repeat(expiry, self.strikes)
+        strike = (np.round(spots[day_index] / strike_step[day_index]) + np.tile(offsets, len(day_index) // self.strikes)) \
+            * strike_step[day_index]
+
+        day_index = np.repeat(day_index, 2)
+        expiry = np.repeat(expiry, 2)
+        strike = np.repeat(strike, 2)
+        is_call = np.tile([True, False], len(day_index) // 2)
+
+        spot = spots[day_index]
+        quote_date = quote_dates[day_index]
+        t = np.maximum((expiry - quote_date) / np.timedelta64(1, "D"), 0.5) / 365.0
+        moneyness = np.log(strike / spot)
+        base_vol = rng.uniform(0.15, 0.3)
+        iv = np.clip(base_vol - 0.4 * moneyness + 0.8 * moneyness ** 2 + rng.normal(0, 0.005, len(spot)), 0.05, 3.0)
+
+        price = bs_price(spot, strike, t, self.rate, iv, is_call)
+        greeks = bs_greeks(spot, strike, t, self.rate, iv, is_call)
+
+        price = np.maximum(price, 0.01)
+        half_spread = np.maximum(0.01, price * rng.uniform(0.01, 0.05, len(price)))
+        n = len(price)
+        nan = np.full(n, np.nan)
+
+        chain = pd.DataFrame({
+            "underlying_symbol": symbol,
+            "quote_date": pd.DatetimeIndex(quote_date).strftime("%Y-%m-%d"),
+            "expiration": pd.DatetimeIndex(expiry).strftime("%Y-%m-%d"),
+            "strike": strike,
+            "option_type": np.where(is_call, "C", "P"),
+            "open": nan,
+            "high": nan,
+            "low": nan,
+            "close": price.round(2),
+            "trade_volume": rng.integers(0, 5_000, n),
+            "vwap": nan,
+            "bid_eod": np.maximum(price - half_spread, 0).round(2),
+            "ask_eod": (price + half_spread).round(2),
+            "bid_size_eod": nan,
+            "ask_size_eod": nan,
+            "implied_volatility_eod": iv.round(4),
+            "delta_eod": greeks["delta"].round(4),
+            "gamma_eod": greeks["gamma"].round(6),
+            "theta_eod": greeks["theta"].round(4),
+            "vega_eod": greeks["vega"].round(4),
+            "rho_eod": greeks["rho"].round(4),
+            "open_interest": rng.integers(0, 50_000, n),
+        }, columns=OPTION_COLUMNS)
+        return chain
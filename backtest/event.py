@@ -4,11 +4,14 @@ Author: Zhicheng Tang
 Created Date: 9/1/24
 Description: <>
 """
+import logging
 from pandas import Timestamp
 from typing import Dict
 
 from backtest.utils.instrument import Instrument, OptionType, Option
 from backtest.utils.constant import SIDE, ORDER_STATUS
+from backtest.utils.logger import logger
+from backtest.utils.timeutil import to_ns
 
 
 
@@ -16,8 +19,12 @@ class Event:
     _id_counter = 0
 
     def __init__(self, ts: Timestamp) -> None:
+        """
+        :param ts: timestamp of the event. The engine works on ts_ns, its UTC nanoseconds, and keeps ts as given.
+        """
         Event._id_counter += 1
         self.ts = ts
+        self.ts_ns = to_ns(ts)
         self.id = Event._id_counter
 
 
@@ -122,7 +129,7 @@ class CanceledOrder(Order):
         self.status = ORDER_STATUS.CANCELED
         self.canceled_date = canceled_date
         self.order_value = order.order_value
-        self.order_id = order.id
+        self.order_id = order.order_id
 
 
 class OptionExpired(Event):
@@ -165,7 +172,9 @@ class OptionAssigned(Event):
                 order_side = SIDE.BUY
 
 
-        print(f"Option is assigned. Date: {self.ts}, Side: {order_side}, Quantity: {abs(quantity * self.instrument.multiplier)}")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("assigned symbol=%s ts=%s side=%s quantity=%s", self.instrument.symbol, self.ts, order_side.name,
+                        abs(quantity * self.instrument.multiplier))
 
         return FilledOrder(
             underlying_stock,
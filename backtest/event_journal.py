@@ -0,0 +1,264 @@
+"""
+File: event_journal.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Binary journal of the events a backtest consumed. Every event is one fixed width record with int64
+timestamps and instruments as ids into a table, so a journal is replayed from a memory-mapped file without building the
+strategy's event objects again.>
+"""
+import json
+import os
+from datetime import date
+from typing import Dict, Iterable, Iterator, List
+
+import numpy as np
+
+from backtest.event import (Event, CashFlowChange, UpdatePortfolio, LimitOrder, FilledOrder, CanceledOrder,
+                            OptionExpired, OptionAssigned)
+from .utils.constant import SIDE
+from .utils.instrument import Instrument, InstrumentType, Option, OptionType, Stock
+from .utils.timeutil import to_ns, to_timestamp
+
+# Record kinds.
+CASH_FLOW = 1
+FILLED_ORDER = 2
+LIMIT_ORDER = 3
+CANCELED_ORDER = 4
+OPTION_EXPIRED = 5
+OPTION_ASSIGNED = 6
+# An UpdatePortfolio is an UPDATE_PORTFOLIO record whose quantity is the number of PRICE records right after it, or -1
+# if it had no prices.
+UPDATE_PORTFOLIO = 7
+PRICE = 8
+
+# price holds the change amount of a cash flow, the filled price of a fill, the limit price of a limit order and the
+# price of a PRICE record. instrument indexes the instrument table, or the symbol table for PRICE records. aux_ns is the
+# filled date of a fill.
+RECORD_DTYPE = np.dtype([
+    ("ts_ns", np.int64),
+    ("aux_ns", np.int64),
+    ("order_id", np.int64),
+    ("quantity", np.int64),
+    ("price", np.float64),
+    ("commission_rate", np.float64),
+    ("instrument", np.int32),
+    ("kind", np.uint8),
+    ("side", np.uint8),
+    ("_pad", np.uint16),
+])
+
+SIDES: List[SIDE] = list(SIDE)
+_SIDE_CODES: Dict[SIDE, int] = {side: code for code, side in enumerate(SIDES)}
+NO_ID = -1
+
+
+def _meta_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def _instrument_to_json(instrument: Instrument) -> Dict:
+    if instrument.type == InstrumentType.OPTION:
+        return {"type": instrument.type.value, "underlying_symbol": instrument.underlying_symbol,
+                "expiration_date": instrument.expiration_date.isoformat(), "strike_price": instrument.strike_price,
+                "option_type": instrument.option_type.value}
+    return {"type": instrument.type.value, "symbol": instrument.symbol}
+
+
+def _instrument_from_json(entry: Dict) -> Instrument:
+    if entry["type"] == InstrumentType.OPTION.value:
+        return Option(entry["underlying_symbol"], date.fromisoformat(entry["expiration_date"]), entry["strike_price"],
+                      OptionType(entry["option_type"]))
+    return Stock(entry["symbol"])
+
+
+class EventJournalWriter(object):
+    """
+    Appends events to a journal. Records are buffered in a structured array and written in chunks. The journal only
+    appears at path once close() succeeds.
+    """
+
+    def __init__(self, path: str, chunk_size: int = 65536) -> None:
+        self.path = path
+        self._tmp_path = f"{path}.tmp"
+        self._file = open(self._tmp_path, "wb")
+        self._buffer = np.zeros(chunk_size, dtype=RECORD_DTYPE)
+        self._size = 0
+        # Records and events written. An UpdatePortfolio is one record plus one per price.
+        self.count = 0
+        self.event_count = 0
+        # Instruments are interned, so their dense_id identifies them within the process. The journal keeps its own
+        # ids, in order of first appearance, because dense ids differ between processes.
+        self._instrument_ids: Dict[int, int] = {}
+        self.instruments: List[Instrument] = []
+        self._symbol_ids: Dict[str, int] = {}
+        self.symbols: List[str] = []
+
+    def record(self, events: Iterable[Event]) -> Iterator[Event]:
+        """
+        Writes every event as it's consumed from the returned iterator.
+        """
+        for event in events:
+            self.append(event)
+            yield event
+
+    def append(self, event: Event) -> None:
+        self.event_count += 1
+        if isinstance(event, FilledOrder):
+            self._add(event.ts_ns, FILLED_ORDER, self._instrument_id(event.instrument), _SIDE_CODES[event.side],
+                      event.quantity, event.filled_price, event.commission_rate,
+                      to_ns(event.filled_date) if event.filled_date is not None else event.ts_ns)
+        elif isinstance(event, LimitOrder):
+            self._add(event.ts_ns, LIMIT_ORDER, self._instrument_id(event.instrument), _SIDE_CODES[event.side],
+                      event.quantity, event.limit_price, event.commission_rate, order_id=event.order_id)
+        elif isinstance(event, CanceledOrder):
+            self._add(event.ts_ns, CANCELED_ORDER, self._instrument_id(event.instrument), _SIDE_CODES[event.side],
+                      event.quantity, order_id=event.order_id)
+        elif isinstance(event, CashFlowChange):
+            self._add(event.ts_ns, CASH_FLOW, price=event.change_amount)
+        elif isinstance(event, OptionAssigned):
+            self._add(event.ts_ns, OPTION_ASSIGNED, self._instrument_id(event.instrument))
+        elif isinstance(event, OptionExpired):
+            self._add(event.ts_ns, OPTION_EXPIRED, self._instrument_id(event.instrument))
+        elif isinstance(event, UpdatePortfolio):
+            prices = event.prices
+            self._add(event.ts_ns, UPDATE_PORTFOLIO, quantity=len(prices) if prices is not None else -1)
+            for symbol, price in (prices or {}).items():
+                self._add(event.ts_ns, PRICE, self._symbol_id(symbol), price=price)
+        else:
+            self.event_count -= 1
+            raise ValueError(f"Invalid event type for a journal: {type(event)}.")
+
+    def close(self) -> None:
+        """
+        Writes the remaining records and the instrument and symbol tables, then moves the journal to path.
+        """
+        self._flush()
+        self._file.close()
+        meta = {"dtype": RECORD_DTYPE.descr, "count": self.count, "events": self.event_count, "sides": [side.value for side in SIDES],
+                "instruments": [_instrument_to_json(instrument) for instrument in self.instruments],
+                "symbols": self.symbols}
+        with open(f"{_meta_path(self.path)}.tmp", "w") as f:
+            json.dump(meta, f)
+        os.replace(self._tmp_path, self.path)
+        os.replace(f"{_meta_path(self.path)}.tmp", _meta_path(self.path))
+
+    def abort(self) -> None:
+        self._file.close()
+        os.remove(self._tmp_path)
+
+    def _add(self, ts_ns: int, kind: int, instrument: int = NO_ID, side: int = 0, quantity: int = 0,
+             price: float = 0.0, commission_rate: float = 0.0, aux_ns: int = 0, order_id=None) -> None:
+        self._buffer[self._size] = (ts_ns, aux_ns, NO_ID if order_id is None else order_id, quantity, price,
+                                    commission_rate, instrument, kind, side, 0)
+        self._size += 1
+        self.count += 1
+        if self._size == len(self._buffer):
+            self._flush()
+
+    def _flush(self) -> None:
+        self._file.write(self._buffer[:self._size].tobytes())
+        self._size = 0
+
+    def _instrument_id(self, instrument: Instrument) -> int:
+        journal_id = self._instrument_ids.get(instrument.dense_id)
+        if journal_id is None:
+            journal_id = self._instrument_ids[instrument.dense_id] = len(self.instruments)
+            self.instruments.append(instrument)
+        return journal_id
+
+    def _symbol_id(self, symbol: str) -> int:
+        symbol_id = self._symbol_ids.get(symbol)
+        if symbol_id is None:
+            symbol_id = self._symbol_ids[symbol] = len(self.symbols)
+            self.symbols.append(symbol)
+        return symbol_id
+
+
+class EventJournal(object):
+    """
+    A journal opened for replay. records is a read only np.memmap of RECORD_DTYPE, time sorted as recorded. Pass the
+    journal itself to run_backtest to replay it. len() is the number of events, which is less than the number of records
+    when an UpdatePortfolio has prices.
+    """
+
+    def __init__(self, path: str) -> None:
+        with open(_meta_path(path)) as f:
+            meta = json.load(f)
+        if np.dtype([tuple(field) for field in meta["dtype"]]) != RECORD_DTYPE:
+            raise ValueError(f"Journal {path} has a different record layout.")
+        self.path = path
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", shape=(meta["count"],)) if meta["count"] \
+            else np.zeros(0, dtype=RECORD_DTYPE)
+        self.sides: List[SIDE] = [SIDE(value) for value in meta["sides"]]
+        self.instruments: List[Instrument] = [_instrument_from_json(entry) for entry in meta["instruments"]]
+        self.symbols: List[str] = meta["symbols"]
+        self.event_count: int = meta["events"] if "events" in meta else int((self.records["kind"] != PRICE).sum())
+
+    def __len__(self) -> int:
+        return self.event_count
+
+    @staticmethod
+    def write(path: str, events: Iterable[Event]) -> None:
+        """
+        Records events without running a backtest.
+        """
+        writer = EventJournalWriter(path)
+        try:
+            for event in events:
+                writer.append(event)
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+
+    def events(self) -> Iterator[Event]:
+        """
+        Builds the recorded events again, for inspection or code that needs event objects. run_backtest doesn't use it.
+        """
+        records = self.records
+        i = 0
+        while i < len(records):
+            record = records[i]
+            kind, ts = int(record["kind"]), to_timestamp(int(record["ts_ns"]))
+            instrument = self.instruments[record["instrument"]] if kind not in (CASH_FLOW, UPDATE_PORTFOLIO, PRICE) \
+                else None
+            i += 1
+            if kind == FILLED_ORDER:
+                yield FilledOrder(instrument, ts, self.sides[record["side"]], int(record["quantity"]),
+                                  float(record["price"]), to_timestamp(int(record["aux_ns"])),
+                                  float(record["commission_rate"]))
+            elif kind == LIMIT_ORDER:
+                yield self.limit_order(instrument, ts, self.sides[record["side"]], int(record["quantity"]),
+                                       float(record["price"]), float(record["commission_rate"]),
+                                       int(record["order_id"]))
+            elif kind == CANCELED_ORDER:
+                order = self.limit_order(instrument, ts, self.sides[record["side"]], int(record["quantity"]), 0.0,
+                                         0.0, int(record["order_id"]))
+                yield CanceledOrder(order, ts)
+            elif kind == CASH_FLOW:
+                yield CashFlowChange(ts, float(record["price"]))
+            elif kind == OPTION_EXPIRED:
+                yield OptionExpired(ts, instrument)
+            elif kind == OPTION_ASSIGNED:
+                yield OptionAssigned(ts, instrument)
+            elif kind == UPDATE_PORTFOLIO:
+                n_prices = int(record["quantity"])
+                prices = None
+                if n_prices >= 0:
+                    rows = records[i:i + n_prices]
+                    prices = {self.symbols[symbol]: price
+                              for symbol, price in zip(rows["instrument"].tolist(), rows["price"].tolist())}
+                    i += n_prices
+                yield UpdatePortfolio(ts, prices)
+            else:
+                raise ValueError(f"Invalid journal record kind {kind} in {self.path}.")
+
+    @staticmethod
+    def limit_order(instrument: Instrument, ts, side: SIDE, quantity: int, limit_price: float, commission_rate: float,
+                    order_id: int) -> LimitOrder:
+        """
+        :return: a LimitOrder with the order id it was recorded with.
+        """
+        order = LimitOrder(instrument, ts, side, quantity, limit_price, commission_rate)
+        order.order_id = order_id
+        return order
@@ -2,5 +2,37 @@
 File: __init__.py
 Author: aaronlalala
 Created Date: 12/21/24
-Description: <>
+Description: <Public names of the submodules, imported on first access (PEP 562), so importing the package alone doesn't
+load pandas or scikit-learn.>
 """
+import importlib
+
+_EXPORTS = {
+    "WalkForwardWindow": "model_fitting",
+    "prepare_data": "model_fitting",
+    "generate_windows": "model_fitting",
+    "fit_model": "model_fitting",
+    "fit_model_parallel": "model_fitting",
+    "fit_model_incremental": "model_fitting",
+    "validate_binary_model": "model_fitting",
+    "test_model": "model_fitting",
+    "tune_model": "tuning",
+    "candidate_params": "tuning",
+    "evaluate_windows": "evaluation",
+    "exponential_time_weighted_indices": "sampling",
+    "exponential_time_weighted_samping": "sampling",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name: str):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{_EXPORTS[name]}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,107 @@
+"""
+File: evaluation
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Walk-forward evaluation. Classification and return weighted metrics of every window (or any other grouping,
+e.g. model variant and window) computed at once with grouped numpy operations over the concatenated results.>
+"""
+from typing import Dict, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+def evaluate_windows(results: pd.DataFrame, feature_forward: pd.DataFrame, by: Sequence[str] = ("window",),
+                     top_fraction: float = 0.1) -> pd.DataFrame:
+    """
+    :param results: concatenated predictions with pred, pred_proba and the by columns, indexed like feature_forward,
+    e.g. the validation or test results of fit_model.
+    :param feature_forward: dataframe of features, the forward return and the label.
+    :param by: columns of results to group by. Use an empty tuple to pool all rows.
+    :param top_fraction: fraction of the rows with the highest pred_proba used for top_precision.
+    :return: one row per group with the by columns and:
+    - n, positives: number of rows and of positive labels.
+    - accuracy, precision, recall, f1 and roc_auc. roc_auc is nan for a group with a single class.
+    - weighted_hit_rate: accuracy weighted by the absolute forward return.
+    - top_precision: precision of the top_fraction rows by pred_proba (top decile by default).
+    - long_return: mean forward return of the rows predicted positive.
+    """
+    rows = feature_forward.index.get_indexer(results.index)
+    if (rows < 0).any():
+        raise ValueError("results has rows that are not in feature_forward.")
+    y = feature_forward["label"].to_numpy(dtype=np.float64)[rows] > 0
+    forward_return = feature_forward["return"].to_numpy(dtype=np.float64)[rows]
+    pred = results["pred"].to_numpy(dtype=np.float64) > 0
+    proba = results["pred_proba"].to_numpy(dtype=np.float64)
+
+    by = list(by)
+    if by:
+        groups = pd.MultiIndex.from_frame(results[by]).factorize()[0]
+        # Group numbers follow the first appearance, so the first row of each group holds its keys.
+        keys = results[by].iloc[np.unique(groups, return_index=True)[1]]
+    else:
+        groups, keys = np.zeros(len(results), dtype=np.int64), pd.DataFrame(index=[0])
+    metrics = grouped_binary_metrics(groups, len(keys), y, pred, proba, forward_return, top_fraction)
+    return pd.concat([keys.reset_index(drop=True), pd.DataFrame(metrics)], axis=1)
+
+
+def grouped_binary_metrics(groups: np.ndarray, n_groups: int, y: np.ndarray, pred: np.ndarray, proba: np.ndarray,
+                           forward_return: np.ndarray, top_fraction: float = 0.1) -> Dict[str, np.ndarray]:
+    """
+    :param groups: group number of every row, in [0, n_groups).
+    :param y: boolean labels.
+    :param pred: boolean predictions.
+    :param proba: predicted probability of the positive class.
+    :param forward_return: forward return of every row.
+    :return: metric name to an array with one value per group. See evaluate_windows.
+    """
+    def count(weights=None):
+        return np.bincount(groups, weights=weights, minlength=n_groups).astype(np.float64)
+
+    n = count()
+    positives = count(y)
+    tp = count(pred & y)
+    predicted = count(pred)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        precision = np.where(predicted > 0, tp / predicted, 0.0)
+        recall = np.where(positives > 0, tp / positives, 0.0)
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / (precision + recall), 0.0)
+        abs_return = np.abs(forward_return)
+        weighted_hit_rate = count(abs_return * (pred == y)) / count(abs_return)
+        long_return = count(np.where(pred, forward_return, 0.0)) / predicted
+
+    # Sort by group, then pred_proba. Every group is a contiguous block, ranked in ascending pred_proba.
+    order = np.lexsort((proba, groups))
+    sorted_groups, sorted_proba, sorted_y = groups[order], proba[order], y[order]
+    group_start = np.searchsorted(sorted_groups, np.arange(n_groups), side="left")
+    position = np.arange(len(order)) - group_start[sorted_groups]
+
+    # ROC-AUC from the Mann-Whitney U statistic, with average ranks for ties.
+    new_tie = np.r_[True, (np.diff(sorted_groups) != 0) | (np.diff(sorted_proba) != 0)]
+    tie_start = np.flatnonzero(new_tie)
+    tie_id = np.cumsum(new_tie) - 1
+    tie_size = np.diff(np.r_[tie_start, len(order)])
+    ranks = position[tie_start][tie_id] + (tie_size[tie_id] + 1) / 2
+    positive_rank_sum = np.bincount(sorted_groups, weights=ranks * sorted_y, minlength=n_groups)
+    negatives = n - positives
+    with np.errstate(divide="ignore", invalid="ignore"):
+        roc_auc = (positive_rank_sum - positives * (positives + 1) / 2) / (positives * negatives)
+    roc_auc[(positives == 0) | (negatives == 0)] = np.nan
+
+    # Top rows of a group are the last top_k of its block.
+    top_k = np.maximum(1, np.ceil(n * top_fraction)).astype(np.int64)
+    in_top = position >= (n - top_k)[sorted_groups]
+    top_precision = np.bincount(sorted_groups, weights=sorted_y & in_top, minlength=n_groups) / top_k
+
+    return {
+        "n": n.astype(np.int64),
+        "positives": positives.astype(np.int64),
+        "accuracy": count(pred == y) / n,
+        "precision": precision,
+        "recall": recall,
+        "f1": f1,
+        "roc_auc": roc_auc,
+        "weighted_hit_rate": weighted_hit_rate,
+        "top_precision": top_precision,
+        "long_return": long_return,
+    }
@@ -4,24 +4,102 @@ Author: Zhicheng Tang
 Created Date: 12/21/24
 Description: <>
 """
-from typing import Dict, List
-# No need to use process pool executor as the computations are not conducted in Python.
-from concurrent.futures import ThreadPoolExecutor
-
+import hashlib
+import logging
+import math
+import os
+import pickle
+from typing import Dict, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
-from sklearn.base import clone
-from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
 
-def slice_dataframe(df: pd.DataFrame, start_time: datetime, end_time: datetime) -> pd.DataFrame:
-    sliced_df= df.copy()
-    sliced_df["timestamp"] = pd.to_datetime(sliced_df["ts_event"])
-    condition = (sliced_df["timestamp"] >= start_time) & (sliced_df["timestamp"] <= end_time)
-    return sliced_df[condition]
+from ..utils.logger import logger
+from ..utils.timeutil import to_ns, to_ns_array
+from .parallel import (FeatureMatrix, fit_window, get_executor, limit_threads, row_count, set_inner_n_jobs,
+                       take_rows)
+
+NON_FEATURE_COLUMNS = ["ts_event", "return", "label"]
+
+
+class WalkForwardWindow(NamedTuple):
+    """
+    Positional [start, stop) row ranges of one walk-forward step.
+    """
+    train: Tuple[int, int]
+    validation: Tuple[int, int]
+    test: Tuple[int, int]
+
+
+def generate_windows(df: pd.DataFrame, start_time: Optional[datetime], end_time: datetime, retrain_freq: timedelta,
+                     test_window: timedelta, validation_window: timedelta, min_training_window: timedelta,
+                     training_window: Optional[timedelta] = None,
+                     embargo: timedelta = timedelta(0)) -> List[WalkForwardWindow]:
+    """
+    Rolling walk-forward windows as positional ranges into df. ts_event is parsed once and every boundary is a
+    binary search on the sorted time array, so no rows are copied. See prepare_data for the meaning of the windows.
+    :param df: dataframe sorted by ts_event.
+    :param start_time: start time of the data set. The first row if None.
+    :param end_time: end time of the data set.
+    :param retrain_freq: the frequency of the model being trained again to accommodate new data.
+    :param test_window: the time window held out for measuring the performance of model only.
+    :param validation_window: the time window used for hyperparameters tuning.
+    :param min_training_window: minimum size of the training data set.
+    :param training_window: length of a sliding training window. None means an expanding window from the first row.
+    :param embargo: gap left out before the validation window and before the test window, so that samples whose
+    forward return overlaps the next block are purged.
+    :return: list of WalkForwardWindow in time order.
+    """
+    ts = to_ns_array(df["ts_event"])
+    if len(ts) > 1 and (np.diff(ts) < 0).any():
+        raise ValueError("df must be sorted by ts_event.")
+    return _generate_windows(ts, start_time, end_time, retrain_freq, test_window, validation_window,
+                             min_training_window, training_window, embargo)
+
+
+def _generate_windows(ts: np.ndarray, start_time: Optional[datetime], end_time: datetime, retrain_freq: timedelta,
+                      test_window: timedelta, validation_window: timedelta, min_training_window: timedelta,
+                      training_window: Optional[timedelta], embargo: timedelta) -> List[WalkForwardWindow]:
+    one_second = pd.Timedelta(seconds=1).value
+    retrain_ns = pd.Timedelta(retrain_freq).value
+    test_ns = pd.Timedelta(test_window).value
+    validation_ns = pd.Timedelta(validation_window).value
+    min_training_ns = pd.Timedelta(min_training_window).value
+    training_ns = pd.Timedelta(training_window).value if training_window is not None else None
+    embargo_ns = pd.Timedelta(embargo).value
+
+    lower = 0 if start_time is None else int(np.searchsorted(ts, to_ns(start_time), side="left"))
+    end_ns = to_ns(end_time)
+    if lower >= np.searchsorted(ts, end_ns, side="right"):
+        return []
+    first_ns = ts[lower]
+
+    windows = []
+    while (end_ns - validation_ns - test_ns - embargo_ns - first_ns) > min_training_ns:
+        test_start = end_ns - test_ns
+        validation_start = test_start - validation_ns
+        train_end = validation_start - embargo_ns - one_second
+        train_start = first_ns if training_ns is None else max(first_ns, train_end - training_ns)
+        starts = np.searchsorted(ts, [train_start, validation_start, test_start], side="left")
+        stops = np.searchsorted(ts, [train_end, test_start - embargo_ns - one_second, end_ns], side="right")
+        windows.append(WalkForwardWindow(*((int(max(start, lower)), int(max(stop, lower)))
+                                           for start, stop in zip(starts, stops))))
+        end_ns -= retrain_ns
+    return windows[::-1]
+
+
+def iter_window_frames(df: pd.DataFrame, windows: List[WalkForwardWindow]) -> Iterator[Tuple[pd.DataFrame, ...]]:
+    """
+    Lazily yields the (train, validation, test) frames of each window as positional slices of df.
+    """
+    for window in windows:
+        yield tuple(df.iloc[start:stop] for start, stop in window)
 
 
 def prepare_data(df: pd.DataFrame, start_time: datetime, end_time: datetime, retrain_freq: timedelta, test_window: timedelta,
-                 validation_window: timedelta, min_training_window: timedelta) -> List[List[pd.Index]]:
+                 validation_window: timedelta, min_training_window: timedelta, training_window: timedelta = None,
+                 embargo: timedelta = timedelta(0)) -> List[List[pd.Index]]:
     """
     :param df:
     :param start_time: start time of the data set.
@@ -30,7 +108,10 @@ def prepare_data(df: pd.DataFrame, start_time: datetime, end_time: datetime, ret
     :param test_window: the time window of the data set that is held out for measuring the performance of model only.
     :param validation_window: the time window of the data set that is used for hyperparameters tuning.
     :param min_training_window: minimum size of the training data set.
-    :return:
+    :param training_window: length of a sliding training window. None keeps the expanding window.
+    :param embargo: gap purged before the validation and test windows.
+    :return: list of [train idx, validation idx, test idx] index labels of df. Use generate_windows directly to get
+    positional ranges instead.
 
     This method is conducting a rolling training process. The model is trained every certain amount of time. For example,
     the model is trained every year, and will be used for the next year. The test window exactly matches the frequency of
@@ -55,39 +136,39 @@ def prepare_data(df: pd.DataFrame, start_time: datetime, end_time: datetime, ret
     min_training_window = timedelta(days=365 * 2)
     results = prepare_data(df, start_time, end_time, retrained_freq, test_window, validation_window, min_training_window)
     """
-    df = df.copy()
-    df["timestamp"] = pd.to_datetime(df["ts_event"])
-    df.sort_values(by=["timestamp"], inplace=True)
-    if start_time is None:
-        start_time = df.iloc[0]['timestamp']
-    df = df[(df["timestamp"] <= end_time) & (df["timestamp"] >= start_time)]
-    batch_indices = []
-    while (end_time - validation_window - test_window - df.iloc[0]["timestamp"]) > min_training_window:
-        test_start_time = end_time - test_window
-        test_index = slice_dataframe(df, test_start_time, end_time).index
-        validation_start_time = test_start_time - validation_window
-        validation_index = slice_dataframe(df, validation_start_time, test_start_time - timedelta(seconds=1)).index
-        train_index = slice_dataframe(df, df.iloc[0]["timestamp"], validation_start_time - timedelta(seconds=1)).index
-        batch_indices.append([train_index, validation_index, test_index])
-        end_time = end_time - retrain_freq
-    return batch_indices[::-1]
+    ts = to_ns_array(df["ts_event"])
+    order = np.argsort(ts, kind="stable")
+    windows = _generate_windows(ts[order], start_time, end_time, retrain_freq, test_window, validation_window,
+                                min_training_window, training_window, embargo)
+    sorted_index = df.index[order]
+    return [[sorted_index[start:stop] for start, stop in window] for window in windows]
+
+def _split_window(feature_forward: pd.DataFrame,
+                  idx: Union[WalkForwardWindow, List[pd.Index]]) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    :return: train, validation and test frames. Positional windows are slices, index labels are looked up.
+    """
+    if isinstance(idx, WalkForwardWindow):
+        return tuple(feature_forward.iloc[start:stop] for start, stop in idx)
+    train_index, validation_index, test_index = idx
+    return feature_forward.loc[train_index], feature_forward.loc[validation_index], feature_forward.loc[test_index]
+
 
 def fit_model(input_model, feature_forward: pd.DataFrame, indices: List[List[pd.Index]]) -> (pd.DataFrame, pd.DataFrame):
     """
     :param input_model: machine learning model.
     :param feature_forward: dataframe of features and the forward return.
-    :param indices: list of [train idx, validation idx, test idx].
-    :return: two dataframes. Each has ts_event, model pred, pred_proba and label.
+    :param indices: list of [train idx, validation idx, test idx], or WalkForwardWindow positional ranges.
+    :return: two dataframes. Each has ts_event, model pred, pred_proba and the window position.
     """
-    validation_results = pd.DataFrame({"ts_event": [], "pred": [], "pred_proba": []})
-    test_results = pd.DataFrame({"ts_event": [], "pred": [], "pred_proba": []})
+    # scikit-learn is imported on first use, so importing this module stays cheap.
+    from sklearn.base import clone
+    validation_results = pd.DataFrame({"ts_event": [], "pred": [], "pred_proba": [], "window": []})
+    test_results = pd.DataFrame({"ts_event": [], "pred": [], "pred_proba": [], "window": []})
 
-    for idx in indices:
+    for i, idx in enumerate(indices):
         model = clone(input_model)
-        train_index, validation_index, test_index = idx
-        df_train = feature_forward.loc[train_index]
-        df_validation = feature_forward.loc[validation_index]
-        df_test = feature_forward.loc[test_index]
+        df_train, df_validation, df_test = _split_window(feature_forward, idx)
 
         model.fit(df_train.drop(columns=["ts_event", "return", "label"]), df_train["label"])
 
@@ -95,73 +176,283 @@ def fit_model(input_model, feature_forward: pd.DataFrame, indices: List[List[pd.
         validation_result["pred"] = model.predict(df_validation.drop(columns=["ts_event", "return", "label"]))
         validation_result["pred_proba"] = model.predict_proba(
             df_validation.drop(columns=["ts_event", "return", "label"]))[:, 1]
+        validation_result["window"] = i
         validation_results = pd.concat([validation_results, validation_result], axis=0)
 
         test_result = df_test[["ts_event"]]
         test_result["pred"] = model.predict(df_test.drop(columns=["ts_event", "return", "label"]))
         test_result["pred_proba"] = model.predict_proba(df_test.drop(columns=["ts_event", "return", "label"]))[:, 1]
+        test_result["window"] = i
         test_results = pd.concat([test_results, test_result], axis=0)
 
     return validation_results, test_results
 
 
-def fit_model_parallel(input_model, feature_forward: pd.DataFrame, indices: List[List[pd.Index]]) -> (pd.DataFrame, pd.DataFrame):
+def fit_model_parallel(input_model, feature_forward: pd.DataFrame, indices: List[List[pd.Index]], backend: str = "thread",
+                       n_workers: int = None, inner_n_jobs: Optional[int] = 1,
+                       blas_threads: int = None) -> (pd.DataFrame, pd.DataFrame):
     """
     :param input_model: machine learning model.
     :param feature_forward: dataframe of features and the forward return.
-    :param indices: list of [train idx, validation idx, test idx].
-    :return: two dataframes. Each has ts_event, model pred, pred_proba and label.
+    :param indices: list of [train idx, validation idx, test idx], or WalkForwardWindow positional ranges.
+    :param backend: "thread", "process" or "loky" (a reusable process pool). Estimators that hold the GIL, and the
+    pandas work around them, only scale with processes.
+    :param n_workers: number of workers. Defaults to the number of cpus.
+    :param inner_n_jobs: n_jobs set on the estimator. None leaves the estimator as it is.
+    :param blas_threads: BLAS/OpenMP threads per worker. Defaults to cpus // (n_workers * inner_n_jobs), at least 1.
+    :return: two dataframes. Each has ts_event, model pred, pred_proba and the window position.
+
+    The feature matrix and labels are converted once to contiguous arrays, placed in shared memory for the process
+    backends, and workers only receive row ranges. Windows are submitted longest training set first, so that one big
+    expanding window does not start last and leave the other workers idle.
     """
+    from sklearn.base import clone
+    cpus = os.cpu_count() or 1
+    n_workers = n_workers or cpus
+    if blas_threads is None:
+        blas_threads = max(1, cpus // (n_workers * (inner_n_jobs or 1)))
+
+    feature_columns = [column for column in feature_forward.columns if column not in NON_FEATURE_COLUMNS]
+    windows = [_window_rows(feature_forward, idx) for idx in indices]
+    order = sorted(range(len(windows)), key=lambda i: -row_count(windows[i][0]))
+    shared = backend != "thread"
+
+    with FeatureMatrix(feature_forward[feature_columns].to_numpy(), feature_forward["label"].to_numpy(),
+                       shared=shared) as matrix:
+        executor, owned = get_executor(backend, n_workers)
+        # Threads share the process wide BLAS pool, so the limit is applied once around all of them.
+        with limit_threads(None if shared else blas_threads):
+            try:
+                futures = {i: executor.submit(fit_window, set_inner_n_jobs(clone(input_model), inner_n_jobs), matrix,
+                                              windows[i], blas_threads if shared else None) for i in order}
+                results = [futures[i].result() for i in range(len(windows))]
+            finally:
+                if owned:
+                    executor.shutdown()
 
-    def train(idx):
-        model = clone(input_model)
-        train_index, validation_index, test_index = idx
-        df_train = feature_forward.loc[train_index]
-        df_validation = feature_forward.loc[validation_index]
-        df_test = feature_forward.loc[test_index]
-
-        model.fit(df_train.drop(columns=["ts_event", "return", "label"]), df_train["label"])
+    validation_results, test_results = [], []
+    for i, ((_, validation_rows, test_rows), (val_pred, val_proba, test_pred, test_proba)) in \
+            enumerate(zip(windows, results)):
+        validation_results.append(_prediction_frame(feature_forward, validation_rows, val_pred, val_proba, i))
+        test_results.append(_prediction_frame(feature_forward, test_rows, test_pred, test_proba, i))
 
-        validation_result = df_validation[["ts_event"]]
-        validation_result["pred"] = model.predict(df_validation.drop(columns=["ts_event", "return", "label"]))
-        validation_result["pred_proba"] = model.predict_proba(
-            df_validation.drop(columns=["ts_event", "return", "label"]))[:, 1]
-        # validation_results = pd.concat([validation_results, validation_result], axis=0)
+    validation_results_df = pd.concat(validation_results, axis=0)
+    test_results_df = pd.concat(test_results, axis=0)
 
-        test_result = df_test[["ts_event"]]
-        test_result["pred"] = model.predict(df_test.drop(columns=["ts_event", "return", "label"]))
-        test_result["pred_proba"] = model.predict_proba(df_test.drop(columns=["ts_event", "return", "label"]))[:, 1]
-        # test_results = pd.concat([test_results, test_result], axis=0)
+    return validation_results_df, test_results_df
 
-        return validation_result, test_result
 
+def fit_model_incremental(input_model, feature_forward: pd.DataFrame, indices: List[List[pd.Index]],
+                          checkpoint_dir: str = None, n_estimators_step: int = None,
+                          classes: Tuple = (0, 1)) -> (pd.DataFrame, pd.DataFrame):
+    """
+    Walk-forward fitting that carries the model forward instead of refitting every window from scratch. Expanding
+    windows from prepare_data/generate_windows are supersets of the previous training set, so only the new rows are
+    trained on:
+    - estimators with partial_fit (SGD, naive Bayes, ...) are updated with partial_fit on the new rows.
+    - estimators with warm_start and n_estimators/max_iter (forests, gradient boosting) get extra estimators fitted on
+    the new rows.
+    - other warm_start estimators (e.g. LogisticRegression) are refitted on the full window starting from the previous
+    solution.
+    Everything else, and any window that is not a superset of the previous one (sliding windows), is refitted.
+    :param input_model: machine learning model.
+    :param feature_forward: dataframe of features and the forward return.
+    :param indices: list of [train idx, validation idx, test idx], or WalkForwardWindow positional ranges.
+    :param checkpoint_dir: if set, the model and predictions of every window are saved there, and a rerun resumes after
+    the last window whose checkpoint matches: same window rows, model parameters, feature columns and data.
+    :param n_estimators_step: estimators added per window for warm_start ensembles. Defaults to the initial number of
+    estimators scaled by the share of new rows in the training set.
+    :param classes: labels passed to the first partial_fit call.
+    :return: two dataframes. Each has ts_event, model pred, pred_proba and the window position.
+    """
+    from sklearn.base import clone
+    feature_columns = [column for column in feature_forward.columns if column not in NON_FEATURE_COLUMNS]
+    features = feature_forward[feature_columns].to_numpy()
+    labels = feature_forward["label"].to_numpy()
+    windows = [_window_rows(feature_forward, idx) for idx in indices]
+    if checkpoint_dir is not None:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+    params = input_model.get_params() if hasattr(input_model, "get_params") else {}
+    # Ensemble size parameter: n_estimators, or max_iter for histogram gradient boosting where it counts trees.
+    size_param = "n_estimators" if "n_estimators" in params else \
+        "max_iter" if type(input_model).__name__.startswith("HistGradientBoosting") else None
+    if hasattr(input_model, "partial_fit"):
+        mode = "partial_fit"
+    elif "warm_start" in params:
+        mode = "add_estimators" if size_param is not None else "warm_start"
+    else:
+        mode = "refit"
+
+    model, previous_train = None, None
     validation_results, test_results = [], []
+    resuming = checkpoint_dir is not None
+    run_fingerprint = _run_fingerprint(input_model, feature_columns, n_estimators_step, classes) \
+        if checkpoint_dir is not None else None
+    for i, (train_rows, validation_rows, test_rows) in enumerate(windows):
+        checkpoint_path = os.path.join(checkpoint_dir, f"window_{i:04d}.pkl") if checkpoint_dir else None
+        fingerprint = _window_fingerprint(run_fingerprint, features, labels, windows[i]) if checkpoint_dir else None
+        checkpoint = _load_checkpoint(checkpoint_path, windows[i], fingerprint) if resuming else None
+        if checkpoint is None:
+            resuming = False
+            new_rows = _new_rows(previous_train, train_rows)
+            if model is None or new_rows is None or mode == "refit":
+                model = clone(input_model)
+                if mode == "partial_fit":
+                    model.partial_fit(take_rows(features, train_rows), take_rows(labels, train_rows),
+                                      classes=np.asarray(classes))
+                else:
+                    model.fit(take_rows(features, train_rows), take_rows(labels, train_rows))
+            elif row_count(new_rows) > 0:
+                if mode == "partial_fit":
+                    model.partial_fit(take_rows(features, new_rows), take_rows(labels, new_rows))
+                elif mode == "add_estimators":
+                    current = model.get_params()[size_param]
+                    step = n_estimators_step or max(1, math.ceil(
+                        params[size_param] * row_count(new_rows) / row_count(train_rows)))
+                    model.set_params(warm_start=True, **{size_param: current + step})
+                    model.fit(take_rows(features, new_rows), take_rows(labels, new_rows))
+                else:
+                    model.set_params(warm_start=True)
+                    model.fit(take_rows(features, train_rows), take_rows(labels, train_rows))
+
+            predictions = []
+            for rows in (validation_rows, test_rows):
+                x = take_rows(features, rows)
+                predictions.append((model.predict(x), model.predict_proba(x)[:, 1]))
+            checkpoint = {"window": windows[i], "fingerprint": fingerprint, "model": model, "predictions": predictions}
+            if checkpoint_path is not None:
+                _save_checkpoint(checkpoint_path, checkpoint)
+        else:
+            model = checkpoint["model"]
+
+        (val_pred, val_proba), (test_pred, test_proba) = checkpoint["predictions"]
+        validation_results.append(_prediction_frame(feature_forward, validation_rows, val_pred, val_proba, i))
+        test_results.append(_prediction_frame(feature_forward, test_rows, test_pred, test_proba, i))
+        previous_train = train_rows
+
+    return pd.concat(validation_results, axis=0), pd.concat(test_results, axis=0)
+
+
+def _new_rows(previous_rows, rows):
+    """
+    :return: rows that are in rows but not in previous_rows, or None if rows is not a superset of previous_rows.
+    """
+    if previous_rows is None:
+        return None
+    if isinstance(rows, tuple) and isinstance(previous_rows, tuple):
+        if rows[0] == previous_rows[0] and rows[1] >= previous_rows[1]:
+            return previous_rows[1], rows[1]
+        return None
+    rows, previous_rows = np.asarray(_as_positions(rows)), np.asarray(_as_positions(previous_rows))
+    if not np.isin(previous_rows, rows).all():
+        return None
+    return rows[~np.isin(rows, previous_rows)]
 
-    with ThreadPoolExecutor() as executor:
-        results = list(executor.map(train, indices))
 
-        for val_result, test_result in results:
-            validation_results.append(val_result)
-            test_results.append(test_result)
+def _as_positions(rows):
+    return np.arange(rows[0], rows[1]) if isinstance(rows, tuple) else rows
 
-    validation_results_df = pd.concat(validation_results, axis=0)
-    test_results_df = pd.concat(test_results, axis=0)
 
-    return validation_results_df, test_results_df
+def _run_fingerprint(input_model, feature_columns: List[str], n_estimators_step: Optional[int],
+                     classes: Tuple) -> str:
+    """
+    :return: digest of what every window's model depends on besides its data.
+    """
+    params = input_model.get_params() if hasattr(input_model, "get_params") else {}
+    description = repr((type(input_model).__module__, type(input_model).__qualname__, sorted(params.items()),
+                        list(feature_columns), n_estimators_step, tuple(classes)))
+    return hashlib.sha256(description.encode()).hexdigest()
 
-def validate_binary_model(trained_model, df_v: pd.DataFrame):
 
-    pass
+def _window_fingerprint(run_fingerprint: str, features: np.ndarray, labels: np.ndarray, window: Tuple) -> str:
+    """
+    :return: digest of the run fingerprint and the feature and label rows of a window.
+    """
+    digest = hashlib.sha256(run_fingerprint.encode())
+    for rows in window:
+        for array in (features, labels):
+            digest.update(np.ascontiguousarray(take_rows(array, rows)).tobytes())
+    return digest.hexdigest()
+
+
+def _load_checkpoint(path: str, window: Tuple, fingerprint: str) -> Optional[Dict]:
+    if path is None or not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        checkpoint = pickle.load(f)
+    if checkpoint.get("fingerprint") != fingerprint:
+        logger.warning("Checkpoint %s is for another model, feature set or data, refitting from there.", path)
+        return None
+    same_window = all(np.array_equal(_as_positions(a), _as_positions(b)) for a, b in zip(checkpoint["window"], window))
+    return checkpoint if same_window else None
+
+
+def _save_checkpoint(path: str, checkpoint: Dict) -> None:
+    # Write then rename, so an interrupted job never leaves a truncated checkpoint behind.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(checkpoint, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def _window_rows(feature_forward: pd.DataFrame, idx: Union[WalkForwardWindow, List[pd.Index]]) -> Tuple:
+    """
+    :return: the window as positional rows: (start, stop) ranges for WalkForwardWindow, position arrays for labels.
+    """
+    if isinstance(idx, WalkForwardWindow):
+        return tuple(idx)
+    return tuple(feature_forward.index.get_indexer(index) for index in idx)
+
 
+def _prediction_frame(feature_forward: pd.DataFrame, rows, pred: np.ndarray, pred_proba: np.ndarray,
+                      window: int) -> pd.DataFrame:
+    if isinstance(rows, tuple):
+        rows = np.arange(rows[0], rows[1])
+    return pd.DataFrame({"ts_event": feature_forward["ts_event"].to_numpy()[rows], "pred": pred,
+                         "pred_proba": pred_proba, "window": window}, index=feature_forward.index[rows])
 
-def test_model(trained_model, df_test: pd.DataFrame):
-    pass
+def validate_binary_model(trained_model, df_v: pd.DataFrame) -> Dict[str, float]:
+    """
+    :param trained_model: a fitted binary classifier.
+    :param df_v: validation rows of feature_forward, with the feature columns and label.
+    :return: accuracy, precision, recall, f1 and roc_auc of the model on df_v.
+    """
+    x = df_v.drop(columns=[column for column in NON_FEATURE_COLUMNS if column in df_v.columns])
+    return _binary_metrics(df_v["label"].to_numpy(), trained_model.predict(x), trained_model.predict_proba(x)[:, 1])
+
+
+def test_model(trained_model, df_test: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, float]]:
+    """
+    :param trained_model: a fitted binary classifier.
+    :param df_test: test rows of feature_forward, with ts_event, the feature columns and label.
+    :return: a dataframe of ts_event, pred, pred_proba and label, and the metrics of validate_binary_model.
+    """
+    x = df_test.drop(columns=[column for column in NON_FEATURE_COLUMNS if column in df_test.columns])
+    result = df_test[["ts_event"]].copy()
+    result["pred"] = trained_model.predict(x)
+    result["pred_proba"] = trained_model.predict_proba(x)[:, 1]
+    result["label"] = df_test["label"]
+    return result, _binary_metrics(result["label"].to_numpy(), result["pred"].to_numpy(),
+                                   result["pred_proba"].to_numpy())
+
+
+def _binary_metrics(y: np.ndarray, y_pred: np.ndarray, y_pred_proba: np.ndarray) -> Dict[str, float]:
+    from sklearn.metrics import accuracy_score, precision_score, recall_score, f1_score, roc_auc_score
+    metrics = {
+        "accuracy": accuracy_score(y, y_pred),
+        "precision": precision_score(y, y_pred, zero_division=0),
+        "recall": recall_score(y, y_pred, zero_division=0),
+        "f1": f1_score(y, y_pred, zero_division=0),
+    }
+    # ROC-AUC is undefined when the window only has one class.
+    metrics["roc_auc"] = roc_auc_score(y, y_pred_proba) if len(np.unique(y)) > 1 else float("nan")
+    return metrics
 
 
 def model_result(y, y_pred_proba, y_pred):
-    print("Accuracy:", accuracy_score(y, y_pred))
-    print("Precision:", precision_score(y, y_pred))
-    print("Recall:", recall_score(y, y_pred))
-    print("F1 Score:", f1_score(y, y_pred))
-    print("ROC-AUC Score:", roc_auc_score(y, y_pred_proba))
-    return y_pred, roc_auc_score(y, y_pred_proba)
\ No newline at end of file
+    metrics = _binary_metrics(np.asarray(y), np.asarray(y_pred), np.asarray(y_pred_proba))
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Accuracy: %s Precision: %s Recall: %s F1 Score: %s ROC-AUC Score: %s", metrics["accuracy"],
+                    metrics["precision"], metrics["recall"], metrics["f1"], metrics["roc_auc"])
+    return y_pred, metrics["roc_auc"]
@@ -0,0 +1,191 @@
+"""
+File: parallel
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Executor backends and a shared memory feature matrix for fitting walk-forward windows in parallel.>
+"""
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import nullcontext
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+BACKENDS = ("thread", "process", "loky")
+
+_reusable_executors: Dict[int, ProcessPoolExecutor] = {}
+# Segments of the matrix this worker process attached to last, by the names of its segments.
+_attached: Dict[Tuple[str, ...], List[shared_memory.SharedMemory]] = {}
+
+
+def get_executor(backend: str = "thread", n_workers: Optional[int] = None) -> Tuple[Executor, bool]:
+    """
+    :param backend: "thread", "process" (a new process pool) or "loky" (a process pool reused across calls, from joblib
+    when it is installed).
+    :param n_workers: number of workers. Defaults to the number of cpus.
+    :return: the executor and whether the caller owns it and should shut it down.
+    """
+    n_workers = n_workers or os.cpu_count() or 1
+    if backend == "thread":
+        return ThreadPoolExecutor(max_workers=n_workers), True
+    if backend == "process":
+        return ProcessPoolExecutor(max_workers=n_workers), True
+    if backend == "loky":
+        try:
+            from joblib.externals.loky import get_reusable_executor
+            return get_reusable_executor(max_workers=n_workers), False
+        except ImportError:
+            executor = _reusable_executors.get(n_workers)
+            if executor is None:
+                executor = ProcessPoolExecutor(max_workers=n_workers)
+                _reusable_executors[n_workers] = executor
+            return executor, False
+    raise ValueError(f"Invalid backend: {backend}. Expected one of {BACKENDS}.")
+
+
+def limit_threads(n_threads: Optional[int]):
+    """
+    :param n_threads: maximum number of BLAS/OpenMP threads, or None to leave them alone.
+    :return: a context manager that applies the limit, if threadpoolctl is installed.
+    """
+    if n_threads is None:
+        return nullcontext()
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return nullcontext()
+    return threadpool_limits(limits=n_threads)
+
+
+def set_inner_n_jobs(model, n_jobs: Optional[int]):
+    """
+    Sets n_jobs of an estimator (and of nested estimators) that supports it, so that workers times inner jobs does
+    not exceed the cpus.
+    """
+    if n_jobs is None or not hasattr(model, "get_params"):
+        return model
+    params = {name: n_jobs for name in model.get_params() if name == "n_jobs" or name.endswith("__n_jobs")}
+    if params:
+        model.set_params(**params)
+    return model
+
+
+class FeatureMatrix(object):
+    """
+    Contiguous feature matrix and labels. With shared=True both live in shared memory and the object pickles to the
+    segment names only, so process workers attach to the data instead of receiving a copy per task.
+    """
+
+    def __init__(self, features: np.ndarray, labels: np.ndarray, shared: bool = False) -> None:
+        self.shared = shared
+        self._segments = []
+        if shared:
+            self.features = self._to_shared(np.ascontiguousarray(features))
+            self.labels = self._to_shared(np.ascontiguousarray(labels))
+        else:
+            self.features = np.ascontiguousarray(features)
+            self.labels = np.ascontiguousarray(labels)
+
+    def _to_shared(self, array: np.ndarray) -> np.ndarray:
+        segment = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        self._segments.append(segment)
+        shared_array = np.ndarray(array.shape, dtype=array.dtype, buffer=segment.buf)
+        shared_array[...] = array
+        return shared_array
+
+    def __getstate__(self):
+        if not self.shared:
+            return {"shared": False, "features": self.features, "labels": self.labels}
+        return {
+            "shared": True,
+            "features": (self._segments[0].name, self.features.shape, self.features.dtype.str),
+            "labels": (self._segments[1].name, self.labels.shape, self.labels.dtype.str),
+        }
+
+    def __setstate__(self, state):
+        self.shared = state["shared"]
+        self._segments = []
+        if not self.shared:
+            self.features, self.labels = state["features"], state["labels"]
+            return
+        features_name, features_shape, features_dtype = state["features"]
+        labels_name, labels_shape, labels_dtype = state["labels"]
+        features_segment, labels_segment = _attach((features_name, labels_name))
+        self.features = np.ndarray(features_shape, dtype=np.dtype(features_dtype), buffer=features_segment.buf)
+        self.labels = np.ndarray(labels_shape, dtype=np.dtype(labels_dtype), buffer=labels_segment.buf)
+
+    def close(self) -> None:
+        """
+        Releases the shared memory. Only the process that created the matrix unlinks it.
+        """
+        for segment in self._segments:
+            segment.close()
+            segment.unlink()
+        self._segments = []
+
+    def __enter__(self) -> "FeatureMatrix":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+def _attach(names: Tuple[str, ...]) -> List[shared_memory.SharedMemory]:
+    """
+    :return: the segments of a matrix, attached once per worker process while its tasks keep coming. A reused worker
+    that gets the tasks of a new matrix closes the segments of the previous one, whose creator may have unlinked them.
+    """
+    segments = _attached.get(names)
+    if segments is None:
+        for stale in _attached.pop(next(iter(_attached)), []) if _attached else []:
+            try:
+                stale.close()
+            except BufferError:
+                # Arrays of a matrix still in use hold the mapping. It's unmapped once they are released.
+                pass
+        segments = _attached[names] = [_open_segment(name) for name in names]
+    return segments
+
+
+def _open_segment(name: str) -> shared_memory.SharedMemory:
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers every attached segment with the resource tracker. Workers started by multiprocessing
+        # or loky share the tracker of the creating process, which already registered the segment, so this is a no-op.
+        # Unregistering here would drop the creator's registration as well.
+        return shared_memory.SharedMemory(name=name)
+
+
+def fit_window(model, matrix: FeatureMatrix, window: Tuple, blas_threads: Optional[int] = None) -> Tuple[np.ndarray, ...]:
+    """
+    Worker task: fits a cloned model on one window and predicts its validation and test rows.
+    :param window: (train, validation, test) rows, each a (start, stop) range or an array of positions.
+    :return: validation pred, validation pred_proba, test pred and test pred_proba.
+    """
+    train_rows, validation_rows, test_rows = window
+    features, labels = matrix.features, matrix.labels
+    with limit_threads(blas_threads):
+        model.fit(take_rows(features, train_rows), take_rows(labels, train_rows))
+        outputs = []
+        for rows in (validation_rows, test_rows):
+            x = take_rows(features, rows)
+            outputs.append(model.predict(x))
+            outputs.append(model.predict_proba(x)[:, 1])
+    return tuple(outputs)
+
+
+def take_rows(array: np.ndarray, rows: Union[Tuple[int, int], np.ndarray]) -> np.ndarray:
+    """
+    :param rows: a positional (start, stop) range, which is a view, or an array of positions.
+    """
+    if isinstance(rows, tuple):
+        return array[rows[0]:rows[1]]
+    return array[rows]
+
+
+def row_count(rows: Union[Tuple[int, int], np.ndarray]) -> int:
+    if isinstance(rows, tuple):
+        return rows[1] - rows[0]
+    return len(rows)
@@ -9,15 +9,66 @@ from datetime import datetime
 import numpy as np
 import pandas as pd
 
+from ..utils.timeutil import to_ns, to_ns_array, NS_PER_DAY
 
-def exponential_time_weighted_samping(df: pd.DataFrame, exp_weight: float) -> pd.DataFrame:
-    df["timestamp"] = pd.to_datetime(df["ts_event"]).dt.tz_localize(None)
-    current_time = datetime.now()
-    t_diff = (current_time - df["timestamp"]).dt.total_seconds() // (24 * 60 * 60)
 
-    df["weight"] = exponential_weight(t_diff, exp_weight)
-    sample_size = int(df["weight"].sum())
-    return df.sample(sample_size, weights="weight").sort_values(by="ts_event", ascending=True).drop(columns=["weight", "timestamp"], axis=1)
+def exponential_time_weighted_samping(df: pd.DataFrame, exp_weight: float, reference_time=None,
+                                      seed: int = None) -> pd.DataFrame:
+    """
+    :param df: dataframe with ts_event. It is not modified.
+    :param exp_weight: decay per day.
+    :param reference_time: time the age of a row is measured from. Defaults to now, which is not reproducible.
+    :param seed: seed of the draw.
+    :return: a weighted sample of the rows without replacement, in time order.
+    """
+    reference_time = datetime.now() if reference_time is None else reference_time
+    indices = exponential_time_weighted_indices(to_ns_array(df["ts_event"]), exp_weight, reference_time, seed=seed)
+    return df.iloc[indices[0]]
+
+
+def exponential_time_weighted_indices(ts_ns: np.ndarray, exp_weight: float, reference_time, n_samples: int = 1,
+                                      sample_size: int = None, replace: bool = False, seed=None) -> np.ndarray:
+    """
+    Draws n_samples weighted samples of row positions in one call, e.g. the bootstrap samples of a bagged model.
+    :param ts_ns: int64 UTC ns timestamps of the rows, sorted.
+    :param exp_weight: decay per day. The weight of a row is exp(-exp_weight * age in whole days).
+    :param reference_time: time the age of a row is measured from. Anything to_ns accepts.
+    :param n_samples: number of samples.
+    :param sample_size: rows per sample. Defaults to the sum of the weights, capped at the number of rows when
+    sampling without replacement.
+    :param replace: sample with replacement (bootstrap) or without.
+    :param seed: seed or np.random.Generator.
+    :return: (n_samples, sample_size) int64 positions. Each row is sorted, so a sample stays in time order.
+    """
+    weights = exponential_time_weights(ts_ns, exp_weight, reference_time)
+    if sample_size is None:
+        sample_size = int(weights.sum())
+    if not replace:
+        sample_size = min(sample_size, int(np.count_nonzero(weights)))
+    rng = np.random.default_rng(seed)
+    if sample_size == 0:
+        return np.empty((n_samples, 0), dtype=np.int64)
+
+    if replace:
+        cumulative = np.cumsum(weights)
+        draws = rng.random((n_samples, sample_size)) * cumulative[-1]
+        indices = np.searchsorted(cumulative, draws, side="right")
+        indices = np.minimum(indices, len(weights) - 1)
+    else:
+        # Exponential race (Efraimidis-Spirakis): the sample_size smallest Exp(1) / weight keys are a weighted sample
+        # without replacement, and all samples are drawn with one argpartition.
+        with np.errstate(divide="ignore"):
+            keys = rng.standard_exponential((n_samples, len(weights))) / weights
+        indices = np.argpartition(keys, sample_size - 1, axis=1)[:, :sample_size]
+    return np.sort(indices, axis=1).astype(np.int64)
+
+
+def exponential_time_weights(ts_ns: np.ndarray, exp_weight: float, reference_time) -> np.ndarray:
+    """
+    :return: exp(-exp_weight * age) of every timestamp, where the age is in whole days before reference_time.
+    """
+    age_days = (to_ns(reference_time) - np.asarray(ts_ns, dtype=np.int64)) // NS_PER_DAY
+    return exponential_weight(age_days, exp_weight)
 
 
 def exponential_weight(time_delta: pd.Series, alpha: float) -> pd.Series:
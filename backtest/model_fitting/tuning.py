@@ -0,0 +1,185 @@
+"""
+File: tuning
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Walk-forward hyperparameter search. Candidates are scored on every window's validation set in parallel,
+optionally with successive halving, and the best candidate of each window is refitted and scored on its test set.>
+"""
+import math
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .model_fitting import NON_FEATURE_COLUMNS, _prediction_frame, _window_rows
+from .parallel import FeatureMatrix, fit_window, get_executor, limit_threads, row_count, set_inner_n_jobs, take_rows
+
+
+def candidate_params(param_grid: Dict[str, list] = None, param_distributions: Dict = None, n_iter: int = 10,
+                     random_state: int = None) -> List[Dict]:
+    """
+    :param param_grid: exhaustive grid, as in sklearn GridSearchCV.
+    :param param_distributions: lists or scipy distributions to sample n_iter candidates from, as in
+    RandomizedSearchCV. Ignored when param_grid is given.
+    :return: list of parameter dicts.
+    """
+    # scikit-learn is imported on first use, so importing this module stays cheap.
+    from sklearn.model_selection import ParameterGrid, ParameterSampler
+    if param_grid is not None:
+        return list(ParameterGrid(param_grid))
+    if param_distributions is not None:
+        return list(ParameterSampler(param_distributions, n_iter=n_iter, random_state=random_state))
+    raise ValueError("Either param_grid or param_distributions is required.")
+
+
+def score_candidate(model, matrix: FeatureMatrix, window: Tuple, n_train_rows: Optional[int], scoring: str,
+                    blas_threads: Optional[int] = None) -> float:
+    """
+    Worker task: fits a configured model on the most recent n_train_rows of the training set and scores it on the
+    validation set.
+    :return: the score, or nan if it cannot be computed (e.g. a single class in the validation set).
+    """
+    from sklearn.metrics import get_scorer
+    train_rows, validation_rows, _ = window
+    if n_train_rows is not None and n_train_rows < row_count(train_rows):
+        train_rows = (train_rows[1] - n_train_rows, train_rows[1]) if isinstance(train_rows, tuple) \
+            else train_rows[-n_train_rows:]
+    features, labels = matrix.features, matrix.labels
+    with limit_threads(blas_threads):
+        model.fit(take_rows(features, train_rows), take_rows(labels, train_rows))
+        try:
+            return float(get_scorer(scoring)(model, take_rows(features, validation_rows),
+                                             take_rows(labels, validation_rows)))
+        except ValueError:
+            return float("nan")
+
+
+def refit_candidate(model, matrix: FeatureMatrix, window: Tuple, scoring: str,
+                    blas_threads: Optional[int] = None) -> Tuple:
+    """
+    Worker task: refits the chosen model on the full training set, see fit_window, and scores it on the test set.
+    :return: validation pred, validation pred_proba, test pred, test pred_proba and the test score, nan if it cannot be
+    computed.
+    """
+    from sklearn.metrics import get_scorer
+    outputs = fit_window(model, matrix, window, blas_threads)
+    test_rows = window[2]
+    with limit_threads(blas_threads):
+        try:
+            score = float(get_scorer(scoring)(model, take_rows(matrix.features, test_rows),
+                                              take_rows(matrix.labels, test_rows)))
+        except ValueError:
+            score = float("nan")
+    return outputs + (score,)
+
+
+def tune_model(input_model, feature_forward: pd.DataFrame, indices: List[List[pd.Index]], candidates: List[Dict],
+               scoring: str = "roc_auc", halving_factor: Optional[int] = None, min_train_rows: int = 500,
+               backend: str = "thread", n_workers: int = None, inner_n_jobs: Optional[int] = 1,
+               blas_threads: int = None) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    :param input_model: machine learning model.
+    :param feature_forward: dataframe of features and the forward return.
+    :param indices: list of [train idx, validation idx, test idx], or WalkForwardWindow positional ranges.
+    :param candidates: parameter dicts, see candidate_params.
+    :param scoring: sklearn scorer name used on the validation and test sets. Higher is better.
+    :param halving_factor: if set, successive halving: candidates are first fitted on the most recent rows of the
+    training set only, and after every round the best 1 / halving_factor of them move on with halving_factor times
+    more rows, until the full training set. None scores every candidate on the full training set.
+    :param min_train_rows: training rows of the first halving round.
+    :param backend: "thread", "process" or "loky", see fit_model_parallel.
+    :param n_workers: number of workers. Defaults to the number of cpus.
+    :param inner_n_jobs: n_jobs set on the estimator. None leaves the estimator as it is.
+    :param blas_threads: BLAS/OpenMP threads per worker. Defaults to cpus // (n_workers * inner_n_jobs), at least 1.
+    :return: four dataframes:
+    - validation predictions and test predictions of the best candidate of each window, refitted on the full
+    training set. Each has ts_event, model pred, pred_proba and the window position, like fit_model.
+    - the search results: one row per window, round and candidate with the training rows used and the score.
+    - the test scores: one row per window with the best candidate, its params and its score on the test set.
+    """
+    from sklearn.base import clone
+    if not candidates:
+        raise ValueError("No candidates to evaluate.")
+    if not indices:
+        raise ValueError("No windows to evaluate.")
+    cpus = os.cpu_count() or 1
+    n_workers = n_workers or cpus
+    if blas_threads is None:
+        blas_threads = max(1, cpus // (n_workers * (inner_n_jobs or 1)))
+
+    feature_columns = [column for column in feature_forward.columns if column not in NON_FEATURE_COLUMNS]
+    windows = [_window_rows(feature_forward, idx) for idx in indices]
+    shared = backend != "thread"
+
+    def configured(params: Dict):
+        return set_inner_n_jobs(clone(input_model).set_params(**params), inner_n_jobs)
+
+    search_results = []
+    with FeatureMatrix(feature_forward[feature_columns].to_numpy(), feature_forward["label"].to_numpy(),
+                       shared=shared) as matrix:
+        executor, owned = get_executor(backend, n_workers)
+        worker_blas_threads = blas_threads if shared else None
+        try:
+            with limit_threads(None if shared else blas_threads):
+                # Surviving candidate positions of every window. Each round is submitted for all windows at once.
+                survivors = [list(range(len(candidates))) for _ in windows]
+                for round_index, budgets in enumerate(_halving_budgets(windows, len(candidates), halving_factor,
+                                                                       min_train_rows)):
+                    futures = {(w, c): executor.submit(score_candidate, configured(candidates[c]), matrix, windows[w],
+                                                       budgets[w], scoring, worker_blas_threads)
+                               for w in range(len(windows)) for c in survivors[w]}
+                    for w in range(len(windows)):
+                        scores = {c: futures[(w, c)].result() for c in survivors[w]}
+                        for c, score in scores.items():
+                            search_results.append({"window": w, "round": round_index, "candidate": c,
+                                                   "params": candidates[c], "train_rows": budgets[w],
+                                                   "score": score})
+                        keep = max(1, math.ceil(len(survivors[w]) / (halving_factor or 1)))
+                        survivors[w] = sorted(survivors[w], key=lambda c: _sort_key(scores[c]))[:keep]
+
+                best = [survivors[w][0] for w in range(len(windows))]
+                refits = [executor.submit(refit_candidate, configured(candidates[best[w]]), matrix, windows[w],
+                                          scoring, worker_blas_threads) for w in range(len(windows))]
+                results = [future.result() for future in refits]
+        finally:
+            if owned:
+                executor.shutdown()
+
+    validation_results, test_results, test_scores = [], [], []
+    for i, ((_, validation_rows, test_rows), (val_pred, val_proba, test_pred, test_proba, test_score)) in \
+            enumerate(zip(windows, results)):
+        validation_results.append(_prediction_frame(feature_forward, validation_rows, val_pred, val_proba, i))
+        test_results.append(_prediction_frame(feature_forward, test_rows, test_pred, test_proba, i))
+        test_scores.append({"window": i, "candidate": best[i], "params": candidates[best[i]], "score": test_score})
+
+    search_results = pd.DataFrame(search_results)
+    search_results["best"] = search_results["candidate"].to_numpy() == np.asarray(best)[search_results["window"]]
+    return (pd.concat(validation_results, axis=0), pd.concat(test_results, axis=0), search_results,
+            pd.DataFrame(test_scores))
+
+
+def _halving_budgets(windows: List[Tuple], n_candidates: int, halving_factor: Optional[int],
+                     min_train_rows: int) -> List[List[Optional[int]]]:
+    """
+    :return: per round, the training rows of every window. None is the full training set.
+    """
+    if not halving_factor or halving_factor < 2 or n_candidates < 2:
+        return [[None] * len(windows)]
+    # ceil(log(n_candidates, halving_factor)) + 1 in integers, math.log(125, 5) is 3.0000000000000004.
+    n_rounds, survivors = 1, 1
+    while survivors < n_candidates:
+        survivors *= halving_factor
+        n_rounds += 1
+    budgets = []
+    for round_index in range(n_rounds):
+        scale = halving_factor ** (n_rounds - 1 - round_index)
+        budgets.append([None if round_index == n_rounds - 1
+                        else min(row_count(window[0]), max(min_train_rows, row_count(window[0]) // scale))
+                        for window in windows])
+    return budgets
+
+
+def _sort_key(score: float) -> float:
+    # Best first. nan scores go last.
+    return -score if not math.isnan(score) else math.inf
@@ -4,11 +4,17 @@ Author: Zhicheng Tang
 Created Date: 8/24/24
 Description: <>
 """
-from typing import Dict
+import logging
+from typing import Dict, Tuple
 from backtest.position import Position
 from backtest.event import FilledOrder, OptionAssigned, OptionExpired
 from .utils.logger import logger
 from .utils.constant import SIDE
+from .utils.instrument import Instrument, InstrumentType, OptionType
+
+
+class InsufficientFundsError(Exception):
+    pass
 
 
 class Portfolio(object):
@@ -16,6 +22,55 @@ class Portfolio(object):
         self.cash_balance = initial_cash_balance
         self.positions: Dict[str, Position] = {}
         self.portfolio_value = self.cash_balance
+        # Collateral ledger, updated on every fill, expiry and assignment of the position concerned only.
+        # Short puts commit strike * multiplier of cash per contract, short calls reserve multiplier shares of the
+        # underlying per contract.
+        self.committed_collateral = 0.0
+        self.reserved_shares: Dict[str, int] = {}
+        self._position_collateral: Dict[str, Tuple[float, int]] = {}
+
+    @property
+    def buying_power(self) -> float:
+        """
+        Cash that is not committed as collateral.
+        """
+        return self.cash_balance - self.committed_collateral
+
+    def free_shares(self, symbol: str) -> int:
+        """
+        :return: shares of a stock held and not reserved for short calls.
+        """
+        position = self.positions.get(symbol)
+        return (position.amount if position is not None else 0) - self.reserved_shares.get(symbol, 0)
+
+    def buying_power_after(self, order: FilledOrder) -> float:
+        """
+        Pre-trade check in O(1).
+        :return: buying power if the order were filled now. Negative means the order can't be afforded.
+        """
+        position = self.positions.get(order.instrument.symbol)
+        amount = position.amount if position is not None else 0
+        new_amount = amount + (order.quantity if order.side == SIDE.BUY else -order.quantity)
+        cash_change = -(order.order_value + abs(order.order_value) * order.commission_rate)
+        collateral_change = _collateral(order.instrument, new_amount)[0] - _collateral(order.instrument, amount)[0]
+        return self.buying_power + cash_change - collateral_change
+
+    def can_fill(self, order: FilledOrder) -> bool:
+        """
+        Pre-trade check in O(1): the order keeps buying power non-negative, doesn't sell shares reserved for short
+        calls, and a short call has free shares to cover it.
+        """
+        if self.buying_power_after(order) < 0:
+            return False
+        instrument = order.instrument
+        if instrument.type == InstrumentType.STOCK and order.side == SIDE.SELL:
+            return order.quantity <= self.free_shares(instrument.symbol)
+        if instrument.type == InstrumentType.OPTION and order.side == SIDE.SELL:
+            position = self.positions.get(instrument.symbol)
+            amount = position.amount if position is not None else 0
+            shares_change = _collateral(instrument, amount - order.quantity)[1] - _collateral(instrument, amount)[1]
+            return shares_change <= self.free_shares(instrument.underlying_symbol)
+        return True
 
     def add_cash_flow(self, value: float) -> float:
         self.cash_balance += value
@@ -23,24 +78,37 @@ class Portfolio(object):
         return self.cash_balance
 
     def fill_order(self, order: FilledOrder) -> None:
-        commission = abs(order.order_value) * order.commission_rate
-        self.cash_balance -= (order.order_value + commission)
-        if self.cash_balance < 0:
-            print(order.filled_date)
-            raise Exception("Negative cash balance.")
-        logger.info(f"Symbol: {order.symbol}: {order.side} order filled at {order.filled_price}, quantity {order.quantity}, multiplier {order.instrument.multiplier}, Timestamp: {order.ts}")
+        self.apply_fill(order.instrument, order.side, order.quantity, order.filled_price, order.commission_rate,
+                        order.filled_date)
 
-        instrument_symbol = order.instrument.symbol
-        if instrument_symbol not in self.positions:
-            self.positions[instrument_symbol] = Position(order.instrument)
+    def apply_fill(self, instrument: Instrument, side: SIDE, quantity: int, filled_price: float,
+                   commission_rate: float = 0, filled_date=None) -> None:
+        """
+        Fills an order given by its fields, so a replayed journal doesn't need FilledOrder objects.
+        :param filled_date: only used in messages.
+        """
+        base_value = filled_price * quantity * instrument.multiplier
+        order_value = -base_value if side == SIDE.SELL else base_value
+        self.cash_balance -= (order_value + abs(order_value) * commission_rate)
+        if self.cash_balance < 0:
+            logger.error("Negative cash balance. filled_date=%s symbol=%s", filled_date, instrument.symbol)
+            raise InsufficientFundsError("Negative cash balance.")
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("fill symbol=%s side=%s price=%s quantity=%s multiplier=%s ts=%s", instrument.symbol, side.name,
+                        filled_price, quantity, instrument.multiplier, filled_date)
 
-        self.positions[instrument_symbol].fill_order(order)
+        position = self.positions.get(instrument.symbol)
+        if position is None:
+            position = self.positions[instrument.symbol] = Position(instrument)
+        position.apply_fill(side, quantity, filled_price)
+        self._update_collateral(instrument, position.amount)
 
     def option_expired(self, option_expired_event: OptionExpired):
         """
         Remove the option position and no further calculations required.
         """
         del self.positions[option_expired_event.instrument.symbol]
+        self._update_collateral(option_expired_event.instrument, 0)
 
     def option_assigned(self, option_assigned_event: OptionAssigned):
         """
@@ -49,10 +117,27 @@ class Portfolio(object):
         position = self.positions[option_assigned_event.instrument.symbol]
         side = SIDE.BUY if position.amount > 0 else SIDE.SELL
         filled_order = option_assigned_event.get_filled_order(side, position.amount)
+        # The option's collateral pays for the assignment, so release it first.
+        self._update_collateral(option_assigned_event.instrument, 0)
         self.fill_order(filled_order)
         del self.positions[option_assigned_event.instrument.symbol]
 
 
+    def _update_collateral(self, instrument: Instrument, amount: int) -> None:
+        """
+        Moves the ledger from the collateral of the instrument's previous position to the one of its new amount.
+        """
+        old_cash, old_shares = self._position_collateral.pop(instrument.symbol, (0.0, 0))
+        new_cash, new_shares = _collateral(instrument, amount)
+        self.committed_collateral += new_cash - old_cash
+        if old_shares or new_shares:
+            underlying = instrument.underlying_symbol
+            self.reserved_shares[underlying] = self.reserved_shares.get(underlying, 0) + new_shares - old_shares
+            if self.reserved_shares[underlying] == 0:
+                del self.reserved_shares[underlying]
+        if new_cash or new_shares:
+            self._position_collateral[instrument.symbol] = (new_cash, new_shares)
+
     def get_snapshot(self) -> Dict:
         return {"portfolio_value": self.portfolio_value, "cash_balance": self.cash_balance, "positions": self.positions}
 
@@ -70,4 +155,12 @@ class Portfolio(object):
         self.portfolio_value = sum([position.position_value for position in self.positions.values()]) + self.cash_balance
 
 
-
+def _collateral(instrument: Instrument, amount: int) -> Tuple[float, int]:
+    """
+    :return: cash committed and underlying shares reserved by a position of amount contracts.
+    """
+    if instrument.type != InstrumentType.OPTION or amount >= 0:
+        return 0.0, 0
+    if instrument.option_type == OptionType.PUT:
+        return -amount * instrument.strike_price * instrument.multiplier, 0
+    return 0.0, -amount * instrument.multiplier
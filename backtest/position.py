@@ -27,17 +27,24 @@ class Position(object):
         :param order: a filled order.
         :return: None.
         """
-        if order.instrument.symbol != self.instrument.symbol:
+        # Instruments are interned, so the identity check is equivalent to comparing symbols.
+        if order.instrument is not self.instrument:
             raise ValueError(
                 f"Order instrument '{order.instrument.symbol}' does not match "
                 f"position instrument '{self.instrument.symbol}'"
             )
 
+        self.apply_fill(order.side, order.quantity, order.filled_price)
+
+    def apply_fill(self, side: SIDE, quantity: int, filled_price: float) -> None:
+        """
+        Update the position with the fields of a fill of its instrument.
+        """
         old_amount = self.amount
-        if order.side == SIDE.SELL:
-            self.amount -= order.quantity
-        elif order.side == SIDE.BUY:
-            self.amount += order.quantity
+        if side == SIDE.SELL:
+            self.amount -= quantity
+        elif side == SIDE.BUY:
+            self.amount += quantity
 
         if self.instrument.type == InstrumentType.STOCK and self.amount < 0:
             raise ValueError(f"Shorting stock '{self.symbol}' is not supported.")
@@ -46,18 +53,18 @@ class Position(object):
 
         if is_opening_position:
             if old_amount == 0:
-                self.average_entry_price = order.filled_price
+                self.average_entry_price = filled_price
             # If we are adding to an existing position (long or short)
             else:
                 old_total_value = self.average_entry_price * abs(old_amount)
-                new_order_value = order.filled_price * order.quantity
+                new_order_value = filled_price * quantity
                 self.average_entry_price = (old_total_value + new_order_value) / abs(self.amount)
 
         if self.amount == 0:
             self.average_entry_price = 0.0
             self.unrealized_pnl = 0.0
             self.position_value = 0.0
-        self.update_position(order.filled_price)
+        self.update_position(filled_price)
 
     def update_position(self, price: float) -> None:
         """
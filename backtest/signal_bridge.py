@@ -0,0 +1,103 @@
+"""
+File: signal_bridge.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Turns model predictions (ts_event, pred, pred_proba from model_fitting) into time sorted order events for
+BacktestBase. Thresholds, sizing and the as-of price join are done on whole arrays, only the final event objects are
+built per order.>
+"""
+import heapq
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from backtest.event import Event, FilledOrder
+from .data_parser.ohlcv import OHLCV
+from .utils.constant import SIDE
+from .utils.instrument import Instrument, InstrumentType
+from .utils.timeutil import to_ns_array, to_timestamp, NS_PER_HOUR
+
+
+def signals_to_order_frame(predictions: pd.DataFrame, ohlcv: OHLCV, long_threshold: float = 0.5,
+                           short_threshold: Optional[float] = None, quantity: Optional[int] = None,
+                           notional: Optional[float] = None, tolerance_ns: int = NS_PER_HOUR) -> pd.DataFrame:
+    """
+    Target position per prediction and the trades that reach it.
+    :param predictions: dataframe with ts_event and pred_proba, e.g. the test results of fit_model.
+    :param ohlcv: prices of the traded instrument. Each prediction is matched with the last bar at or before its
+    ts_event (as-of join) and trades at that bar's close.
+    :param long_threshold: be long while pred_proba >= long_threshold.
+    :param short_threshold: be short while pred_proba <= short_threshold. None never shorts. Flat otherwise. The
+    portfolio doesn't support short stock positions, so signals_to_orders rejects it for a Stock.
+    :param quantity: fixed number of shares per position.
+    :param notional: cash per position instead of quantity. Shares are sized when a position is opened and kept
+    until it is closed.
+    :param tolerance_ns: predictions with no bar within tolerance_ns before them are skipped.
+    :return: dataframe of ts_event, ts_ns, side, quantity and price, one row per trade.
+    """
+    if (quantity is None) == (notional is None):
+        raise ValueError("Exactly one of quantity and notional is required.")
+
+    ts_ns = to_ns_array(predictions["ts_event"])
+    proba = predictions["pred_proba"].to_numpy(dtype=np.float64)
+    ts_event = predictions["ts_event"].to_numpy()
+    if len(ts_ns) > 1 and (np.diff(ts_ns) < 0).any():
+        order = np.argsort(ts_ns, kind="stable")
+        ts_ns, proba, ts_event = ts_ns[order], proba[order], ts_event[order]
+
+    bar = np.searchsorted(ohlcv.ts_ns, ts_ns, side="right") - 1
+    priced = bar >= 0
+    priced[priced] = ts_ns[priced] - ohlcv.ts_ns[bar[priced]] <= tolerance_ns
+    ts_ns, proba, ts_event = ts_ns[priced], proba[priced], ts_event[priced]
+    price = ohlcv.close[bar[priced]]
+
+    direction = np.where(proba >= long_threshold, 1, 0)
+    if short_threshold is not None:
+        direction = np.where(proba <= short_threshold, -1, direction)
+
+    if quantity is not None:
+        target = direction * quantity
+    else:
+        # Size on the bar a position is opened or flipped, then carry that size forward while the direction holds.
+        previous = np.concatenate([[0], direction[:-1]])
+        opened = (direction != 0) & (direction != previous)
+        shares = pd.Series(np.where(opened, np.floor(notional / price), np.nan))
+        shares[direction == 0] = 0
+        target = direction * shares.ffill().fillna(0).to_numpy(dtype=np.int64)
+
+    trade = np.diff(target, prepend=0)
+    traded = np.flatnonzero(trade)
+    return pd.DataFrame({
+        "ts_event": ts_event[traded],
+        "ts_ns": ts_ns[traded],
+        "side": np.where(trade[traded] > 0, SIDE.BUY, SIDE.SELL),
+        "quantity": np.abs(trade[traded]),
+        "price": price[traded],
+    })
+
+
+def signals_to_orders(predictions: pd.DataFrame, ohlcv: OHLCV, instrument: Instrument, commission_rate: float = 0,
+                      **kwargs) -> List[FilledOrder]:
+    """
+    :param instrument: the traded instrument, usually Stock(ohlcv.symbol).
+    :param kwargs: thresholds and sizing, see signals_to_order_frame.
+    :return: time sorted FilledOrder events, filled at the matched bar close.
+    """
+    if instrument.type == InstrumentType.STOCK and kwargs.get("short_threshold") is not None:
+        raise ValueError("Shorting stock is not supported, short_threshold must be None for a Stock.")
+    trades = signals_to_order_frame(predictions, ohlcv, **kwargs)
+    orders = []
+    for ts_ns, side, quantity, price in zip(trades["ts_ns"].tolist(), trades["side"].tolist(),
+                                            trades["quantity"].tolist(), trades["price"].tolist()):
+        ts = to_timestamp(ts_ns)
+        orders.append(FilledOrder(instrument, ts, side, int(quantity), float(price), ts, commission_rate))
+    return orders
+
+
+def merge_events(*batches: List[Event]) -> List[Event]:
+    """
+    :param batches: time sorted event lists, e.g. orders of several symbols and cash flows.
+    :return: one time sorted list for run_backtest.
+    """
+    return list(heapq.merge(*batches, key=lambda event: event.ts_ns))
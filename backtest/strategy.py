@@ -0,0 +1,110 @@
+"""
+File: strategy.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Bar driven strategy interface. The engine walks the bars of the loaded OHLCV data in time order and calls
+the strategy, which sees the portfolio as of each bar, so path dependent logic (e.g. buy the dip only when cash allows)
+doesn't need a precomputed event list. See BacktestBase.run_strategy.>
+"""
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+
+from backtest.event import Event, FilledOrder, OptionAssigned, OptionExpired
+from .data_parser.ohlcv import OHLCV
+
+
+class Bar(NamedTuple):
+    """
+    Bars of all symbols at one timestamp. The arrays are views into a BarMatrix, indexed like symbols, and hold nan for
+    a symbol with no bar at ts_ns.
+    """
+    index: int
+    ts_ns: int
+    symbols: Sequence[str]
+    open: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    close: np.ndarray
+    volume: np.ndarray
+
+
+class BarMatrix(object):
+    """
+    OHLCV of several symbols aligned on the union of their timestamps: one row per timestamp, one column per symbol.
+    """
+
+    FIELDS = ("open", "high", "low", "close", "volume")
+
+    def __init__(self, ohlcv_data: Dict[str, OHLCV], symbols: Sequence[str] = None, start_ns: int = None,
+                 end_ns: int = None) -> None:
+        """
+        :param ohlcv_data: symbol to OHLCV, e.g. BacktestBase.ohlcv_data.
+        :param symbols: symbols to include. Defaults to all.
+        :param start_ns: first timestamp, inclusive.
+        :param end_ns: last timestamp, exclusive.
+        """
+        self.symbols: List[str] = list(ohlcv_data) if symbols is None else list(symbols)
+        start_ns = np.iinfo(np.int64).min if start_ns is None else start_ns
+        end_ns = np.iinfo(np.int64).max if end_ns is None else end_ns
+        ranges = {symbol: np.searchsorted(ohlcv_data[symbol].ts_ns, [start_ns, end_ns]) for symbol in self.symbols}
+        all_ts = [ohlcv_data[symbol].ts_ns[start:stop] for symbol, (start, stop) in ranges.items()]
+        self.ts_ns = np.unique(np.concatenate(all_ts)) if all_ts else np.empty(0, dtype=np.int64)
+
+        shape = (len(self.ts_ns), len(self.symbols))
+        for field in self.FIELDS:
+            setattr(self, field, np.full(shape, np.nan))
+        for column, symbol in enumerate(self.symbols):
+            ohlcv = ohlcv_data[symbol]
+            start, stop = ranges[symbol]
+            rows = np.searchsorted(self.ts_ns, ohlcv.ts_ns[start:stop])
+            for field in self.FIELDS:
+                if field in ohlcv.data.columns:
+                    getattr(self, field)[rows, column] = ohlcv.data[field].to_numpy(dtype=np.float64)[start:stop]
+
+    def __len__(self) -> int:
+        return len(self.ts_ns)
+
+    def bar(self, index: int) -> Bar:
+        return Bar(index, int(self.ts_ns[index]), self.symbols, self.open[index], self.high[index], self.low[index],
+                   self.close[index], self.volume[index])
+
+
+class Strategy(object):
+    """
+    Base class of bar driven strategies. Override the callbacks that are needed. The engine is set before the first bar,
+    so the strategy can read engine.portfolio (e.g. buying_power) and the market data.
+    """
+
+    def __init__(self) -> None:
+        self.engine = None
+
+    def on_start(self, engine) -> None:
+        """
+        Called once before the first bar.
+        """
+        self.engine = engine
+
+    def on_bar(self, bar: Bar) -> Optional[List[Event]]:
+        """
+        :return: events to process at this bar, e.g. FilledOrder and CashFlowChange, with ts at or after bar.ts_ns.
+        """
+        return None
+
+    def on_fill(self, order: FilledOrder) -> None:
+        """
+        Called after a FilledOrder returned by on_bar was applied to the portfolio.
+        """
+        pass
+
+    def on_expiry(self, event: OptionExpired | OptionAssigned) -> None:
+        """
+        Called after an option the portfolio held expired or was assigned.
+        """
+        pass
+
+    def on_finish(self) -> None:
+        """
+        Called once after the last bar.
+        """
+        pass
@@ -0,0 +1,326 @@
+"""
+File: sweep.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Parameter sweeps over many machines. A coordinator splits a parameter grid into shards and puts them on a
+job queue. Workers on any node take shards, run one backtest per parameter set and send back one compact record per
+backtest. Failed shards are retried and shards that run too long are handed out again. Each worker loads the market data
+of a configuration once and reuses it for all its backtests.>
+"""
+import itertools
+import logging
+import os
+import queue
+import socket
+import time
+import traceback
+import uuid
+from multiprocessing.managers import BaseManager
+from typing import Callable, Dict, Hashable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .backtest_base import BacktestBase
+from .strategy import Strategy
+from .utils.constant import FREQUENCY
+from .utils.logger import logger
+
+# Values of a result record, after the job number and the parameters.
+RESULT_FIELDS = ("portfolio_value", "cash_balance", "net_cash_flow", "cumulative_return", "periods", "run_s")
+
+
+class EngineSpec(NamedTuple):
+    """
+    Everything a worker needs to build the engine of a backtest. engine_class must be importable on the workers.
+    """
+    engine_class: type
+    history_data_path: str
+    instruments: Dict
+    frequency: FREQUENCY
+    start_date: str
+    end_date: str
+    kwargs: Dict = {}
+
+
+class Shard(NamedTuple):
+    sweep_id: str
+    shard_id: int
+    attempt: int
+    spec: EngineSpec
+    build: Callable
+    jobs: List[Tuple[int, Dict]]
+
+
+def parameter_grid(grid: Dict[str, list]) -> List[Dict]:
+    """
+    :param grid: parameter name to the values to try.
+    :return: one dict per combination, the last parameter varying fastest.
+    """
+    names = list(grid)
+    return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+
+class JobQueue(object):
+    """
+    Transport between the coordinator and the workers. Messages are picklable tuples. Implementations may use any
+    broker, as long as every message is delivered to one receiver.
+    """
+
+    def put_task(self, task) -> None:
+        raise NotImplementedError
+
+    def get_task(self, timeout: float):
+        """
+        :return: the next task, or raises queue.Empty after timeout seconds.
+        """
+        raise NotImplementedError
+
+    def put_result(self, result) -> None:
+        raise NotImplementedError
+
+    def get_result(self, timeout: float):
+        """
+        :return: the next result, or raises queue.Empty after timeout seconds.
+        """
+        raise NotImplementedError
+
+
+_tasks = queue.Queue()
+_results = queue.Queue()
+
+
+def _get_tasks():
+    return _tasks
+
+
+def _get_results():
+    return _results
+
+
+# The manager classes are module level, so the server process can be started with spawn or forkserver.
+class _ServerManager(BaseManager):
+    pass
+
+
+_ServerManager.register("tasks", callable=_get_tasks)
+_ServerManager.register("results", callable=_get_results)
+
+
+class _ClientManager(BaseManager):
+    pass
+
+
+_ClientManager.register("tasks")
+_ClientManager.register("results")
+
+
+class ManagerQueue(JobQueue):
+    """
+    Default transport: two queues served over TCP by a multiprocessing manager. The coordinator calls serve(), workers
+    on any node call connect() with its address and authkey. Runs on one machine with address ("127.0.0.1", 0).
+    """
+
+    def __init__(self, manager: BaseManager) -> None:
+        self.manager = manager
+        self.address = manager.address
+        self._tasks = manager.tasks()
+        self._results = manager.results()
+
+    @classmethod
+    def serve(cls, address: Tuple[str, int] = ("127.0.0.1", 0), authkey: bytes = b"backtest-sweep") -> "ManagerQueue":
+        """
+        Starts the queue server in a child process.
+        :param address: host and port to listen on. Port 0 picks a free port, see the address attribute.
+        """
+        manager = _ServerManager(address=address, authkey=authkey)
+        manager.start()
+        return cls(manager)
+
+    @classmethod
+    def connect(cls, address: Tuple[str, int], authkey: bytes = b"backtest-sweep") -> "ManagerQueue":
+        manager = _ClientManager(address=tuple(address), authkey=authkey)
+        manager.connect()
+        return cls(manager)
+
+    def put_task(self, task) -> None:
+        self._tasks.put(task)
+
+    def get_task(self, timeout: float):
+        return self._tasks.get(timeout=timeout)
+
+    def put_result(self, result) -> None:
+        self._results.put(result)
+
+    def get_result(self, timeout: float):
+        return self._results.get(timeout=timeout)
+
+    def shutdown(self) -> None:
+        """
+        Stops the server. Only for the queue returned by serve().
+        """
+        self.manager.shutdown()
+
+
+class SweepCoordinator(object):
+    def __init__(self, job_queue: JobQueue, shard_size: int = 8, max_retries: int = 2,
+                 straggler_timeout: Optional[float] = None, poll_interval: float = 0.5) -> None:
+        """
+        :param job_queue: transport to the workers.
+        :param shard_size: backtests per shard. Larger shards send fewer messages, smaller ones balance better.
+        :param max_retries: times a failed shard is sent again before the sweep fails.
+        :param straggler_timeout: seconds after which a started shard without a result is sent again, e.g. because
+        its worker died or its node is slow, and again every straggler_timeout seconds until a result comes. The first
+        result of a shard is kept. None never resends.
+        :param poll_interval: seconds between checks for stragglers while waiting for results.
+        """
+        self.job_queue = job_queue
+        self.shard_size = shard_size
+        self.max_retries = max_retries
+        self.straggler_timeout = straggler_timeout
+        self.poll_interval = poll_interval
+
+    def run(self, spec: EngineSpec, build: Callable, params: List[Dict]) -> pd.DataFrame:
+        """
+        :param spec: engine of every backtest.
+        :param build: build(engine, **params) returns the time sorted events or the Strategy of one backtest. It must
+        be importable on the workers, e.g. a module level function.
+        :param params: parameter sets, e.g. from parameter_grid.
+        :return: one row per parameter set, in the order of params, with the parameters and RESULT_FIELDS.
+        """
+        # Results of another sweep on the same queue, e.g. of a shard resent before it finished, are dropped.
+        sweep_id = uuid.uuid4().hex
+        jobs = list(enumerate(params))
+        shards = {shard_id: jobs[start:start + self.shard_size]
+                  for shard_id, start in enumerate(range(0, len(jobs), self.shard_size))}
+        attempts = {shard_id: 0 for shard_id in shards}
+        started: Dict[int, float] = {}
+        done: Dict[int, List] = {}
+        for shard_id, shard_jobs in shards.items():
+            self.job_queue.put_task(Shard(sweep_id, shard_id, 0, spec, build, shard_jobs))
+
+        while len(done) < len(shards):
+            try:
+                message = self.job_queue.get_result(timeout=self.poll_interval)
+            except queue.Empty:
+                self._resend_stragglers(sweep_id, spec, build, shards, attempts, started, done)
+                continue
+
+            status, message_sweep_id, shard_id, attempt, worker, payload = message
+            if message_sweep_id != sweep_id or shard_id in done:
+                continue
+            if status == "started":
+                started.setdefault(shard_id, time.monotonic())
+            elif status == "done":
+                done[shard_id] = payload
+                if logger.isEnabledFor(logging.INFO):
+                    logger.info("shard %s done by %s, %d/%d", shard_id, worker, len(done), len(shards))
+            elif status == "failed":
+                logger.warning("Shard %s attempt %s failed on %s: %s", shard_id, attempt, worker, payload)
+                if attempt < attempts[shard_id]:
+                    # A newer attempt is already out.
+                    continue
+                if attempts[shard_id] >= self.max_retries:
+                    raise RuntimeError(f"Shard {shard_id} failed {attempts[shard_id] + 1} times. Last error on "
+                                       f"{worker}:\n{payload}")
+                attempts[shard_id] += 1
+                started.pop(shard_id, None)
+                self.job_queue.put_task(Shard(sweep_id, shard_id, attempts[shard_id], spec, build, shards[shard_id]))
+
+        records = [record for shard_id in sorted(done) for record in done[shard_id]]
+        records.sort(key=lambda record: record[0])
+        return pd.DataFrame([{**params[job], **dict(zip(RESULT_FIELDS, values))} for job, values in records])
+
+    def stop_workers(self, n_workers: int) -> None:
+        """
+        Asks n_workers workers to exit after their current shard.
+        """
+        for _ in range(n_workers):
+            self.job_queue.put_task(None)
+
+    def _resend_stragglers(self, sweep_id, spec, build, shards, attempts, started, done) -> None:
+        if self.straggler_timeout is None:
+            return
+        now = time.monotonic()
+        for shard_id, start in list(started.items()):
+            if shard_id in done or now - start < self.straggler_timeout:
+                continue
+            logger.warning("Shard %s has run for %.0fs without a result, sending it again.", shard_id, now - start)
+            # Counted from now, so a copy whose worker died too is sent again after another timeout.
+            started[shard_id] = now
+            self.job_queue.put_task(Shard(sweep_id, shard_id, attempts[shard_id], spec, build, shards[shard_id]))
+
+
+# Market data loaded by this worker process, by configuration. See load_market_data.
+_data_cache: Dict[Hashable, Tuple[Dict, Dict]] = {}
+
+
+def load_market_data(spec: EngineSpec) -> Tuple[Dict, Dict]:
+    """
+    :return: the ohlcv_data and option_data of a configuration, loaded on the first call in this process and reused by
+    every later backtest with the same data.
+    """
+    instruments = tuple(sorted((kind, tuple(symbols)) for kind, symbols in spec.instruments.items()))
+    key = (spec.history_data_path, instruments, spec.frequency, spec.kwargs.get("use_data_cache", False))
+    if key not in _data_cache:
+        # The full history is loaded, so any start and end date of the sweep can share it. Volatility surfaces depend on
+        # the engine kwargs, so every job's engine builds or reuses its own, see BacktestBase._load_data.
+        engine = BacktestBase(spec.history_data_path, spec.instruments, spec.frequency, spec.start_date, spec.end_date,
+                              use_data_cache=spec.kwargs.get("use_data_cache", False), price_missing_options=False)
+        _data_cache[key] = (getattr(engine, "ohlcv_data", {}), getattr(engine, "option_data", {}))
+    return _data_cache[key]
+
+
+def run_job(spec: EngineSpec, build: Callable, params: Dict) -> Tuple:
+    """
+    Runs one backtest with the cached market data.
+    :return: the values of RESULT_FIELDS.
+    """
+    start = time.perf_counter()
+    ohlcv_data, option_data = load_market_data(spec)
+    # The cached option chains are fully loaded, so a prefetcher would only start threads that are never used.
+    kwargs = {key: value for key, value in spec.kwargs.items() if not key.startswith("prefetch_")}
+    engine: BacktestBase = spec.engine_class(spec.history_data_path, spec.instruments, spec.frequency, spec.start_date,
+                                             spec.end_date, ohlcv_data=ohlcv_data, option_data=option_data, **kwargs)
+    try:
+        source = build(engine, **params)
+        if isinstance(source, Strategy):
+            engine.run_strategy(source)
+        else:
+            engine.run_backtest(source)
+    finally:
+        engine.close()
+    returns = np.asarray(engine.period_returns, dtype=np.float64)
+    return (float(engine.portfolio.portfolio_value), float(engine.portfolio.cash_balance),
+            float(engine.net_cash_flow), float(np.prod(1 + returns) - 1), len(returns), time.perf_counter() - start)
+
+
+def run_worker(job_queue: JobQueue, poll_timeout: float = 1.0, idle_timeout: Optional[float] = None) -> int:
+    """
+    Worker loop: takes shards until it gets a stop message (see SweepCoordinator.stop_workers) or, if idle_timeout is
+    set, until no shard came for that many seconds.
+    :return: number of shards run.
+    """
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    shards_run = 0
+    idle_since = time.monotonic()
+    while True:
+        try:
+            shard = job_queue.get_task(timeout=poll_timeout)
+        except queue.Empty:
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                return shards_run
+            continue
+        if shard is None:
+            return shards_run
+
+        job_queue.put_result(("started", shard.sweep_id, shard.shard_id, shard.attempt, worker, None))
+        try:
+            records = [(job, run_job(shard.spec, shard.build, params)) for job, params in shard.jobs]
+        except Exception:
+            job_queue.put_result(("failed", shard.sweep_id, shard.shard_id, shard.attempt, worker,
+                                  traceback.format_exc()))
+        else:
+            job_queue.put_result(("done", shard.sweep_id, shard.shard_id, shard.attempt, worker, records))
+        shards_run += 1
+        idle_since = time.monotonic()
@@ -0,0 +1,126 @@
+"""
+File: black_scholes.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Vectorized Black-Scholes pricing, greeks and implied volatility for European options. Every function takes
+numpy arrays (or scalars that broadcast) so a whole option chain is priced in one call.>
+"""
+from typing import Dict
+
+import numpy as np
+from scipy.special import ndtr
+
+# Greeks use the vendor (CBOE) units: theta per calendar day, vega and rho per 1 percentage point.
+DAYS_PER_YEAR = 365.0
+
+
+def _d1_d2(spot, strike, t, rate, vol, dividend_yield):
+    sqrt_t = np.sqrt(t)
+    d1 = (np.log(spot / strike) + (rate - dividend_yield + 0.5 * vol ** 2) * t) / (vol * sqrt_t)
+    return d1, d1 - vol * sqrt_t, sqrt_t
+
+
+def bs_price(spot, strike, t, rate, vol, is_call, dividend_yield=0.0) -> np.ndarray:
+    """
+    :param spot: underlying price.
+    :param strike: strike price.
+    :param t: time to expiration in years.
+    :param rate: continuously compounded risk free rate.
+    :param vol: volatility.
+    :param is_call: True for calls, False for puts.
+    :param dividend_yield: continuous dividend yield.
+    :return: option prices.
+    """
+    d1, d2, _ = _d1_d2(spot, strike, t, rate, vol, dividend_yield)
+    discount = np.exp(-rate * t)
+    carry = np.exp(-dividend_yield * t)
+    call_price = spot * carry * ndtr(d1) - strike * discount * ndtr(d2)
+    put_price = call_price - spot * carry + strike * discount
+    return np.where(is_call, call_price, put_price)
+
+
+def bs_greeks(spot, strike, t, rate, vol, is_call, dividend_yield=0.0) -> Dict[str, np.ndarray]:
+    """
+    :return: delta, gamma, theta (per day), vega and rho (per 1%). See bs_price for the parameters.
+    """
+    d1, d2, sqrt_t = _d1_d2(spot, strike, t, rate, vol, dividend_yield)
+    discount = np.exp(-rate * t)
+    carry = np.exp(-dividend_yield * t)
+    pdf = np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi)
+    theta_common = -spot * carry * pdf * vol / (2 * sqrt_t)
+    return {
+        "delta": np.where(is_call, carry * ndtr(d1), carry * (ndtr(d1) - 1)),
+        "gamma": carry * pdf / (spot * vol * sqrt_t),
+        "theta": np.where(is_call,
+                          theta_common - rate * strike * discount * ndtr(d2)
+                          + dividend_yield * spot * carry * ndtr(d1),
+                          theta_common + rate * strike * discount * ndtr(-d2)
+                          - dividend_yield * spot * carry * ndtr(-d1)) / DAYS_PER_YEAR,
+        "vega": spot * carry * pdf * sqrt_t / 100,
+        "rho": np.where(is_call, strike * t * discount * ndtr(d2), -strike * t * discount * ndtr(-d2)) / 100,
+    }
+
+
+def implied_volatility(price, spot, strike, t, rate, is_call, dividend_yield=0.0, tol: float = 1e-8,
+                       max_iter: int = 100, low: float = 1e-4, high: float = 5.0) -> np.ndarray:
+    """
+    Newton's method safeguarded by bisection, on all rows at once. Every row keeps a bracket [low, high] that contains
+    the root. A Newton step that leaves the bracket, or has no vega to divide by, is replaced by the midpoint, and rows
+    that converged drop out of the remaining iterations.
+    :param price: option prices, e.g. the bid/ask mid.
+    :param tol: absolute price tolerance.
+    :param low: lowest volatility searched.
+    :param high: highest volatility searched.
+    :return: implied volatilities. nan where the price is outside the no-arbitrage bounds or not finite, or its
+    volatility is outside [low, high].
+    """
+    price, spot, strike, t, rate, is_call, dividend_yield = np.broadcast_arrays(
+        *(np.asarray(value, dtype=np.float64) for value in (price, spot, strike, t, rate, is_call, dividend_yield)))
+    is_call = is_call.astype(bool)
+    n = price.shape
+    result = np.full(n, np.nan)
+
+    discount = np.exp(-rate * t)
+    forward_spot = spot * np.exp(-dividend_yield * t)
+    lower_bound = np.where(is_call, np.maximum(forward_spot - strike * discount, 0),
+                           np.maximum(strike * discount - forward_spot, 0))
+    upper_bound = np.where(is_call, forward_spot, strike * discount)
+    valid = np.isfinite(price) & (t > 0) & (price > lower_bound) & (price < upper_bound)
+
+    index = np.flatnonzero(valid.ravel())
+    args = [array.ravel()[index] for array in (price, spot, strike, t, rate, is_call, dividend_yield)]
+    target, s, k, tt, r, call, q = args
+    lo = np.full(len(index), low)
+    hi = np.full(len(index), high)
+    # Start at the Brenner-Subrahmanyam approximation, clipped into the bracket.
+    vol = np.clip(np.sqrt(2 * np.pi / tt) * target / s, low * 2, high / 2)
+
+    active = np.arange(len(index))
+    for _ in range(max_iter):
+        if len(active) == 0:
+            break
+        v = vol[active]
+        d1, _, sqrt_t = _d1_d2(s[active], k[active], tt[active], r[active], v, q[active])
+        diff = bs_price(s[active], k[active], tt[active], r[active], v, call[active], q[active]) - target[active]
+        vega = s[active] * np.exp(-q[active] * tt[active]) * np.exp(-0.5 * d1 ** 2) / np.sqrt(2 * np.pi) * sqrt_t
+
+        converged = np.abs(diff) < tol
+        # Price increases with vol, so a positive diff means the root is below v.
+        hi[active] = np.where(diff > 0, v, hi[active])
+        lo[active] = np.where(diff < 0, v, lo[active])
+        with np.errstate(divide="ignore", invalid="ignore", over="ignore"):
+            newton = v - diff / vega
+        in_bracket = np.isfinite(newton) & (newton > lo[active]) & (newton < hi[active])
+        vol[active] = np.where(converged, v, np.where(in_bracket, newton, 0.5 * (lo[active] + hi[active])))
+        active = active[~converged & (hi[active] - lo[active] > tol)]
+
+    solved = np.full(len(index), True)
+    solved[active] = False
+    # A volatility outside [low, high] collapses the bracket onto its edge without matching the price.
+    edge = solved & ((vol <= low + tol) | (vol >= high - tol))
+    if edge.any():
+        residual = bs_price(s[edge], k[edge], tt[edge], r[edge], vol[edge], call[edge], q[edge]) - target[edge]
+        solved[np.flatnonzero(edge)[np.abs(residual) > tol]] = False
+    flat = result.ravel()
+    flat[index[solved]] = vol[solved]
+    return flat.reshape(n)
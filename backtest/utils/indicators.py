@@ -0,0 +1,244 @@
+"""
+File: indicators.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Streaming technical indicators. Each indicator is updated with one bar at a time in O(1) (RollingMax and
+RollingMin in amortized O(1)) and keeps only a fixed size ring buffer, so a strategy computes them in the same pass as
+the backtest instead of over the full history up front.>
+"""
+import math
+from collections import deque
+
+import numpy as np
+
+
+class Indicator(object):
+    """
+    value is nan until the indicator has seen enough bars, see ready. Non-finite inputs, e.g. the nan of a symbol
+    without a bar at a timestamp (see strategy.Bar), are skipped: update returns the current value and the input doesn't
+    count toward period.
+    """
+
+    def __init__(self, period: int) -> None:
+        if period < 1:
+            raise ValueError(f"Invalid period {period}.")
+        self.period = period
+        self.count = 0
+        self.value = math.nan
+
+    @property
+    def ready(self) -> bool:
+        return self.count >= self.period
+
+
+class _Window(Indicator):
+    """
+    Ring buffer of the last period values. push() returns the value that drops out of the window, or None while the
+    window fills up.
+    """
+
+    def __init__(self, period: int) -> None:
+        super().__init__(period)
+        self._buffer = np.zeros(period, dtype=np.float64)
+        self._head = 0
+
+    def push(self, x: float):
+        dropped = self._buffer[self._head] if self.count >= self.period else None
+        self._buffer[self._head] = x
+        self._head = (self._head + 1) % self.period
+        self.count += 1
+        return dropped
+
+
+class EMA(Indicator):
+    def __init__(self, period: int, alpha: float = None) -> None:
+        """
+        :param alpha: smoothing factor. Defaults to 2 / (period + 1). The first period values are averaged to seed it.
+        """
+        super().__init__(period)
+        self.alpha = 2 / (period + 1) if alpha is None else alpha
+        self._seed = 0.0
+
+    def update(self, x: float) -> float:
+        if not math.isfinite(x):
+            return self.value
+        self.count += 1
+        if self.count < self.period:
+            self._seed += x
+        elif self.count == self.period:
+            self.value = (self._seed + x) / self.period
+        else:
+            self.value += self.alpha * (x - self.value)
+        return self.value
+
+
+class RollingMean(_Window):
+    def __init__(self, period: int) -> None:
+        super().__init__(period)
+        self._sum = 0.0
+
+    def update(self, x: float) -> float:
+        if not math.isfinite(x):
+            return self.value
+        dropped = self.push(x)
+        self._sum += x - (dropped if dropped is not None else 0.0)
+        if self.ready:
+            self.value = self._sum / self.period
+        return self.value
+
+
+class RollingStd(_Window):
+    def __init__(self, period: int, ddof: int = 1) -> None:
+        """
+        :param ddof: delta degrees of freedom, 1 for the sample standard deviation like pandas.
+        """
+        if period <= ddof:
+            raise ValueError(f"period must be larger than ddof {ddof}.")
+        super().__init__(period)
+        self.ddof = ddof
+        self.mean = math.nan
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, x: float) -> float:
+        if not math.isfinite(x):
+            return self.value
+        dropped = self.push(x)
+        if dropped is None:
+            # Welford's update while the window grows.
+            delta = x - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (x - self._mean)
+        else:
+            # Welford's update for a sliding window: x replaces dropped.
+            old_mean = self._mean
+            self._mean += (x - dropped) / self.period
+            self._m2 += (x - dropped) * (x - self._mean + dropped - old_mean)
+        if self.ready:
+            self.mean = self._mean
+            self.value = math.sqrt(max(self._m2, 0.0) / (self.period - self.ddof))
+        return self.value
+
+
+class RSI(Indicator):
+    """
+    Relative strength index with Wilder's smoothing. Ready after period changes, i.e. period + 1 prices.
+    """
+
+    def __init__(self, period: int = 14) -> None:
+        super().__init__(period)
+        self._previous = None
+        self._gain = 0.0
+        self._loss = 0.0
+
+    def update(self, price: float) -> float:
+        if not math.isfinite(price):
+            return self.value
+        if self._previous is None:
+            self._previous = price
+            return self.value
+        change = price - self._previous
+        self._previous = price
+        gain, loss = max(change, 0.0), max(-change, 0.0)
+        self.count += 1
+        if self.count <= self.period:
+            self._gain += gain / self.period
+            self._loss += loss / self.period
+        else:
+            self._gain += (gain - self._gain) / self.period
+            self._loss += (loss - self._loss) / self.period
+        if self.ready:
+            self.value = 100.0 if self._loss == 0 else 100.0 - 100.0 / (1.0 + self._gain / self._loss)
+        return self.value
+
+
+class ATR(Indicator):
+    """
+    Average true range with Wilder's smoothing.
+    """
+
+    def __init__(self, period: int = 14) -> None:
+        super().__init__(period)
+        self._previous_close = None
+        self._seed = 0.0
+
+    def update(self, high: float, low: float, close: float) -> float:
+        if not (math.isfinite(high) and math.isfinite(low) and math.isfinite(close)):
+            return self.value
+        true_range = high - low
+        if self._previous_close is not None:
+            true_range = max(true_range, abs(high - self._previous_close), abs(low - self._previous_close))
+        self._previous_close = close
+        self.count += 1
+        if self.count < self.period:
+            self._seed += true_range
+        elif self.count == self.period:
+            self.value = (self._seed + true_range) / self.period
+        else:
+            self.value += (true_range - self.value) / self.period
+        return self.value
+
+
+class _MonotonicDeque(object):
+    """
+    Maximum of the last period pushed values, from a deque of (push number, value) with decreasing values. Each value is
+    appended and popped at most once, so a push is amortized O(1).
+    """
+
+    def __init__(self, period: int) -> None:
+        self.period = period
+        self.count = 0
+        self._deque = deque()
+
+    def push(self, x: float) -> float:
+        """
+        :return: the maximum of the window including x. It's defined on a partial window too.
+        """
+        while self._deque and self._deque[-1][1] <= x:
+            self._deque.pop()
+        self._deque.append((self.count, x))
+        self.count += 1
+        if self._deque[0][0] <= self.count - 1 - self.period:
+            self._deque.popleft()
+        return self._deque[0][1]
+
+
+class RollingMax(Indicator):
+    """
+    Maximum of the last period values, in amortized O(1). The maximum is defined on a partial window too, so it can
+    trigger from the first bar.
+    """
+
+    def __init__(self, period: int) -> None:
+        super().__init__(period)
+        self._window = _MonotonicDeque(period)
+
+    def update(self, x: float) -> float:
+        if not math.isfinite(x):
+            return self.value
+        self.value = self._window.push(x)
+        self.count = self._window.count
+        return self.value
+
+    def drawdown(self, x: float) -> float:
+        """
+        :return: x / rolling max - 1, e.g. -0.1 when x is 10% below the high of the window.
+        """
+        return x / self.value - 1
+
+
+class RollingMin(Indicator):
+    """
+    Minimum of the last period values, like RollingMax.
+    """
+
+    def __init__(self, period: int) -> None:
+        super().__init__(period)
+        self._window = _MonotonicDeque(period)
+
+    def update(self, x: float) -> float:
+        if not math.isfinite(x):
+            return self.value
+        self.value = -self._window.push(-x)
+        self.count = self._window.count
+        return self.value
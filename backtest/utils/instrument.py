@@ -1,8 +1,9 @@
 from __future__ import annotations # Allows type hinting a class within itself (e.g., in Option)
 
-from abc import ABC, abstractmethod
+from abc import ABC
 from enum import Enum
-from datetime import date
+from datetime import date, datetime
+from typing import Dict, Hashable, List
 
 
 class InstrumentType(Enum):
@@ -15,58 +16,102 @@ class OptionType(Enum):
     PUT = "P"
 
 
+class InstrumentRegistry(object):
+    """
+    Interning registry for instruments. Every distinct instrument is created once and gets a dense integer id in
+    creation order, so ids can index arrays of positions or prices. The registry lives for the whole process.
+    """
+    _by_key: Dict[Hashable, Instrument] = {}
+    _by_id: List[Instrument] = []
+
+    @staticmethod
+    def get(dense_id: int) -> Instrument:
+        """
+        :param dense_id: the dense id of an interned instrument.
+        :return: the instrument.
+        """
+        return InstrumentRegistry._by_id[dense_id]
+
+    @staticmethod
+    def size() -> int:
+        """
+        :return: number of interned instruments, i.e. the upper bound of dense ids.
+        """
+        return len(InstrumentRegistry._by_id)
+
+    @staticmethod
+    def _intern(instrument_class: type, key: Hashable, symbol: str, **fields) -> Instrument:
+        instrument = InstrumentRegistry._by_key.get(key)
+        if instrument is not None:
+            return instrument
+
+        instrument = object.__new__(instrument_class)
+        for name, value in fields.items():
+            object.__setattr__(instrument, name, value)
+        object.__setattr__(instrument, "symbol", symbol)
+        object.__setattr__(instrument, "dense_id", len(InstrumentRegistry._by_id))
+        object.__setattr__(instrument, "_hash", hash(symbol))
+        InstrumentRegistry._by_key[key] = instrument
+        InstrumentRegistry._by_id.append(instrument)
+        return instrument
+
+
 class Instrument(ABC):
     """
     Abstract base class for a tradable instrument.
+
+    Instruments are immutable flyweights: constructing an instrument that already exists returns the existing object,
+    so identity comparison is equality. The trading symbol, hash and dense id are computed once at creation.
+    Subclasses define:
+    - type: type of instrument (e.g., stock, option, future, etc).
+    - multiplier: contract multiplier. For stocks, it's 1. For standard options, it's 100.
     """
+    __slots__ = ("symbol", "dense_id", "_hash")
+
+    type: InstrumentType
+    multiplier: int
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} is immutable.")
+
+    def __hash__(self) -> int:
+        return self._hash
+
+    def __copy__(self) -> Instrument:
+        return self
+
+    def __deepcopy__(self, memo) -> Instrument:
+        return self
 
-    @property
-    @abstractmethod
-    def symbol(self) -> str:
-        # Unique trading symbol for the instrument.
-        raise NotImplementedError
-
-    @property
-    @abstractmethod
-    def type(self) -> InstrumentType:
-        # Type of instrument (e.g., stock, option, future, etc).
-        raise NotImplementedError
-
-    @property
-    @abstractmethod
-    def multiplier(self) -> int:
-        # Contract multiplier. For stocks, it's 1. For standard options, it's 100.
-        raise NotImplementedError
-    
 
 class Stock(Instrument):
-    def __init__(self, ticker: str) -> None:
-        self._ticker = ticker
+    __slots__ = ()
+
+    type = InstrumentType.STOCK
+    multiplier = 1
 
-    @property
-    def symbol(self) -> str:
-        return self._ticker
+    def __new__(cls, ticker: str) -> Stock:
+        return InstrumentRegistry._intern(cls, (InstrumentType.STOCK, ticker), ticker)
 
-    @property
-    def type(self) -> InstrumentType:
-        return InstrumentType.STOCK
+    def __reduce__(self):
+        # Unpickling goes through __new__, so the copy is interned in the receiving process.
+        return Stock, (self.symbol,)
 
-    @property
-    def multiplier(self) -> int:
-        return 1
-    
     def __repr__(self):
         return f"Stock(ticker='{self.symbol}')"
 
     def to_option(self, expiration_date: date, strike_price: float, option_type: OptionType) -> Option:
         """
         Creates an Option instrument for this stock with the specified parameters.
-        
+
         Args:
             expiration_date: The expiration date of the option.
             strike_price: The strike price of the option.
             option_type: The type of the option (CALL or PUT).
-            
+
         Returns:
             An Option instrument instance.
         """
@@ -78,35 +123,37 @@ class Stock(Instrument):
         )
 
 
-
 class Option(Instrument):
-    def __init__(self, underlying_symbol: str, expiration_date: date, strike_price: float, option_type: OptionType) -> None:
-        self.underlying_symbol = underlying_symbol
-        self.expiration_date = expiration_date
-        self.strike_price = strike_price
-        self.option_type = option_type
-    
-    @property
-    def symbol(self) -> str:
-        """
-        Generates the standard OCC (Options Clearing Corporation) symbol.
-        Example: SPY241220C00450000
-        """
-        return (
-            f"{self.underlying_symbol.ljust(6)}"
-            f"{self.expiration_date.strftime('%y%m%d')}"
-            f"{self.option_type.value}"
-            f"{int(self.strike_price * 1000):08d}"
+    __slots__ = ("underlying_symbol", "expiration_date", "strike_price", "option_type", "_underlying")
+
+    type = InstrumentType.OPTION
+    # Standard US equity options control 100 shares
+    multiplier = 100
+
+    def __new__(cls, underlying_symbol: str, expiration_date: date, strike_price: float,
+                option_type: OptionType) -> Option:
+        # Timestamps and datetimes are reduced to their date so that the same contract always maps to one instance.
+        if isinstance(expiration_date, datetime):
+            expiration_date = expiration_date.date()
+        strike_price = float(strike_price)
+        option_type = OptionType(option_type)
+        key = (InstrumentType.OPTION, underlying_symbol, expiration_date, strike_price, option_type)
+        if key in InstrumentRegistry._by_key:
+            return InstrumentRegistry._by_key[key]
+
+        # Standard OCC (Options Clearing Corporation) symbol. Example: SPY   241220C00450000
+        symbol = (
+            f"{underlying_symbol.ljust(6)}"
+            f"{expiration_date.strftime('%y%m%d')}"
+            f"{option_type.value}"
+            f"{int(strike_price * 1000):08d}"
         )
+        return InstrumentRegistry._intern(cls, key, symbol, underlying_symbol=underlying_symbol,
+                                          expiration_date=expiration_date, strike_price=strike_price,
+                                          option_type=option_type, _underlying=Stock(underlying_symbol))
 
-    @property
-    def type(self) -> InstrumentType:
-        return InstrumentType.OPTION
-
-    @property
-    def multiplier(self) -> int:
-        # Standard US equity options control 100 shares
-        return 100
+    def __reduce__(self):
+        return Option, (self.underlying_symbol, self.expiration_date, self.strike_price, self.option_type)
 
     def __repr__(self):
         return (f"Option(underlying='{self.underlying_symbol}', expiry='{self.expiration_date}', "
@@ -115,8 +162,8 @@ class Option(Instrument):
     def get_underlying(self) -> Stock:
         """
         Returns the underlying Stock instrument for this option.
-        
+
         Returns:
             A Stock instrument instance representing the underlying.
         """
-        return Stock(ticker=self.underlying_symbol)
\ No newline at end of file
+        return self._underlying
@@ -1,33 +1,95 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
 from datetime import datetime
+from typing import List, Optional
 
+LOGGER_NAME = "backtest"
+LOG_FORMAT = "%(levelname)s -  %(message)s"
 
-# Set up the logger once in the logger module
-def setup_logger():
-    logger = logging.getLogger("")
-    if not logger.hasHandlers():  # Avoid duplicate handlers
-        logger.setLevel(logging.DEBUG)
+# Importing this module has no side effects: records go to a NullHandler until setup_logger() attaches real handlers,
+# which then run on a background QueueListener thread.
+logger = logging.getLogger(LOGGER_NAME)
+logger.addHandler(logging.NullHandler())
 
-        # Create handlers (console and file)
-        console_handler = logging.StreamHandler()
-        timestamp = datetime.now().strftime("%Y-%m-%d")
-        file_handler = logging.FileHandler(f"logs/{timestamp}.log")
+_listener: Optional[logging.handlers.QueueListener] = None
+_atexit_registered = False
+
+
+class _LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that defers formatting to the listener thread. The stock QueueHandler.prepare() formats the message
+    on the calling thread, which is exactly the work we want to keep off the hot path. Records never leave the process,
+    so handing over the unformatted record is safe as long as callers pass immutable arguments.
+    """
 
-        # Set level for handlers
-        console_handler.setLevel(logging.DEBUG)
-        file_handler.setLevel(logging.INFO)
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
-        # Create formatter and add it to handlers
-        formatter = logging.Formatter('%(levelname)s -  %(message)s')
-        console_handler.setFormatter(formatter)
-        file_handler.setFormatter(formatter)
 
-        # Add handlers to the logger
-        logger.addHandler(console_handler)
-        logger.addHandler(file_handler)
+def setup_logger(level: int = logging.INFO, log_dir: Optional[str] = None, console: bool = True,
+                 fmt: str = LOG_FORMAT) -> logging.Logger:
+    """
+    Attach console and/or file handlers to the package logger. Handlers run on a background QueueListener so the
+    simulation thread only pays for enqueuing a record. Calling it again replaces the previous configuration.
+    :param level: minimum level of the package logger.
+    :param log_dir: directory for a <YYYY-MM-DD>.log file. It is created if missing. No file is written if None.
+    :param console: whether to log to stderr.
+    :param fmt: format string shared by all handlers.
+    :return: the package logger.
+    """
+    global _listener, _atexit_registered
+    stop_logger()
+
+    formatter = logging.Formatter(fmt)
+    handlers: List[logging.Handler] = []
+    if console:
+        handlers.append(logging.StreamHandler())
+    if log_dir is not None:
+        os.makedirs(log_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y-%m-%d")
+        handlers.append(logging.FileHandler(os.path.join(log_dir, f"{timestamp}.log")))
+    for handler in handlers:
+        handler.setFormatter(formatter)
 
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+
+    if handlers:
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(_LazyQueueHandler(log_queue))
+        _listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+        _listener.start()
+        if not _atexit_registered:
+            atexit.register(stop_logger)
+            _atexit_registered = True
+    else:
+        logger.addHandler(logging.NullHandler())
+
+    logger.setLevel(level)
+    logger.propagate = False
+    logger.disabled = False
     return logger
 
 
-# Create a global instance of the logger
-logger = setup_logger()
\ No newline at end of file
+def stop_logger() -> None:
+    """
+    Flush pending records and stop the background listener, if any.
+    """
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+
+
+def set_quiet(quiet: bool = True) -> None:
+    """
+    Quiet mode for parameter sweeps. A disabled logger fails every isEnabledFor() check, so guarded call sites skip
+    building their arguments and nothing is ever formatted.
+    :param quiet: True to silence the package logger, False to restore it.
+    """
+    logger.disabled = quiet
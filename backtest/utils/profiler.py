@@ -0,0 +1,153 @@
+"""
+File: profiler.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Optional instrumentation for the backtest engine. Engines keep a profiler reference that defaults to None,
+so nothing is wrapped or timed unless a Profiler is passed in.>
+"""
+import json
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+_clock = time.perf_counter_ns
+
+
+class Profiler(object):
+    """
+    Collects per-event-type counts and handler time, data lookup time, data load time and peak memory of a run.
+
+    Usage:
+    profiler = Profiler()
+    bt = BacktestBase(..., profiler=profiler)
+    bt.run_backtest(events)
+    profiler.report()
+    profiler.export_chrome_trace("trace.json")
+    """
+
+    def __init__(self, trace_memory: bool = False, max_trace_events: int = 1_000_000) -> None:
+        """
+        :param trace_memory: track the peak traced memory of run_backtest with tracemalloc. It slows the run down
+        noticeably, so timings of a memory-traced run should not be compared with untraced ones.
+        :param max_trace_events: cap on the number of spans kept for the trace file. Aggregates are always complete.
+        """
+        self.trace_memory = trace_memory
+        self.max_trace_events = max_trace_events
+        self.counts: Dict[str, Dict[str, int]] = {"event": {}, "lookup": {}, "load": {}}
+        self.times_ns: Dict[str, Dict[str, int]] = {"event": {}, "lookup": {}, "load": {}}
+        self.peak_memory_bytes: Optional[int] = None
+        self.run_time_ns = 0
+        self._spans: List[Tuple[str, str, int, int]] = []
+        self._origin_ns = _clock()
+
+    def record(self, category: str, name: str, start_ns: int, duration_ns: int) -> None:
+        counts = self.counts[category]
+        times = self.times_ns[category]
+        counts[name] = counts.get(name, 0) + 1
+        times[name] = times.get(name, 0) + duration_ns
+        if len(self._spans) < self.max_trace_events:
+            self._spans.append((name, category, start_ns, duration_ns))
+
+    @contextmanager
+    def span(self, category: str, name: str) -> Iterator[None]:
+        start = _clock()
+        try:
+            yield
+        finally:
+            self.record(category, name, start, _clock() - start)
+
+    def trace_events(self, events: Iterable[Any]) -> Iterator[Any]:
+        """
+        Wraps the event iterable of run_backtest. The time between yielding an event and being resumed is the time
+        the engine spent handling it, so the engine loop itself does not need any timing code.
+        :param events: time sorted events.
+        :return: the same events.
+        """
+        started_tracing = self.trace_memory and not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        elif self.trace_memory:
+            tracemalloc.reset_peak()
+        run_start = _clock()
+        record = self.record
+        try:
+            for event in events:
+                start = _clock()
+                yield event
+                record("event", type(event).__name__, start, _clock() - start)
+        finally:
+            self.run_time_ns += _clock() - run_start
+            if self.trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                self.peak_memory_bytes = max(self.peak_memory_bytes or 0, peak)
+                if started_tracing:
+                    tracemalloc.stop()
+
+    def instrument(self, obj: Any, method_name: str, name: Optional[str] = None) -> None:
+        """
+        Times every call of obj.method_name as a data lookup by shadowing the bound method on the instance. Objects
+        that were never instrumented keep calling the plain method.
+        :param obj: object that owns the method, e.g. an OHLCV or OptionChain instance.
+        :param method_name: name of the method.
+        :param name: name in the report. Defaults to <class name>.<method name>.
+        """
+        method = getattr(obj, method_name)
+        name = name or f"{type(obj).__name__}.{method_name}"
+        record = self.record
+
+        def timed(*args, **kwargs):
+            start = _clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                record("lookup", name, start, _clock() - start)
+
+        setattr(obj, method_name, timed)
+
+    def report(self) -> Dict:
+        """
+        :return: a json serializable dictionary of the aggregated measurements. Times are in milliseconds.
+        """
+        def summarize(category: str) -> Dict[str, Dict[str, float]]:
+            summary = {}
+            for name, count in sorted(self.counts[category].items(), key=lambda item: -self.times_ns[category][item[0]]):
+                total_ns = self.times_ns[category][name]
+                summary[name] = {"count": count, "total_ms": total_ns / 1e6, "mean_us": total_ns / count / 1e3}
+            return summary
+
+        return {
+            "run_ms": self.run_time_ns / 1e6,
+            "events": summarize("event"),
+            "lookups": summarize("lookup"),
+            "data_load": summarize("load"),
+            "peak_memory_bytes": self.peak_memory_bytes,
+        }
+
+    def export_chrome_trace(self, file_path: str) -> None:
+        """
+        Writes the recorded spans in the Chrome trace event format, which chrome://tracing, Perfetto and speedscope
+        can open.
+        :param file_path: output json path.
+        """
+        trace_events = [{
+            "name": name,
+            "cat": category,
+            "ph": "X",
+            "ts": (start_ns - self._origin_ns) / 1e3,
+            "dur": duration_ns / 1e3,
+            "pid": 1,
+            "tid": 1,
+        } for name, category, start_ns, duration_ns in self._spans]
+
+        with open(file_path, "w") as f:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms"}, f)
+
+
+def profile_span(profiler: Optional[Profiler], category: str, name: str):
+    """
+    :return: a timing span if profiler is set, otherwise a no-op context manager.
+    """
+    if profiler is None:
+        return nullcontext()
+    return profiler.span(category, name)
@@ -0,0 +1,68 @@
+"""
+File: timeutil.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Internal time representation. The engine works on int64 nanoseconds since the UTC epoch and day ordinals
+(days since 1970-01-01 UTC). Timestamps are only built at API boundaries. Naive inputs are treated as UTC, the same way
+the OHLCV loader does.>
+"""
+from datetime import date, datetime
+
+import numpy as np
+import pandas as pd
+
+NS_PER_SECOND = 1_000_000_000
+NS_PER_HOUR = 3600 * NS_PER_SECOND
+NS_PER_DAY = 24 * NS_PER_HOUR
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def to_ns(value) -> int:
+    """
+    :param value: int nanoseconds, Timestamp, datetime, date, np.datetime64 or a date string.
+    :return: nanoseconds since the UTC epoch.
+    """
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, pd.Timestamp):
+        return value.value
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return (value.toordinal() - _EPOCH_ORDINAL) * NS_PER_DAY
+    return pd.Timestamp(value).value
+
+
+def to_ns_array(values) -> np.ndarray:
+    """
+    Parses a column of timestamps once.
+    :param values: Series, Index or array of datetimes or ISO8601 strings.
+    :return: int64 array of nanoseconds since the UTC epoch.
+    """
+    if isinstance(values, (pd.Series, pd.Index)) and pd.api.types.is_datetime64_any_dtype(values.dtype):
+        parsed = values
+    else:
+        parsed = pd.to_datetime(values, utc=True, format="ISO8601")
+    if isinstance(parsed, pd.Series):
+        parsed = pd.DatetimeIndex(parsed)
+    if parsed.tz is not None:
+        parsed = parsed.tz_convert("UTC").tz_localize(None)
+    return parsed.as_unit("ns").asi8.copy()
+
+
+def to_timestamp(ns: int) -> pd.Timestamp:
+    """
+    :param ns: nanoseconds since the UTC epoch.
+    :return: UTC Timestamp.
+    """
+    return pd.Timestamp(ns, tz="UTC")
+
+
+def day_ordinal(ns: int) -> int:
+    """
+    :param ns: nanoseconds since the UTC epoch.
+    :return: number of days since 1970-01-01 of the UTC date.
+    """
+    return ns // NS_PER_DAY
+
+
+def ordinal_to_date(ordinal: int) -> date:
+    return date.fromordinal(int(ordinal) + _EPOCH_ORDINAL)
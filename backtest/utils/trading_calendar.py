@@ -0,0 +1,221 @@
+"""
+File: trading_calendar.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <NYSE trading calendar with session boundaries precomputed as int64 UTC nanoseconds.>
+"""
+from datetime import date, time, timedelta
+from functools import lru_cache
+from typing import Set
+
+import numpy as np
+import pandas as pd
+
+from .timeutil import to_ns, NS_PER_DAY
+
+EXCHANGE_TIMEZONE = "America/New_York"
+REGULAR_OPEN = time(9, 30)
+REGULAR_CLOSE = time(16, 0)
+EARLY_CLOSE = time(13, 0)
+
+# Unscheduled full day closures.
+SPECIAL_CLOSURES = {
+    date(2001, 9, 11), date(2001, 9, 12), date(2001, 9, 13), date(2001, 9, 14),
+    date(2004, 6, 11),
+    date(2007, 1, 2),
+    date(2012, 10, 29), date(2012, 10, 30),
+    date(2018, 12, 5),
+    date(2025, 1, 9),
+}
+
+
+def _nth_weekday(year: int, month: int, weekday: int, n: int) -> date:
+    """
+    :param n: 1 based occurrence. -1 is the last occurrence in the month.
+    """
+    if n > 0:
+        first = date(year, month, 1)
+        return first + timedelta(days=(weekday - first.weekday()) % 7 + 7 * (n - 1))
+    next_month = date(year + month // 12, month % 12 + 1, 1)
+    last = next_month - timedelta(days=1)
+    return last - timedelta(days=(last.weekday() - weekday) % 7)
+
+
+def _easter(year: int) -> date:
+    # Anonymous Gregorian algorithm.
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return date(year, month, day)
+
+
+def _observed(day: date) -> date:
+    """
+    Saturday holidays are observed on Friday and Sunday holidays on Monday.
+    """
+    if day.weekday() == 5:
+        return day - timedelta(days=1)
+    if day.weekday() == 6:
+        return day + timedelta(days=1)
+    return day
+
+
+def nyse_holidays(year: int) -> Set[date]:
+    """
+    :return: full day NYSE holidays of a year.
+    """
+    holidays = set()
+    new_year = date(year, 1, 1)
+    # NYSE doesn't close on Friday Dec 31 when New Year's Day falls on a Saturday.
+    if new_year.weekday() != 5:
+        holidays.add(_observed(new_year))
+    if year >= 1998:
+        holidays.add(_nth_weekday(year, 1, 0, 3))
+    holidays.add(_nth_weekday(year, 2, 0, 3))
+    holidays.add(_easter(year) - timedelta(days=2))
+    holidays.add(_nth_weekday(year, 5, 0, -1))
+    if year >= 2022:
+        holidays.add(_observed(date(year, 6, 19)))
+    holidays.add(_observed(date(year, 7, 4)))
+    holidays.add(_nth_weekday(year, 9, 0, 1))
+    holidays.add(_nth_weekday(year, 11, 3, 4))
+    holidays.add(_observed(date(year, 12, 25)))
+    holidays.update(day for day in SPECIAL_CLOSURES if day.year == year)
+    return holidays
+
+
+def nyse_early_closes(year: int) -> Set[date]:
+    """
+    :return: days of a year on which NYSE closes at 13:00.
+    """
+    early_closes = set()
+    july_3 = date(year, 7, 3)
+    if july_3.weekday() < 4:
+        early_closes.add(july_3)
+    early_closes.add(_nth_weekday(year, 11, 3, 4) + timedelta(days=1))
+    christmas_eve = date(year, 12, 24)
+    if christmas_eve.weekday() < 4:
+        early_closes.add(christmas_eve)
+    return early_closes
+
+
+class TradingCalendar(object):
+    """
+    Sessions of whole calendar years. Session open/close are int64 UTC nanoseconds, so DST is already applied, and
+    every per-day lookup is O(1) through a dense table indexed by day ordinal (days since epoch).
+
+    Use TradingCalendar.for_range to share one instance per range of years.
+    """
+
+    def __init__(self, start_year: int, end_year: int) -> None:
+        """
+        :param start_year: first year, inclusive.
+        :param end_year: last year, inclusive.
+        """
+        self.start_year = start_year
+        self.end_year = end_year
+
+        holidays: Set[date] = set()
+        early_closes: Set[date] = set()
+        for year in range(start_year, end_year + 1):
+            holidays |= nyse_holidays(year)
+            early_closes |= nyse_early_closes(year)
+
+        days = pd.bdate_range(date(start_year, 1, 1), date(end_year, 12, 31))
+        days = days[~days.isin(pd.DatetimeIndex(sorted(holidays)))]
+        is_early = days.isin(pd.DatetimeIndex(sorted(early_closes)))
+        open_offset = pd.Timedelta(hours=REGULAR_OPEN.hour, minutes=REGULAR_OPEN.minute)
+        close_offset = np.where(is_early,
+                                pd.Timedelta(hours=EARLY_CLOSE.hour, minutes=EARLY_CLOSE.minute),
+                                pd.Timedelta(hours=REGULAR_CLOSE.hour, minutes=REGULAR_CLOSE.minute))
+
+        self.session_days = days.as_unit("ns").asi8 // NS_PER_DAY
+        self.session_open_ns = (days + open_offset).tz_localize(EXCHANGE_TIMEZONE).tz_convert("UTC").as_unit("ns").asi8
+        self.session_close_ns = (days + pd.TimedeltaIndex(close_offset)).tz_localize(EXCHANGE_TIMEZONE) \
+            .tz_convert("UTC").as_unit("ns").asi8
+        self.is_early_close = np.asarray(is_early)
+
+        # Dense day ordinal -> session index table. -1 marks weekends and holidays.
+        self.first_day = (date(start_year, 1, 1) - date(1970, 1, 1)).days
+        last_day = (date(end_year, 12, 31) - date(1970, 1, 1)).days
+        self._session_by_day = np.full(last_day - self.first_day + 1, -1, dtype=np.int64)
+        self._session_by_day[self.session_days - self.first_day] = np.arange(len(self.session_days))
+
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def for_years(start_year: int, end_year: int) -> "TradingCalendar":
+        return TradingCalendar(start_year, end_year)
+
+    @staticmethod
+    def for_range(start, end) -> "TradingCalendar":
+        """
+        :param start: first day to cover. Anything to_ns accepts.
+        :param end: last day to cover.
+        :return: a shared calendar of the whole years that cover [start, end].
+        """
+        start_year = pd.Timestamp(to_ns(start)).year
+        end_year = pd.Timestamp(to_ns(end)).year
+        return TradingCalendar.for_years(start_year, end_year)
+
+    def __len__(self) -> int:
+        return len(self.session_days)
+
+    def session_index(self, day: int) -> int:
+        """
+        :param day: day ordinal of the local trading date.
+        :return: index of the session on that day, or -1 if the market is closed or the day is out of range.
+        """
+        offset = day - self.first_day
+        if offset < 0 or offset >= len(self._session_by_day):
+            return -1
+        return int(self._session_by_day[offset])
+
+    def session_on_or_before(self, day: int) -> int:
+        """
+        :param day: day ordinal.
+        :return: index of the last session on or before the day, or -1 if there is none.
+        """
+        return int(np.searchsorted(self.session_days, day, side="right")) - 1
+
+    def session_close_on_or_before(self, day) -> int:
+        """
+        Close of the last session on or before a date, e.g. the effective expiration time of an option that expires
+        on a holiday.
+        :param day: anything to_ns accepts. The date part is used.
+        :return: session close in UTC ns.
+        """
+        index = self.session_on_or_before(to_ns(day) // NS_PER_DAY)
+        if index < 0:
+            raise ValueError(f"No session on or before {day} in calendar {self.start_year}-{self.end_year}.")
+        return int(self.session_close_ns[index])
+
+    def session_mask(self, ts_ns: np.ndarray, bar_ns: int = 0) -> np.ndarray:
+        """
+        Vectorized session filter.
+        :param ts_ns: sorted or unsorted bar start times in UTC ns.
+        :param bar_ns: bar length. A bar is kept if [start, start + bar_ns) overlaps a session, so an hourly bar that
+        starts before the open is kept when the open falls inside it.
+        :return: boolean mask.
+        """
+        index = np.searchsorted(self.session_close_ns, ts_ns, side="right")
+        in_range = index < len(self.session_close_ns)
+        index = np.minimum(index, len(self.session_close_ns) - 1)
+        return in_range & (ts_ns + max(bar_ns, 1) > self.session_open_ns[index])
+
+    def sessions(self) -> pd.DataFrame:
+        """
+        :return: the sessions as a dataframe of dates and UTC open/close timestamps, for inspection.
+        """
+        return pd.DataFrame({
+            "date": pd.to_datetime(self.session_days * NS_PER_DAY),
+            "open": pd.to_datetime(self.session_open_ns, utc=True),
+            "close": pd.to_datetime(self.session_close_ns, utc=True),
+            "early_close": self.is_early_close,
+        })
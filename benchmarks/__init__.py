@@ -0,0 +1,6 @@
+"""
+File: __init__.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <>
+"""
@@ -0,0 +1,328 @@
+"""
+File: bench_engine.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Benchmark suite for data loading, lookups, the backtest engines and walk-forward model fitting on
+synthetic data. Run it from the repository root:
+    python -m benchmarks.bench_engine --years 2 --output bench.json
+    python -m benchmarks.bench_engine --years 2 --compare bench.json>
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import warnings
+from datetime import timedelta
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+from backtest.backtest_base import BacktestBase
+from backtest.backtest_csp import BacktestCSP
+from backtest.backtest_dca import BacktestDCA
+from backtest.data_parser.data_parser import DataParser
+from backtest.data_parser.synthetic import SyntheticDataGenerator
+from backtest.event import CashFlowChange, Event, FilledOrder, UpdatePortfolio
+from backtest.portfolio import Portfolio
+from backtest.utils.constant import FREQUENCY, SIDE
+from backtest.utils.instrument import Option, OptionType, Stock
+from backtest.utils.logger import set_quiet
+
+
+def measure(fn: Callable[[], object], repeats: int) -> Dict[str, float]:
+    """
+    :param fn: function to time. It is called once more before timing to warm up.
+    :param repeats: number of timed calls.
+    :return: best and median wall time in seconds.
+    """
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return {"best_s": min(samples), "median_s": statistics.median(samples), "repeats": repeats}
+
+
+# Import time budgets in seconds. Sweep workers and CLI jobs pay them on every process start.
+IMPORT_BUDGETS_S = {
+    "backtest.backtest_base": 0.75,
+    "backtest.model_fitting": 0.05,
+    "backtest.model_fitting.model_fitting": 0.75,
+}
+
+
+def measure_import(module: str, repeats: int) -> Dict[str, float]:
+    """
+    Times importing a module in fresh interpreters, as a new worker process would.
+    :return: best and median import time in seconds, the budget, whether the best time is within it and the heavy
+    optional modules the import loaded.
+    """
+    code = (f"import sys, time; start = time.perf_counter(); import {module}; "
+            f"print(time.perf_counter() - start); "
+            f"print(','.join(m for m in ('sklearn', 'scipy', 'matplotlib', 'openpyxl') if m in sys.modules))")
+    samples, loaded = [], ""
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.splitlines()
+        samples.append(float(output[0]))
+        loaded = output[1] if len(output) > 1 else ""
+    budget = IMPORT_BUDGETS_S.get(module)
+    return {"best_s": min(samples), "median_s": statistics.median(samples), "repeats": repeats, "budget_s": budget,
+            "within_budget": budget is None or min(samples) <= budget, "heavy_modules": loaded}
+
+
+def prepare_data_dir(data_dir: str, generator: SyntheticDataGenerator) -> None:
+    """
+    Generates the synthetic data set unless a data set with the same parameters is already there.
+    """
+    marker_path = os.path.join(data_dir, "synthetic.json")
+    params = {k: str(v) for k, v in vars(generator).items()}
+    if os.path.exists(marker_path):
+        with open(marker_path) as f:
+            if json.load(f) == params:
+                return
+    os.makedirs(data_dir, exist_ok=True)
+    generator.generate(data_dir)
+    for symbol in generator.symbols:
+        for cache_file in ("ohlcv-hour.pkl", "option-day.pkl"):
+            cache_path = os.path.join(data_dir, symbol, cache_file)
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+    with open(marker_path, "w") as f:
+        json.dump(params, f)
+
+
+def dca_events(engine: BacktestBase, symbol: str) -> List[Event]:
+    """
+    A daily cash flow followed by a one share purchase at the last close of the day.
+    """
+    data = engine.ohlcv_data[symbol].data
+    daily = data.groupby(data["ts_event"].dt.normalize()).last()
+    stock = Stock(symbol)
+    events = []
+    for ts, close in zip(daily["ts_event"], daily["close"]):
+        events.append(CashFlowChange(ts, float(close)))
+        events.append(FilledOrder(stock, ts, SIDE.BUY, 1, float(close), ts))
+    return events
+
+
+def csp_events(engine: BacktestBase, symbol: str) -> List[Event]:
+    """
+    Sells the nearest expiration put closest to 5% out of the money whenever the previous one expired, buys it back on
+    its last quote date and marks the position to market every day.
+    """
+    chain = engine.option_data[symbol].data
+    closes = engine.ohlcv_data[symbol].data
+    daily_close = closes.groupby(closes["ts_event"].dt.tz_localize(None).dt.normalize())["close"].last()
+    puts = chain[chain["option_type"] == "P"]
+    mids = ((puts["bid_eod"] + puts["ask_eod"]) / 2).to_numpy()
+    keys = list(zip(puts["quote_date"], puts["expiration"], puts["strike"]))
+    mid_by_key = dict(zip(keys, mids))
+
+    events: List[Event] = []
+    held = None
+    for quote_date, day in puts.groupby("quote_date", sort=True):
+        ts = pd.Timestamp(quote_date).tz_localize("UTC") + pd.Timedelta(hours=20)
+        if held is not None and held[0].expiration_date <= (pd.Timestamp(quote_date) + pd.Timedelta(days=1)).date():
+            price = mid_by_key.get((quote_date, held[1], held[0].strike_price), 0.0)
+            events.append(FilledOrder(held[0], ts, SIDE.BUY, 1, float(price), ts))
+            held = None
+        if held is None and quote_date in daily_close.index:
+            target = daily_close[quote_date] * 0.95
+            nearest = day[day["expiration"] == day["expiration"].min()]
+            row = nearest.iloc[(nearest["strike"] - target).abs().argmin()]
+            option = Option(symbol, row["expiration"], float(row["strike"]), OptionType.PUT)
+            events.append(FilledOrder(option, ts, SIDE.SELL, 1, float((row["bid_eod"] + row["ask_eod"]) / 2), ts))
+            held = (option, row["expiration"])
+        if held is not None:
+            price = mid_by_key.get((quote_date, held[1], held[0].strike_price))
+            if price is not None:
+                events.append(UpdatePortfolio(ts, {held[0].symbol: float(price)}))
+    return events
+
+
+def reset(engine: BacktestBase, initial_cash_balance: float) -> None:
+    """
+    Clears the run state, so the next run_backtest starts over on the same loaded data.
+    """
+    engine.portfolio = Portfolio(initial_cash_balance)
+    engine.portfolio_snapshots = []
+    engine.period_returns = []
+    engine.net_cash_flow = initial_cash_balance
+    engine.open_orders = {}
+    engine.last_value = None
+    engine.last_event_ts_ns = None
+
+
+def check_processed(engine: BacktestBase, events: List[Event]) -> None:
+    """
+    Fails the benchmark if a timed run didn't process every event, which would make its events/s meaningless.
+    """
+    if engine.last_event_ts_ns != events[-1].ts_ns:
+        raise RuntimeError(f"{type(engine).__name__} stopped at {engine.last_event_ts_ns}, before the last event at "
+                           f"{events[-1].ts_ns}.")
+
+
+def walk_forward_inputs(data_dir: str, symbol: str):
+    ohlcv = DataParser.read_ohlcv(f"{data_dir}/{symbol}", FREQUENCY.HOUR).reset_index(drop=True)
+    features = []
+    for lag in (1, 2, 4, 8, 16, 32):
+        features.append(pd.DataFrame({"ts_event": ohlcv["ts_event"], f"mom_{lag}": ohlcv["close"].pct_change(lag)}).dropna())
+    return ohlcv, features
+
+
+def run(args: argparse.Namespace) -> Dict:
+    from sklearn.linear_model import LogisticRegression
+    from backtest.model_fitting.model_fitting import prepare_data, fit_model
+
+    set_quiet()
+    warnings.simplefilter("ignore")
+    generator = SyntheticDataGenerator(start_date=args.start_date, years=args.years, symbols=args.symbols,
+                                       strikes=args.strikes, expirations=args.expirations, seed=args.seed)
+    data_dir = args.data_dir or os.path.join(tempfile.gettempdir(), "backtest-bench")
+    prepare_data_dir(data_dir, generator)
+
+    symbol = args.symbols[0]
+    path = f"{data_dir}/{symbol}"
+    instruments = {"stock": args.symbols, "option": args.symbols}
+    end_date = str(generator.end_date.date())
+    results: Dict[str, Dict] = {}
+
+    for module in IMPORT_BUDGETS_S:
+        results[f"import:{module}"] = measure_import(module, args.repeats)
+    results["load_ohlcv_csv"] = measure(lambda: DataParser.read_ohlcv(path, FREQUENCY.HOUR), args.repeats)
+    results["load_option_chain_csv"] = measure(lambda: DataParser.read_option_chain(path), args.repeats)
+    results["load_ohlcv_cached"] = measure(lambda: DataParser.read_ohlcv_cached(path, FREQUENCY.HOUR), args.repeats)
+    results["load_option_chain_cached"] = measure(lambda: DataParser.read_option_chain_cached(path), args.repeats)
+    results["engine_init"] = measure(lambda: BacktestBase(data_dir, instruments, FREQUENCY.HOUR, args.start_date,
+                                                          end_date), args.repeats)
+
+    engine = BacktestBase(data_dir, instruments, FREQUENCY.HOUR, args.start_date, end_date)
+    rng = np.random.default_rng(args.seed)
+    ohlcv = engine.ohlcv_data[symbol]
+    days = ohlcv.data["ts_event"].dt.normalize().unique()
+    lookup_days = [pd.Timestamp(d) for d in rng.choice(days, args.lookups)]
+    results["lookup_ohlcv"] = measure(
+        lambda: [ohlcv.get_ohlcv_by_date_string(d, d + pd.Timedelta(days=1)) for d in lookup_days], args.repeats)
+    results["lookup_ohlcv"]["calls"] = args.lookups
+
+    chain = engine.option_data[symbol]
+    rows = chain.data.iloc[rng.integers(0, len(chain.data), args.lookups)]
+    contracts = [(row.quote_date.date(), Option(symbol, row.expiration, row.strike, OptionType(row.option_type)))
+                 for row in rows.itertuples()]
+    results["lookup_option_price"] = measure(
+        lambda: [chain.get_instrument_price(d, option) for d, option in contracts], args.repeats)
+    results["lookup_option_price"]["calls"] = args.lookups
+
+    dca = BacktestDCA(data_dir, {"stock": [symbol]}, FREQUENCY.HOUR, args.start_date, end_date)
+    events = dca_events(dca, symbol)
+
+    def run_dca():
+        reset(dca, 0)
+        dca.run_backtest(events)
+        check_processed(dca, events)
+
+    results["run_backtest_dca"] = measure(run_dca, args.repeats)
+    results["run_backtest_dca"]["events"] = len(events)
+    results["run_backtest_dca"]["periods"] = len(dca.period_returns)
+    results["run_backtest_dca"]["events_per_s"] = len(events) / results["run_backtest_dca"]["best_s"]
+
+    csp = BacktestCSP(data_dir, {"stock": [symbol], "option": [symbol]}, FREQUENCY.HOUR, args.start_date, end_date)
+    events = csp_events(csp, symbol)
+
+    def run_csp():
+        reset(csp, 1_000_000)
+        csp.run_backtest(events)
+        check_processed(csp, events)
+
+    results["run_backtest_csp"] = measure(run_csp, args.repeats)
+    results["run_backtest_csp"]["events"] = len(events)
+    results["run_backtest_csp"]["snapshots"] = len(csp.portfolio_snapshots)
+    results["run_backtest_csp"]["events_per_s"] = len(events) / results["run_backtest_csp"]["best_s"]
+
+    ohlcv_df, features = walk_forward_inputs(data_dir, symbol)
+    feature_forward = DataParser.merge_features_binary(features, ohlcv_df, 1).reset_index(drop=True)
+    end_time = pd.Timestamp(feature_forward["ts_event"].iloc[-1])
+
+    def walk_forward_windows():
+        return prepare_data(feature_forward, None, end_time, timedelta(days=30), timedelta(days=30),
+                            timedelta(days=60), timedelta(days=120))
+
+    results["prepare_data"] = measure(walk_forward_windows, args.repeats)
+    windows = walk_forward_windows()
+    results["prepare_data"]["windows"] = len(windows)
+    model = LogisticRegression(max_iter=200)
+    results["fit_model"] = measure(lambda: fit_model(model, feature_forward, windows), max(1, args.repeats // 2))
+    results["fit_model"]["windows"] = len(windows)
+
+    return {"meta": metadata(args), "results": results}
+
+
+def metadata(args: argparse.Namespace) -> Dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "created": pd.Timestamp.now(tz="UTC").isoformat(),
+        "python": platform.python_version(),
+        "pandas": pd.__version__,
+        "numpy": np.__version__,
+        "machine": platform.machine(),
+        "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare")},
+    }
+
+
+def compare(current: Dict, baseline: Dict) -> None:
+    print(f"{'benchmark':<28}{'baseline_s':>14}{'current_s':>14}{'speedup':>10}")
+    for name, result in current["results"].items():
+        base = baseline["results"].get(name)
+        if base is None:
+            print(f"{name:<28}{'-':>14}{result['best_s']:>14.4f}{'-':>10}")
+            continue
+        print(f"{name:<28}{base['best_s']:>14.4f}{result['best_s']:>14.4f}{base['best_s'] / result['best_s']:>9.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backtest engine benchmarks on synthetic data.")
+    parser.add_argument("--start-date", default="2015-01-01")
+    parser.add_argument("--years", type=int, default=2)
+    parser.add_argument("--symbols", nargs="+", default=["SPY"])
+    parser.add_argument("--strikes", type=int, default=20)
+    parser.add_argument("--expirations", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--data-dir", default=None, help="where the synthetic data is generated and reused.")
+    parser.add_argument("--output", default=None, help="json file to save the results.")
+    parser.add_argument("--compare", default=None, help="json file of a previous run to compare against.")
+    parser.add_argument("--check-import-budget", action="store_true",
+                        help="exit with status 1 if an import is over its budget in IMPORT_BUDGETS_S.")
+    args = parser.parse_args()
+
+    results = run(args)
+    over_budget = [name for name, result in results["results"].items() if not result.get("within_budget", True)]
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    else:
+        print(json.dumps(results["results"], indent=2))
+    if over_budget:
+        print(f"Over the import time budget: {', '.join(over_budget)}")
+        if args.check_import_budget:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,19 @@
+"""
+File: conftest.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Shared fixtures of the tests.>
+"""
+import pytest
+
+from backtest.data_parser.synthetic import SyntheticDataGenerator
+
+
+@pytest.fixture(scope="session")
+def data_dir(tmp_path_factory):
+    """
+    One year of synthetic SPY hourly bars and daily option quotes from 2015-01-01.
+    """
+    root = tmp_path_factory.mktemp("synthetic")
+    SyntheticDataGenerator(start_date="2015-01-01", years=1, strikes=4, expirations=2).generate(str(root))
+    return str(root)
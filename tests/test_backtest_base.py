@@ -0,0 +1,129 @@
+"""
+File: test_backtest_base.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of BacktestBase run state on synthetic data.>
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from backtest.backtest_dca import BacktestDCA
+from backtest.event import CashFlowChange, FilledOrder, OptionExpired
+from backtest.portfolio import Portfolio
+from backtest.strategy import Strategy
+from backtest.utils.constant import FREQUENCY, SIDE
+from backtest.backtest_base import BacktestBase
+from backtest.utils.instrument import Option, OptionType, Stock
+
+
+def dca_events(engine, symbol):
+    data = engine.ohlcv_data[symbol].data
+    daily = data.groupby(data["ts_event"].dt.normalize()).last()
+    events = []
+    for ts, close in zip(daily["ts_event"], daily["close"]):
+        events.append(CashFlowChange(ts, float(close)))
+        events.append(FilledOrder(Stock(symbol), ts, SIDE.BUY, 1, float(close), ts))
+    return events
+
+
+def new_engine(data_dir):
+    return BacktestDCA(data_dir, {"stock": ["SPY"]}, FREQUENCY.HOUR, "2015-01-01", "2015-12-31")
+
+
+def test_run_backtest_twice_processes_all_events(data_dir):
+    engine = new_engine(data_dir)
+    events = dca_events(engine, "SPY")
+    engine.run_backtest(events)
+    first_returns = list(engine.period_returns)
+    first_value = engine.portfolio.portfolio_value
+
+    engine.portfolio = Portfolio(0)
+    engine.period_returns = []
+    engine.net_cash_flow = 0
+    engine.last_value = None
+    engine.run_backtest(events)
+
+    assert len(first_returns) == len(events) // 2 - 1
+    assert engine.period_returns == first_returns
+    assert engine.portfolio.portfolio_value == pytest.approx(first_value)
+
+
+def test_load_checkpoint_skips_processed_events(data_dir, tmp_path):
+    full = new_engine(data_dir)
+    events = dca_events(full, "SPY")
+    full.run_backtest(events)
+
+    partial = new_engine(data_dir)
+    partial.run_backtest(events[:100])
+    partial.save_checkpoint(str(tmp_path / "run.pkl"))
+
+    resumed = new_engine(data_dir)
+    resumed.load_checkpoint(str(tmp_path / "run.pkl"))
+    resumed.run_backtest(events)
+
+    assert resumed.period_returns == pytest.approx(full.period_returns)
+    assert resumed.portfolio.portfolio_value == pytest.approx(full.portfolio.portfolio_value)
+    assert pd.Timestamp(resumed.last_event_ts_ns, tz="UTC") == events[-1].ts
+
+
+def utc(ts: str) -> pd.Timestamp:
+    return pd.Timestamp(ts, tz="UTC")
+
+
+def option_engine(data_dir):
+    return BacktestBase(data_dir, {"stock": ["SPY"], "option": ["SPY"]}, FREQUENCY.HOUR, "2015-01-01", "2015-12-31",
+                        initial_cash_balance=100000)
+
+
+def test_resume_settles_options_held_in_checkpoint(data_dir, tmp_path):
+    put = Option("SPY", date(2015, 2, 20), 1.0, OptionType.PUT)
+    engine = option_engine(data_dir)
+    engine.run_backtest([CashFlowChange(utc("2015-01-02 15:00"), 0),
+                         FilledOrder(put, utc("2015-01-05 15:00"), SIDE.SELL, 1, 0.05, utc("2015-01-05 15:00"))])
+    engine.save_checkpoint(str(tmp_path / "run.pkl"))
+
+    resumed = option_engine(data_dir)
+    resumed.load_checkpoint(str(tmp_path / "run.pkl"))
+    resumed.run_backtest([CashFlowChange(utc("2015-03-02 15:00"), 0)])
+    assert put.symbol not in resumed.portfolio.positions
+
+    closed = option_engine(data_dir)
+    closed.load_checkpoint(str(tmp_path / "run.pkl"))
+    events = closed.schedule_expirations([
+        FilledOrder(put, utc("2015-02-02 15:00"), SIDE.BUY, 1, 0.01, utc("2015-02-02 15:00")),
+        CashFlowChange(utc("2015-03-02 15:00"), 0)])
+    assert not any(isinstance(event, OptionExpired) for event in events)
+
+
+class SellPutBuyBack(Strategy):
+    def __init__(self, put: Option, close_bar: int) -> None:
+        super().__init__()
+        self.put = put
+        self.close_bar = close_bar
+        self.expiries = []
+
+    def on_bar(self, bar):
+        ts = pd.Timestamp(bar.ts_ns, tz="UTC")
+        if bar.index == 0:
+            return [FilledOrder(self.put, ts, SIDE.SELL, 1, 0.05, ts)]
+        if bar.index == self.close_bar:
+            return [FilledOrder(self.put, ts, SIDE.BUY, 1, 0.01, ts)]
+        return None
+
+    def on_expiry(self, event):
+        self.expiries.append(event)
+
+
+def test_run_strategy_skips_settlement_of_closed_positions(data_dir):
+    put = Option("SPY", date(2015, 2, 20), 1.0, OptionType.PUT)
+    closed = SellPutBuyBack(put, close_bar=20)
+    option_engine(data_dir).run_strategy(closed)
+    assert closed.expiries == []
+
+    held = SellPutBuyBack(put, close_bar=-1)
+    engine = option_engine(data_dir)
+    engine.run_strategy(held)
+    assert [type(event) for event in held.expiries] == [OptionExpired]
+    assert put.symbol not in engine.portfolio.positions
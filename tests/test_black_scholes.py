@@ -0,0 +1,48 @@
+"""
+File: test_black_scholes.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of Black-Scholes pricing and the implied volatility solver.>
+"""
+import numpy as np
+import pytest
+
+from backtest.utils.black_scholes import bs_price, implied_volatility
+
+
+def test_put_call_parity():
+    spot, strike, t, rate, vol, q = 100.0, np.array([80.0, 100.0, 120.0]), 0.5, 0.03, 0.25, 0.01
+    call = bs_price(spot, strike, t, rate, vol, True, q)
+    put = bs_price(spot, strike, t, rate, vol, False, q)
+    np.testing.assert_allclose(call - put, spot * np.exp(-q * t) - strike * np.exp(-rate * t))
+
+
+@pytest.mark.parametrize("is_call", [True, False])
+def test_implied_volatility_round_trip(is_call):
+    strike = np.array([60.0, 90.0, 100.0, 110.0, 160.0, 100.0, 100.0])
+    t = np.array([0.5, 0.25, 1.0, 0.1, 2.0, 1 / 365, 3.0])
+    vol = np.array([0.6, 0.2, 0.05, 0.35, 1.5, 0.3, 3.0])
+    price = bs_price(100.0, strike, t, 0.03, vol, is_call, 0.01)
+    np.testing.assert_allclose(implied_volatility(price, 100.0, strike, t, 0.03, is_call, 0.01), vol, atol=1e-6)
+
+
+def test_implied_volatility_nan_outside_bounds_and_bracket():
+    t = 0.5
+    rate = np.array([0.03, 0.0, 0.03, 0.03, 0.03, 0.03])
+    strike = np.array([100.0, 100.0, 90.0, 100.0, 100.0, 100.0])
+    price = np.array([
+        bs_price(100.0, 100.0, t, 0.03, 7.0, True),  # volatility above the bracket high of 5
+        bs_price(100.0, 100.0, t, 0.0, 5e-5, True),  # volatility below the bracket low of 1e-4
+        10.0,  # below the lower bound of 100 - 90 * exp(-rate * t)
+        101.0,  # above the spot
+        np.nan,
+        bs_price(100.0, 100.0, t, 0.03, 0.2, True),
+    ])
+    iv = implied_volatility(price, 100.0, strike, t, rate, True)
+    assert np.isnan(iv[:5]).all()
+    assert iv[5] == pytest.approx(0.2, abs=1e-6)
+
+
+def test_implied_volatility_keeps_shape():
+    price = bs_price(100.0, np.full((2, 3), 100.0), 0.5, 0.03, 0.2, True)
+    assert implied_volatility(price, 100.0, 100.0, 0.5, 0.03, True).shape == (2, 3)
@@ -0,0 +1,38 @@
+"""
+File: test_data_parser.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of the parsed data caches.>
+"""
+import os
+
+import pandas as pd
+import pytest
+
+from backtest.data_parser.data_parser import DataParser
+from backtest.data_parser.synthetic import SyntheticDataGenerator
+from backtest.utils.constant import FREQUENCY
+
+
+@pytest.fixture
+def data_dir(tmp_path):
+    SyntheticDataGenerator(start_date="2015-01-01", years=1, strikes=2, expirations=1).generate(str(tmp_path))
+    return str(tmp_path / "SPY")
+
+
+def test_cache_is_reused(data_dir):
+    first = DataParser.read_ohlcv_cached(data_dir, FREQUENCY.HOUR)
+    second = DataParser.read_ohlcv_cached(data_dir, FREQUENCY.HOUR)
+    pd.testing.assert_frame_equal(first, second)
+    assert pd.api.types.is_datetime64_any_dtype(second["ts_event"])
+
+
+def test_cache_from_older_reader_is_rebuilt(data_dir):
+    # A pickle written before caches were versioned: a bare dataframe with ts_event left unparsed.
+    cache_path = os.path.join(data_dir, "ohlcv-hour.pkl")
+    pd.read_csv(os.path.join(data_dir, "ohlcv-hour.csv")).to_pickle(cache_path)
+
+    df = DataParser.read_ohlcv_cached(data_dir, FREQUENCY.HOUR)
+
+    assert pd.api.types.is_datetime64_any_dtype(df["ts_event"])
+    assert pd.read_pickle(cache_path)["version"] == DataParser.CACHE_VERSION
@@ -0,0 +1,92 @@
+"""
+File: test_event_journal.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of recording a backtest to an EventJournal and replaying it.>
+"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from backtest.backtest_base import BacktestBase
+from backtest.event import CanceledOrder, CashFlowChange, FilledOrder, LimitOrder, OptionExpired, \
+    UpdatePortfolio
+from backtest.event_journal import EventJournal
+from backtest.utils.constant import FREQUENCY, SIDE
+from backtest.utils.instrument import Option, OptionType, Stock
+
+
+def utc(ts: str) -> pd.Timestamp:
+    return pd.Timestamp(ts, tz="UTC")
+
+
+def new_engine(data_dir, **kwargs):
+    return BacktestBase(data_dir, {"stock": ["SPY"], "option": ["SPY"]}, FREQUENCY.HOUR, "2015-01-01", "2015-12-31",
+                        initial_cash_balance=100000, **kwargs)
+
+
+def sample_events():
+    spy = Stock("SPY")
+    put = Option("SPY", date(2015, 2, 20), 1.0, OptionType.PUT)
+    limit = LimitOrder(spy, utc("2015-01-06 16:00"), SIDE.BUY, 1, 1.0)
+    return [
+        CashFlowChange(utc("2015-01-02 15:00"), 0),
+        FilledOrder(spy, utc("2015-01-05 15:00"), SIDE.BUY, 10, 100.0, utc("2015-01-05 15:00"), 0.001),
+        FilledOrder(put, utc("2015-01-05 15:00"), SIDE.SELL, 1, 0.05, utc("2015-01-05 15:00")),
+        limit,
+        UpdatePortfolio(utc("2015-01-07 20:00"), {"SPY": 101.0, put.symbol: 0.04}),
+        UpdatePortfolio(utc("2015-01-08 20:00")),
+        CanceledOrder(limit, utc("2015-01-09 15:00")),
+        CashFlowChange(utc("2015-02-02 15:00"), 1000),
+        FilledOrder(spy, utc("2015-02-03 15:00"), SIDE.SELL, 5, 102.0, utc("2015-02-03 15:00")),
+        CashFlowChange(utc("2015-03-02 15:00"), 1000),
+    ]
+
+
+def test_replay_matches_recorded_run(data_dir, tmp_path):
+    path = str(tmp_path / "run.journal")
+    live = new_engine(data_dir, record_journal=path)
+    live.run_backtest(sample_events())
+
+    journal = EventJournal(path)
+    replayed = new_engine(data_dir)
+    replayed.run_backtest(journal)
+
+    # The recorded run includes the expiration of the put that the engine scheduled.
+    expected = [type(event) for event in sample_events()]
+    expected.insert(-1, OptionExpired)
+    assert [type(event) for event in journal.events()] == expected
+    assert len(journal) == len(expected)
+    assert replayed.period_returns == live.period_returns
+    assert replayed.portfolio.portfolio_value == live.portfolio.portfolio_value
+    assert replayed.portfolio.cash_balance == live.portfolio.cash_balance
+    assert sorted(replayed.portfolio.positions) == sorted(live.portfolio.positions)
+    assert len(replayed.portfolio_snapshots) == len(live.portfolio_snapshots)
+
+
+def test_rewritten_journal_matches_recorded(data_dir, tmp_path):
+    recorded = str(tmp_path / "recorded.journal")
+    written = str(tmp_path / "written.journal")
+    new_engine(data_dir, record_journal=recorded).run_backtest(sample_events())
+    EventJournal.write(written, EventJournal(recorded).events())
+
+    written_records, recorded_records = EventJournal(written).records, EventJournal(recorded).records
+    # Replayed limit orders get new order ids, but a cancel still refers to its order.
+    fields = [name for name in recorded_records.dtype.names if name != "order_id"]
+    assert (written_records[fields] == recorded_records[fields]).all()
+    order_ids = written_records["order_id"][written_records["order_id"] >= 0]
+    assert len(order_ids) == 2 and order_ids[0] == order_ids[1]
+
+
+def test_failed_write_leaves_no_journal(tmp_path):
+    path = tmp_path / "broken.journal"
+
+    def events():
+        yield CashFlowChange(utc("2015-01-02 15:00"), 0)
+        raise RuntimeError("source failed")
+
+    with pytest.raises(RuntimeError):
+        EventJournal.write(str(path), events())
+    with pytest.raises(FileNotFoundError):
+        EventJournal(str(path))
@@ -0,0 +1,84 @@
+"""
+File: test_indicators.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of the streaming indicators against pandas rolling and ewm.>
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.utils.indicators import ATR, EMA, RSI, RollingMax, RollingMean, RollingMin, RollingStd
+
+
+@pytest.fixture(scope="module")
+def prices() -> pd.Series:
+    rng = np.random.default_rng(7)
+    return pd.Series(100 * np.exp(np.cumsum(rng.normal(0, 0.01, 500))))
+
+
+def stream(indicator, values) -> np.ndarray:
+    return np.array([indicator.update(x) for x in values])
+
+
+def seeded_ewm(values: pd.Series, period: int, alpha: float) -> pd.Series:
+    """
+    ewm seeded with the mean of the first period values, nan before.
+    """
+    seeded = pd.concat([pd.Series([values.iloc[:period].mean()]), values.iloc[period:]], ignore_index=True)
+    smoothed = seeded.ewm(alpha=alpha, adjust=False).mean()
+    return pd.concat([pd.Series(np.nan, index=range(period - 1)), smoothed], ignore_index=True)
+
+
+@pytest.mark.parametrize("period", [1, 5, 20])
+def test_rolling_mean_and_std(prices, period):
+    np.testing.assert_allclose(stream(RollingMean(period), prices), prices.rolling(period).mean(), rtol=1e-9)
+    if period > 1:
+        np.testing.assert_allclose(stream(RollingStd(period), prices), prices.rolling(period).std(), rtol=1e-6)
+        np.testing.assert_allclose(stream(RollingStd(period, ddof=0), prices), prices.rolling(period).std(ddof=0),
+                                   rtol=1e-6)
+
+
+@pytest.mark.parametrize("period", [1, 5, 20])
+def test_rolling_max_and_min(prices, period):
+    np.testing.assert_array_equal(stream(RollingMax(period), prices), prices.rolling(period, min_periods=1).max())
+    np.testing.assert_array_equal(stream(RollingMin(period), prices), prices.rolling(period, min_periods=1).min())
+
+
+@pytest.mark.parametrize("period", [1, 10, 30])
+def test_ema(prices, period):
+    np.testing.assert_allclose(stream(EMA(period), prices), seeded_ewm(prices, period, 2 / (period + 1)), rtol=1e-9)
+
+
+@pytest.mark.parametrize("period", [2, 14])
+def test_rsi(prices, period):
+    change = prices.diff().iloc[1:].reset_index(drop=True)
+    gain = seeded_ewm(change.clip(lower=0), period, 1 / period)
+    loss = seeded_ewm((-change).clip(lower=0), period, 1 / period)
+    expected = pd.concat([pd.Series([np.nan]), 100 - 100 / (1 + gain / loss)], ignore_index=True)
+    np.testing.assert_allclose(stream(RSI(period), prices), expected, rtol=1e-9)
+
+
+@pytest.mark.parametrize("period", [3, 14])
+def test_atr(prices, period):
+    high, low = prices * 1.01, prices * 0.985
+    true_range = pd.concat([high - low, (high - prices.shift()).abs(), (low - prices.shift()).abs()], axis=1).max(axis=1)
+    atr = ATR(period)
+    values = np.array([atr.update(h, l, c) for h, l, c in zip(high, low, prices)])
+    np.testing.assert_allclose(values, seeded_ewm(true_range, period, 1 / period), rtol=1e-9)
+
+
+def test_non_finite_inputs_are_skipped(prices):
+    gappy = prices.copy()
+    gappy.iloc[::7] = np.nan
+    for make in (lambda: RollingMean(10), lambda: RollingStd(10), lambda: EMA(10), lambda: RSI(10),
+                 lambda: RollingMax(10)):
+        with_gaps = stream(make(), gappy)[gappy.notna().to_numpy()]
+        np.testing.assert_allclose(with_gaps, stream(make(), gappy.dropna()), rtol=1e-12)
+
+
+def test_invalid_period():
+    with pytest.raises(ValueError):
+        RollingMean(0)
+    with pytest.raises(ValueError):
+        RollingStd(1)
@@ -0,0 +1,85 @@
+"""
+File: test_option_chain.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of the volatility surface that prices contracts missing from the option chain.>
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.data_parser.data_parser import DataParser
+from backtest.data_parser.ohlcv import OHLCV
+from backtest.data_parser.option_chain import DAYS_PER_YEAR, OptionChain, VolSurface
+from backtest.utils.black_scholes import bs_price
+from backtest.utils.constant import FREQUENCY
+from backtest.utils.instrument import Option, OptionType
+
+DAY = 16500
+
+
+@pytest.fixture
+def surface() -> VolSurface:
+    # Puts at log-moneyness -0.1 quote 30% and calls at +0.1 quote 20%, at 30 and 90 days to expiration.
+    log_moneyness = np.array([-0.1, -0.1, 0.1, 0.1])
+    dte = np.array([30.0, 90.0, 30.0, 90.0])
+    iv = np.array([0.3, 0.3, 0.2, 0.2])
+    return VolSurface(np.array([DAY]), np.array([100.0]), np.zeros(4, dtype=np.int64), dte, log_moneyness, iv,
+                      rate=0.03, dividend_yield=0.0)
+
+
+@pytest.mark.parametrize("dte, log_moneyness, expected", [
+    (30.0, -0.1, 0.3),
+    (90.0, 0.1, 0.2),
+    (60.0, 0.0, 0.25),  # interpolated between the quoted nodes
+    (30.0, 0.05, 0.225),
+    (30.0, -0.5, 0.3),  # flat beyond the outermost quoted node
+    (30.0, 0.8, 0.2),  # beyond the grid
+    (1.0, 0.1, 0.2),
+    (730.0, -0.1, 0.3),
+])
+def test_volatility(surface, dte, log_moneyness, expected):
+    assert surface.volatility(DAY, np.array([dte]), np.array([log_moneyness]))[0] == pytest.approx(expected, abs=1e-6)
+
+
+def test_volatility_without_surface_is_nan(surface):
+    assert np.isnan(surface.volatility(DAY + 1, np.array([30.0]), np.array([0.0]))).all()
+
+
+def test_price(surface):
+    strikes = np.array([100 * np.exp(-0.1), 100 * np.exp(0.1), 100.0])
+    is_call = np.array([False, True, True])
+    expected = bs_price(100.0, strikes, 30 / DAYS_PER_YEAR, 0.03, np.array([0.3, 0.2, 0.25]), is_call)
+    prices = surface.price(DAY, np.full(3, DAY + 30), strikes, is_call)
+    np.testing.assert_allclose(prices, expected, rtol=1e-6)
+    # The spot defaults to the close of the quote date.
+    np.testing.assert_allclose(surface.price(DAY, np.full(3, DAY + 30), strikes, is_call, spot=100.0), prices)
+    assert np.isnan(surface.price(DAY + 1, np.full(3, DAY + 31), strikes, is_call)).all()
+
+
+def test_nodes_average_their_contracts():
+    surface = VolSurface(np.array([DAY]), np.array([100.0]), np.zeros(2, dtype=np.int64), np.array([29.0, 31.0]),
+                         np.array([0.01, -0.01]), np.array([0.2, 0.4]), rate=0.0, dividend_yield=0.0)
+    assert surface.volatility(DAY, np.array([30.0]), np.array([0.0]))[0] == pytest.approx(0.3, abs=1e-6)
+
+
+def test_chain_prices_missing_contracts_from_its_surface(data_dir):
+    path = f"{data_dir}/SPY"
+    chain = OptionChain(DataParser.read_option_chain(path))
+    underlying = OHLCV(DataParser.read_ohlcv(path, FREQUENCY.HOUR, parse_dates=True))
+    quoted = chain.get_chain_by_date("2015-01-02").iloc[0]
+    expiration = pd.Timestamp(quoted["expiration"]).date()
+    listed = Option("SPY", expiration, float(quoted["strike"]), OptionType(quoted["option_type"]))
+    missing = Option("SPY", expiration, float(quoted["strike"]) + 0.5, OptionType(quoted["option_type"]))
+
+    assert chain.get_instrument_price("2015-01-02", missing, rate=0.03) is None
+    chain.build_vol_surface(underlying, rate=0.03)
+    estimate = chain.get_instrument_price("2015-01-02", missing, rate=0.03)
+    mid = chain.get_instrument_price("2015-01-02", listed, rate=0.03)
+
+    assert mid == pytest.approx((quoted["bid_eod"] + quoted["ask_eod"]) / 2)
+    assert estimate == pytest.approx(mid, rel=0.3)
+    # A surface is only used with the rate and dividend yield it was built with.
+    assert chain.get_instrument_price("2015-01-02", missing) is None
+    assert chain.get_instrument_price("2015-01-02", missing, rate=0.05) is None
+    assert chain.build_vol_surface(underlying, rate=0.03) is chain.vol_surfaces[(0.03, 0.0)]
@@ -0,0 +1,51 @@
+"""
+File: test_signal_bridge.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of turning model predictions into order events.>
+"""
+from datetime import date
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.data_parser.ohlcv import OHLCV
+from backtest.signal_bridge import signals_to_order_frame, signals_to_orders
+from backtest.utils.constant import SIDE
+from backtest.utils.instrument import Option, OptionType, Stock
+
+
+@pytest.fixture(scope="module")
+def ohlcv() -> OHLCV:
+    ts_event = pd.date_range("2015-01-05 14:00", periods=6, freq="h", tz="UTC")
+    close = np.array([100.0, 101.0, 102.0, 103.0, 104.0, 105.0])
+    return OHLCV(pd.DataFrame({"ts_event": ts_event, "open": close, "high": close, "low": close, "close": close,
+                               "volume": 100, "symbol": "SPY"}))
+
+
+def predictions(proba) -> pd.DataFrame:
+    # Naive datetimes, like the ts_event column of model_fitting results.
+    ts_event = pd.date_range("2015-01-05 14:30", periods=len(proba), freq="h")
+    return pd.DataFrame({"ts_event": ts_event, "pred_proba": proba})
+
+
+def test_orders_are_timestamped_in_utc(ohlcv):
+    orders = signals_to_orders(predictions([0.7, 0.6, 0.2, 0.8]), ohlcv, Stock("SPY"), quantity=10)
+    assert [order.side for order in orders] == [SIDE.BUY, SIDE.SELL, SIDE.BUY]
+    assert [order.filled_price for order in orders] == [100.0, 102.0, 103.0]
+    assert orders[0].ts == pd.Timestamp("2015-01-05 14:30", tz="UTC")
+    assert all(order.filled_date == order.ts for order in orders)
+
+
+def test_notional_sizing(ohlcv):
+    frame = signals_to_order_frame(predictions([0.7, 0.6, 0.2]), ohlcv, notional=1000)
+    assert frame["quantity"].tolist() == [10, 10]
+
+
+def test_short_stock_is_rejected(ohlcv):
+    with pytest.raises(ValueError):
+        signals_to_orders(predictions([0.7, 0.2]), ohlcv, Stock("SPY"), quantity=10, short_threshold=0.3)
+    put = Option("SPY", date(2015, 2, 20), 100.0, OptionType.PUT)
+    orders = signals_to_orders(predictions([0.7, 0.2]), ohlcv, put, quantity=1, short_threshold=0.3)
+    assert [(order.side, order.quantity) for order in orders] == [(SIDE.BUY, 1), (SIDE.SELL, 2)]
@@ -0,0 +1,38 @@
+"""
+File: test_sweep.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of running sweep jobs in process.>
+"""
+import pytest
+
+from backtest import sweep
+from backtest.backtest_base import BacktestBase
+from backtest.event import CashFlowChange
+from backtest.sweep import EngineSpec, run_job
+from backtest.utils.constant import FREQUENCY
+
+
+def single_deposit(engine):
+    return [CashFlowChange(engine.ohlcv_data["SPY"].data["ts_event"].iloc[0], 1000)]
+
+
+def failing_build(engine):
+    raise RuntimeError("build failed")
+
+
+def test_run_job_ignores_prefetch_and_closes_engine(data_dir, monkeypatch):
+    monkeypatch.setattr(sweep, "_data_cache", {})
+    closed = []
+    monkeypatch.setattr(BacktestBase, "close", lambda self: closed.append(self))
+    # The synthetic data has no option partitions, so an engine that prefetched would fail to load.
+    spec = EngineSpec(BacktestBase, data_dir, {"stock": ["SPY"], "option": ["SPY"]}, FREQUENCY.HOUR, "2015-01-01",
+                      "2015-12-31", {"initial_cash_balance": 0, "prefetch_options": True})
+
+    portfolio_value, cash_balance, net_cash_flow, _, _, _ = run_job(spec, single_deposit, {})
+    assert (portfolio_value, cash_balance, net_cash_flow) == (1000, 1000, 1000)
+    assert len(closed) == 1 and closed[0].prefetcher is None
+
+    with pytest.raises(RuntimeError):
+        run_job(spec, failing_build, {})
+    assert len(closed) == 2
@@ -0,0 +1,70 @@
+"""
+File: test_trading_calendar.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Table tests of the NYSE trading calendar.>
+"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from backtest.utils.timeutil import NS_PER_DAY, NS_PER_HOUR, to_ns
+from backtest.utils.trading_calendar import TradingCalendar
+
+
+@pytest.fixture(scope="module")
+def calendar():
+    return TradingCalendar.for_years(2015, 2015)
+
+
+def day(value: str) -> int:
+    return to_ns(value) // NS_PER_DAY
+
+
+@pytest.mark.parametrize("date, is_session", [
+    ("2015-07-02", True),
+    ("2015-07-03", False),  # Independence Day falls on a Saturday and is observed on Friday.
+    ("2015-07-04", False),
+    ("2015-07-06", True),
+    ("2015-11-26", False),  # Thanksgiving.
+    ("2015-11-27", True),
+    ("2015-12-25", False),
+])
+def test_sessions(calendar, date, is_session):
+    assert (calendar.session_index(day(date)) >= 0) == is_session
+
+
+@pytest.mark.parametrize("date, open_utc, close_utc", [
+    # The day after Thanksgiving closes at 13:00 New York time.
+    ("2015-11-27", "2015-11-27 14:30", "2015-11-27 18:00"),
+    ("2015-12-24", "2015-12-24 14:30", "2015-12-24 18:00"),
+    # DST starts on 2015-03-08: the session moves one hour earlier in UTC.
+    ("2015-03-06", "2015-03-06 14:30", "2015-03-06 21:00"),
+    ("2015-03-09", "2015-03-09 13:30", "2015-03-09 20:00"),
+    # DST ends on 2015-11-01: the session moves one hour later in UTC.
+    ("2015-10-30", "2015-10-30 13:30", "2015-10-30 20:00"),
+    ("2015-11-02", "2015-11-02 14:30", "2015-11-02 21:00"),
+])
+def test_session_open_close(calendar, date, open_utc, close_utc):
+    index = calendar.session_index(day(date))
+    assert calendar.session_open_ns[index] == to_ns(open_utc)
+    assert calendar.session_close_ns[index] == to_ns(close_utc)
+    assert calendar.is_early_close[index] == close_utc.endswith("18:00")
+
+
+@pytest.mark.parametrize("date, close_utc", [
+    ("2015-07-03", "2015-07-02 20:00"),
+    ("2015-07-05", "2015-07-02 20:00"),
+    ("2015-11-28", "2015-11-27 18:00"),
+    ("2015-03-08", "2015-03-06 21:00"),
+])
+def test_session_close_on_or_before(calendar, date, close_utc):
+    assert calendar.session_close_on_or_before(date) == to_ns(close_utc)
+
+
+def test_session_mask_around_early_close(calendar):
+    start = pd.Timestamp("2015-11-27 13:00", tz="UTC")
+    ts_ns = np.array([(start + pd.Timedelta(hours=h)).value for h in range(8)], dtype=np.int64)
+    mask = calendar.session_mask(ts_ns, NS_PER_HOUR)
+    # The 14:00 bar contains the 14:30 open, the 17:00 bar is the last one before the 18:00 close.
+    assert mask.tolist() == [False, True, True, True, True, False, False, False]
@@ -0,0 +1,30 @@
+"""
+File: test_tuning.py
+Author: Zhicheng Tang
+Created Date: 10/19/26
+Description: <Tests of the successive halving schedule of tune_model.>
+"""
+import numpy as np
+import pytest
+
+from backtest.model_fitting.tuning import _halving_budgets
+
+
+@pytest.mark.parametrize("n_candidates, halving_factor, n_rounds", [
+    (1, 3, 1),
+    (2, 2, 2),
+    (4, 2, 3),
+    (5, 2, 4),
+    (9, 3, 3),
+    (125, 5, 4),  # math.log(125, 5) is slightly above 3
+    (126, 5, 5),
+    (1000, 10, 4),
+    (8, None, 1),
+])
+def test_rounds(n_candidates, halving_factor, n_rounds):
+    windows = [(np.zeros((1000, 2)),)]
+    budgets = _halving_budgets(windows, n_candidates, halving_factor, min_train_rows=10)
+    assert len(budgets) == n_rounds
+    assert budgets[-1] == [None]
+    if n_rounds > 1:
+        assert budgets[-2] == [1000 // halving_factor]